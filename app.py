@@ -1,5 +1,7 @@
 import streamlit as st
 
+from core import profiler
+
 # call set_page_config early (before other st.* calls)
 st.set_page_config(
     page_title="Quizzy - Your Personal Quiz Generator",
@@ -13,6 +15,7 @@ try:
     from ui.results_view import render_results
     from ui.host_view import render_host_view
     from ui.player_view import render_player_view
+    from ui.metrics_view import render_metrics_page
 except (ModuleNotFoundError, ImportError) as e:
 
     def _missing_ui(*args, _exc=e, **kwargs):
@@ -21,14 +24,14 @@ except (ModuleNotFoundError, ImportError) as e:
         )
         st.exception(_exc)
 
-    render_upload = render_quiz = render_results = render_host_view = render_player_view = _missing_ui
+    render_upload = render_quiz = render_results = render_host_view = render_player_view = render_metrics_page = _missing_ui
 except Exception as e:
 
     def _import_error(*args, _exc=e, **kwargs):
         st.error("Error importing UI modules.")
         st.exception(_exc)
 
-    render_upload = render_quiz = render_results = render_host_view = render_player_view = _import_error
+    render_upload = render_quiz = render_results = render_host_view = render_player_view = render_metrics_page = _import_error
 
 # Initialize session state
 if "page" not in st.session_state:
@@ -38,8 +41,8 @@ if "page" not in st.session_state:
         st.session_state.page = "player_join"
     else:
         st.session_state.page = "mode_select"
-if "df" not in st.session_state:
-    st.session_state.df = None
+if "deck" not in st.session_state:
+    st.session_state.deck = None  # DeckHandle into the shared deck registry
 if "quiz_settings" not in st.session_state:
     st.session_state.quiz_settings = {"num_questions": 10, "mode": "chinese_to_english"}
 if "quiz_data" not in st.session_state:
@@ -53,6 +56,7 @@ if "game_mode" not in st.session_state:
     st.session_state.game_mode = "single"  # single, host, player
 
 
+@profiler.profiled
 def render_mode_select():
     """Render the mode selection screen"""
     from ui.theme import inject_ui
@@ -224,6 +228,11 @@ def render_mode_select():
 
 
 def main():
+    # Hidden admin page: ?metrics=<QUIZZY_METRICS_TOKEN>
+    if "metrics" in st.query_params:
+        render_metrics_page(st.query_params["metrics"])
+        return
+    
     # Mode selection
     if st.session_state.page == "mode_select":
         render_mode_select()
@@ -260,4 +269,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # Opt-in: QUIZZY_PROFILE=1, or ?profile=<QUIZZY_PROFILE_TOKEN>
+    with profiler.profile_rerun(st.session_state.page, profiler.requested(st.query_params)):
+        main()
@@ -0,0 +1 @@
+# package marker for benchmark scripts
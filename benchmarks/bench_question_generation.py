@@ -0,0 +1,43 @@
+"""Compare per-question generation against the batched generator.
+
+Run with: python -m benchmarks.bench_question_generation
+"""
+import time
+
+from benchmarks.datasets import DECK_SIZES, synthetic_deck
+from quiz.distractors import DistractorIndex
+from quiz.generator import generate_question, generate_question_batch
+
+QUESTION_COUNTS = [10, 50]
+MODE = "chinese_to_english"
+
+
+def _looped(df, index, num_questions):
+    used_words = []
+    for _ in range(num_questions):
+        q = generate_question(df, MODE, used_words, distractor_index=index)
+        used_words.append(q.target_row["chinese"])
+
+
+def _timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'rows':>8} {'k':>4} {'looped ms':>10} {'batched ms':>11} {'speedup':>8}")
+    for rows in DECK_SIZES:
+        df = synthetic_deck(rows)
+        index = DistractorIndex(df, MODE)
+        for k in QUESTION_COUNTS:
+            looped = _timed(lambda: _looped(df, index, k))
+            batched = _timed(lambda: generate_question_batch(df, MODE, k, distractor_index=index))
+            print(f"{rows:>8} {k:>4} {looped * 1000:>10.1f} {batched * 1000:>11.1f} {looped / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Synthetic decks and sessions shared by the benchmarks."""
+import functools
+import io
+
+import pandas as pd
+
+from multiplayer.adaptive import LEVELS, START_LEVEL
+from multiplayer.session_manager import GameSession, SessionManager
+from quiz.question import Question
+
+DECK_SIZES = [1_000, 10_000, 100_000]
+PLAYER_COUNTS = [10, 100, 1000]
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_deck(rows):
+    return pd.DataFrame({
+        "chinese": [f"词{i}" for i in range(rows)],
+        "pinyin": [f"ci{i}" for i in range(rows)],
+        "english": [f"word {i}" for i in range(rows)],
+        "example_sentence": "",
+        "pos": [f"pos{i % 8}" for i in range(rows)],
+        "semantic_type": [f"type{i % 40}" for i in range(rows)],
+    })
+
+
+def synthetic_deck(rows):
+    """A deck of `rows` unique words spread over 8 parts of speech and 40 semantic types"""
+    return _cached_deck(rows).copy()
+
+
+@functools.lru_cache(maxsize=None)
+def deck_csv_bytes(rows):
+    return _cached_deck(rows).to_csv(index=False).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=None)
+def deck_xlsx_bytes(rows):
+    buffer = io.BytesIO()
+    _cached_deck(rows).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def synthetic_questions(count):
+    """Questions that need no deck: the correct answer to question i is "a{i}"."""
+    return [
+        Question(None, i, f"q{i}", f"a{i}", [f"a{i}", "x", "y", "z"])
+        for i in range(count)
+    ]
+
+
+def simulated_session(players, questions=10, manager=None, settings=None, adaptive=False) -> GameSession:
+    """A started session with `players` joined players and synthetic questions
+
+    adaptive: an adaptive-difficulty game, with `questions` per level in the pool
+    """
+    manager = manager or SessionManager()
+    settings = settings or {"num_questions": questions, "mode": "chinese_to_english"}
+    pool_size = questions
+    if adaptive:
+        pool_size = LEVELS * questions
+        settings = {**settings, "difficulty_levels": [(START_LEVEL + i // questions) % LEVELS for i in range(pool_size)]}
+    session = manager.create_session("bench", settings, synthetic_questions(pool_size))
+    for i in range(players):
+        session.add_player(f"player {i}")
+    session.start_game()
+    return session
@@ -0,0 +1,280 @@
+"""Simulate classrooms of players hitting the multiplayer engine at once.
+
+Drives SessionManager/GameSession directly: every virtual player is a thread
+that joins, waits for the host to start, then answers each question after a
+random think time, reading the leaderboard as the player page does. Each
+session also gets a host thread polling the full leaderboard like the host
+dashboard. Optionally some players go through the real Streamlit pages via
+streamlit.testing.v1.AppTest instead.
+
+Reports p50/p95/p99 latencies for join, submit and leaderboard reads, and the
+memory each player adds (measured in a separate pass under tracemalloc, so
+tracing doesn't distort the latencies).
+
+Run with:
+    python -m benchmarks.load_simulator --sessions 4 --players 80
+    python -m benchmarks.load_simulator --think exp:1.5 --time-scale 0.05
+    python -m benchmarks.load_simulator --players 30 --apptest 3
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks.datasets import synthetic_questions
+from multiplayer.adaptive import LEVELS, START_LEVEL
+from multiplayer.session_manager import SessionManager
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+OPERATIONS = ("join", "submit", "player_leaderboard", "host_leaderboard", "apptest_join", "apptest_submit")
+
+
+def think_time_sampler(spec: str, rng: random.Random):
+    """Parse "fixed:S", "uniform:A,B", "exp:MEAN" or "lognormal:MU,SIGMA" into a sampler"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "exp":
+        return lambda: rng.expovariate(1 / values[0])
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"unknown think-time distribution: {spec}")
+
+
+class Recorder:
+    """Collects latencies per operation from many threads"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def timed(self, operation, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples[operation].append(elapsed)
+        return result
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def summary(self):
+        rows = {}
+        for operation in OPERATIONS:
+            values = self.samples.get(operation)
+            if not values:
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+            rows[operation] = {
+                "count": len(values),
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "max_ms": max(values) * 1000,
+            }
+        return rows
+
+
+def _player(session, name, args, recorder, started, rng):
+    think = think_time_sampler(args.think, rng)
+    player_id = recorder.timed("join", session.add_player, name)
+    started.wait()
+    for q in range(args.questions):
+        time.sleep(think() * args.time_scale)
+        if args.adaptive:
+            # Each player's next question is picked for them
+            q = session.get_player(player_id)["current_question"]
+        answer = f"a{q}" if rng.random() < args.accuracy else "x"
+        if recorder.timed("submit", session.submit_answer, player_id, q, answer):
+            recorder.count("accepted")
+        else:
+            # Late answers (time limit) or a question already expired
+            recorder.count("rejected")
+        recorder.timed("player_leaderboard", _player_leaderboard_read, session, player_id)
+
+
+def _player_leaderboard_read(session, player_id):
+    # What render_player_game reads on every rerun
+    session.rank_of(player_id)
+    session.player_count()
+    return session.top_k(10)
+
+
+def _host(session, args, recorder, started, done):
+    while session.player_count() < args.players:
+        time.sleep(0.01)
+    session.start_game()
+    started.set()
+    while not done.is_set():
+        recorder.timed("host_leaderboard", session.get_leaderboard)
+        done.wait(args.host_poll)
+
+
+def _apptest_players(pin, names, recorder):
+    """Join and play through the real pages, timing each script run
+
+    AppTest instances can't run scripts concurrently in one process, so a
+    single thread drives all of them in turn. Submit timings include the
+    game page's one-second feedback pause.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    apps = []
+    for name in names:
+        at = AppTest.from_file(APP_PATH, default_timeout=60).run()
+        at.button(key="join_btn").click().run()
+        at.text_input(key="join_session_id").input(pin)
+        at.text_input(key="join_player_name").input(name)
+        recorder.timed("apptest_join", at.button(key="join_btn").click().run)
+        apps.append(at)
+    while apps:
+        for at in list(apps):
+            page = at.session_state.page
+            if page == "player_game":
+                forms = [b for b in at.button if "Submit Answer" in b.label]
+                if forms:
+                    recorder.timed("apptest_submit", forms[0].click().run)
+                    continue
+            elif page != "player_lobby":
+                apps.remove(at)
+                continue
+            at.run()
+        time.sleep(0.05)
+
+
+def run_load(args):
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    if args.apptest:
+        # The pages look sessions up in the process-wide manager
+        from multiplayer.session_manager import get_global_session_manager
+        manager = get_global_session_manager("v2.0")
+    else:
+        manager = SessionManager()
+    settings = {"num_questions": args.questions, "mode": "chinese_to_english"}
+    if args.time_limit:
+        settings["time_limit"] = args.time_limit
+    pool_size = args.questions
+    if args.adaptive:
+        # num_questions per level, starting level first
+        pool_size = LEVELS * args.questions
+        settings["difficulty_levels"] = [(START_LEVEL + i // args.questions) % LEVELS for i in range(pool_size)]
+
+    threads = []
+    hosts = []
+    sessions = []
+    for s in range(args.sessions):
+        session = manager.create_session(f"host {s}", settings, synthetic_questions(pool_size))
+        sessions.append(session)
+        started, done = threading.Event(), threading.Event()
+        host = threading.Thread(target=_host, args=(session, args, recorder, started, done), daemon=True)
+        hosts.append((host, done))
+        simulated = args.players - (args.apptest if s == 0 else 0)
+        for p in range(simulated):
+            player_rng = random.Random(rng.random())
+            threads.append(threading.Thread(
+                target=_player, args=(session, f"s{s}p{p}", args, recorder, started, player_rng), daemon=True,
+            ))
+        if s == 0 and args.apptest:
+            names = [f"app{p}" for p in range(args.apptest)]
+            threads.append(threading.Thread(
+                target=_apptest_players, args=(session.session_id, names, recorder), daemon=True,
+            ))
+
+    start = time.perf_counter()
+    for host, _ in hosts:
+        host.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    for host, done in hosts:
+        done.set()
+        host.join()
+    for session in sessions:
+        manager.close_session(session.session_id)
+    return recorder, elapsed
+
+
+def memory_per_player(players, questions):
+    """Bytes each joined player (with all answers in) adds to a session"""
+    manager = SessionManager()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    session = manager.create_session("memory", {"num_questions": questions}, synthetic_questions(questions))
+    player_ids = [session.add_player(f"player {i}") for i in range(players)]
+    session.start_game()
+    for q in range(questions):
+        for player_id in player_ids:
+            session.submit_answer(player_id, q, f"a{q}")
+    session.get_leaderboard()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / players
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions")
+    parser.add_argument("--players", type=int, default=80, help="players per session")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--think", default="lognormal:0.7,0.5", help="think time distribution in seconds")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="multiply think times (speeds up the run)")
+    parser.add_argument("--accuracy", type=float, default=0.7)
+    parser.add_argument("--adaptive", action="store_true", help="adaptive-difficulty games (per-player questions)")
+    parser.add_argument("--time-limit", type=float, default=None, help="per-question limit in seconds")
+    parser.add_argument("--host-poll", type=float, default=0.5, help="seconds between host leaderboard reads")
+    parser.add_argument("--apptest", type=int, default=0, help="players in session 0 driven through AppTest")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+    if args.apptest > args.players:
+        parser.error("--apptest can't exceed --players")
+
+    total = args.sessions * args.players
+    print(f"{args.sessions} sessions x {args.players} players x {args.questions} questions "
+          f"(think {args.think}, scaled x{args.time_scale})", flush=True)
+    recorder, elapsed = run_load(args)
+    per_player = memory_per_player(args.players, args.questions)
+
+    summary = recorder.summary()
+    print(f"\n{'operation':<20} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for operation, row in summary.items():
+        print(f"{operation:<20} {row['count']:>8} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+              f"{row['p99_ms']:>9.3f} {row['max_ms']:>9.3f}")
+    accepted, rejected = recorder.counts["accepted"], recorder.counts["rejected"]
+    print(f"\n{total} players in {elapsed:.2f}s; virtual players had {accepted} answers accepted, {rejected} rejected")
+    print(f"memory per player: {per_player / 1024:.1f} KiB ({args.questions} answers each)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "args": vars(args),
+                "elapsed_seconds": elapsed,
+                "accepted": accepted,
+                "rejected": rejected,
+                "memory_bytes_per_player": per_player,
+                "latency": summary,
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Two processes sharing one SQLiteStore: heartbeats on one, janitor on the other.
+
+The parent creates a lobby and then never hears from its players itself; a
+child process serves half of them and sends their heartbeats. The parent's
+janitor must only evict the other half, however often it runs.
+
+Run with: python -m benchmarks.stress_heartbeat
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.datasets import synthetic_questions
+from multiplayer.session_manager import SessionManager
+from multiplayer.storage import SQLiteStore
+
+PLAYERS = 20
+IDLE_TIMEOUT = 1.0
+HEARTBEAT_INTERVAL = 0.2
+DURATION = 4 * IDLE_TIMEOUT
+
+
+def _heartbeats(path, session_id, player_ids, ready):
+    store = SQLiteStore(path)
+    session = SessionManager(store=store).get_session(session_id)
+    ready.set()
+    deadline = time.monotonic() + DURATION
+    while time.monotonic() < deadline:
+        for player_id in player_ids:
+            session.heartbeat(player_id)
+        time.sleep(HEARTBEAT_INTERVAL)
+    store.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "games.db")
+        store = SQLiteStore(path)
+        manager = SessionManager(store=store, player_idle_timeout=IDLE_TIMEOUT)
+        session = manager.create_session("stress", {"num_questions": 5, "mode": "chinese_to_english"}, synthetic_questions(5))
+        player_ids = [session.add_player(f"p{i}") for i in range(PLAYERS)]
+        alive, idle = player_ids[::2], player_ids[1::2]
+
+        ready = multiprocessing.Event()
+        child = multiprocessing.Process(target=_heartbeats, args=(path, session.session_id, alive, ready))
+        child.start()
+        ready.wait()
+        evicted = 0
+        deadline = time.monotonic() + DURATION
+        while time.monotonic() < deadline:
+            evicted += manager.run_janitor()["players_evicted"]
+            time.sleep(HEARTBEAT_INTERVAL / 2)
+        child.join()
+        if child.exitcode:
+            raise SystemExit(f"heartbeat process exited with {child.exitcode}")
+
+        # What the store holds, not just this process's copy
+        remaining = set(store.load(session.session_id)["players"])
+        store.close()
+
+    errors = [f"{player_id}: evicted despite heartbeats" for player_id in alive if player_id not in remaining]
+    errors += [f"{player_id}: never evicted" for player_id in idle if player_id in remaining]
+    print(f"{evicted} of {PLAYERS} players evicted over {DURATION:.1f}s")
+    if errors:
+        print("FAILED")
+        for error in errors[:20]:
+            print("  " + error)
+        raise SystemExit(1)
+    print("OK: only players without heartbeats anywhere were evicted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Hammer one GameSession from many threads and check scores add up exactly.
+
+Every player gets several threads racing to submit the same question, so
+any lost update or double-counted answer shows up as a mismatch, both in
+the answers each player ends up with and in whether each was marked correct.
+
+Run with: python -m benchmarks.stress_submit
+"""
+import threading
+import time
+
+from benchmarks.datasets import synthetic_questions
+from multiplayer.session_manager import SessionManager
+
+PLAYERS = 50
+QUESTIONS = 20
+RACERS_PER_PLAYER = 4
+
+
+def main():
+    manager = SessionManager()
+    session = manager.create_session("stress", {"num_questions": QUESTIONS, "mode": "chinese_to_english"}, synthetic_questions(QUESTIONS))
+    player_ids = [session.add_player(f"p{i}") for i in range(PLAYERS)]
+    session.start_game()
+
+    # (question, answered correctly) for every submit that was accepted
+    accepted = {player_id: [] for player_id in player_ids}
+    counter_lock = threading.Lock()
+    barrier = threading.Barrier(PLAYERS * RACERS_PER_PLAYER)
+
+    def racer(player_id, index):
+        barrier.wait()
+        for q in range(QUESTIONS):
+            # even-numbered racers answer correctly, odd ones wrongly
+            answer = f"a{q}" if (q + index) % 2 == 0 else "x"
+            while True:
+                player = session.get_player(player_id)
+                if player["current_question"] > q or player["finished"]:
+                    break
+                if session.submit_answer(player_id, q, answer):
+                    with counter_lock:
+                        accepted[player_id].append((q, answer == f"a{q}"))
+                    break
+            session.get_leaderboard()
+
+    threads = [
+        threading.Thread(target=racer, args=(player_id, i))
+        for player_id in player_ids
+        for i in range(RACERS_PER_PLAYER)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    snapshot = session.snapshot()
+    errors = []
+    for player_id, player in snapshot["players"].items():
+        answers = player["answers"]
+        sent = sorted(accepted[player_id])
+        if [q for q, _ in sent] != list(range(QUESTIONS)):
+            errors.append(f"{player_id}: accepted submits for {[q for q, _ in sent]}")
+        if len(answers) != len(sent):
+            errors.append(f"{player_id}: {len(answers)} answers recorded for {len(sent)} accepted submits")
+        if [a["question_num"] for a in answers] != list(range(QUESTIONS)):
+            errors.append(f"{player_id}: answered {[a['question_num'] for a in answers]}")
+        if [a["is_correct"] for a in answers] != [correct for _, correct in sent]:
+            errors.append(f"{player_id}: recorded correct/incorrect pattern differs from the accepted submits")
+        if player["score"] != sum(a["points"] for a in answers):
+            errors.append(f"{player_id}: score {player['score']} != sum of points")
+        if not player["finished"]:
+            errors.append(f"{player_id}: not finished")
+    if snapshot["status"] != "finished":
+        errors.append(f"session status {snapshot['status']!r}")
+
+    total = PLAYERS * QUESTIONS
+    print(f"{total} answers from {len(threads)} threads in {elapsed:.2f}s")
+    if errors:
+        print("FAILED")
+        for error in errors[:20]:
+            print("  " + error)
+        raise SystemExit(1)
+    print("OK: every player recorded exactly the answers accepted, and scores match them")
+
+
+if __name__ == "__main__":
+    main()
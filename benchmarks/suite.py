@@ -0,0 +1,403 @@
+"""Benchmark the hot paths and compare them against a JSON baseline.
+
+Run with:
+    python -m benchmarks.suite                  # run, compare with the baseline
+    python -m benchmarks.suite --save           # run and record a new baseline
+    python -m benchmarks.suite --quick -k session
+
+Each case is timed at least `repeat` times, and short cases keep repeating
+until MIN_SECONDS of timings are collected. The best run is kept, as seconds
+per operation: on a shared machine noise only ever adds time, so the
+fastest run is the most repeatable figure. A case is reported as a
+regression when it is more than `threshold` slower than the baseline (25%
+by default); --fail makes that exit non-zero, for CI.
+
+Ratios are relative: when enough cases run, each one is divided by the
+median ratio of the run, so a machine that is uniformly faster or slower
+than the one the baseline came from (or busier right now) shifts the
+median rather than flagging every case; only cases that drift away from
+the rest are reported. A baseline recorded with a different machine,
+Python or pandas is still compared but never fails the run: record one
+per machine with --save.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.datasets import (
+    DECK_SIZES,
+    PLAYER_COUNTS,
+    deck_csv_bytes,
+    deck_xlsx_bytes,
+    simulated_session,
+    synthetic_deck,
+)
+from quiz.calibration import calibrate
+from quiz.distractors import DistractorIndex, get_distractors
+from quiz.learner_store import LearnerStore
+from quiz.normalize import AnswerKey
+from quiz.similarity import SimilarityIndex
+from quiz.scheduler import ReviewSchedule
+from quiz.session import grade_quiz, initialize_quiz
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+MODE = "chinese_to_english"
+QUESTIONS = 10
+MIN_SECONDS = 0.5
+MAX_RUNS = 200
+# Fewer compared cases than this and the median says little about the machine
+MIN_CASES_FOR_DRIFT = 5
+
+CASES = []
+# Cleanups for the case being timed (temporary directories and the like)
+_case_resources = None
+
+
+def case(name, quick=True):
+    """Register a benchmark.
+
+    The decorated setup returns (run, operations) or (run, operations,
+    prepare): prepare(), if given, runs untimed before every timing and its
+    result is passed to run.
+    """
+    def register(setup):
+        CASES.append((name, setup, quick))
+        return setup
+    return register
+
+
+def _register_cases():
+    for rows in DECK_SIZES:
+        quick = rows <= 10_000
+
+        @case(f"quiz.initialize_quiz[rows={rows}]", quick)
+        def _(rows=rows):
+            df = synthetic_deck(rows)
+            settings = {"num_questions": 20, "mode": MODE}
+            return (lambda: initialize_quiz(df, settings)), 1
+
+        @case(f"quiz.get_distractors[rows={rows}]", quick)
+        def _(rows=rows):
+            df = synthetic_deck(rows)
+            index = DistractorIndex(df, MODE)
+            # Neighbour lookups should keep the per-question cost flat in deck size
+            targets = [(i, df.iloc[i]) for i in range(0, rows, max(1, rows // 500))]
+
+            def run():
+                for i, row in targets:
+                    get_distractors(df, row, row["english"], MODE, index=index, row=i)
+            return run, len(targets)
+
+        @case(f"quiz.SimilarityIndex[rows={rows}]", quick)
+        def _(rows=rows):
+            df = synthetic_deck(rows)
+            rng = np.random.default_rng(0)
+            return (lambda: SimilarityIndex(df, rng)), rows
+
+        @case(f"quiz.AnswerKey[rows={rows}]", quick)
+        def _(rows=rows):
+            df = synthetic_deck(rows)
+            return (lambda: AnswerKey(df)), rows
+
+        @case(f"quiz.grade_quiz[typed,rows={rows}]", quick)
+        def _(rows=rows):
+            df = synthetic_deck(rows)
+            settings = {"num_questions": 100, "mode": MODE, "typed": True}
+            questions = initialize_quiz(df, settings)
+            responses = [f"Word {q.row}!" if i % 3 else "wrong" for i, q in enumerate(questions)]
+            return (lambda: grade_quiz([], questions, responses, settings)), len(questions)
+
+        @case(f"quiz.ReviewSchedule[rows={rows}]", quick)
+        def _(rows=rows):
+            # One 20-question quiz an hour: pick due/new rows, grade them
+            schedule = ReviewSchedule(rows, np.random.default_rng(0))
+            clock = iter(range(0, sys.maxsize, 3600))
+            correct = np.arange(20) % 3 > 0
+
+            def run():
+                now = float(next(clock))
+                schedule.review_answers(schedule.next_rows(20, now), correct, now)
+            return run, 1
+
+        @case(f"loader.load_excel[csv,rows={rows}]", quick)
+        def _(rows=rows):
+            return _load_excel_cold(deck_csv_bytes(rows), "deck.csv"), rows
+
+    # openpyxl is slow enough that 100k-row workbooks only make the suite drag
+    for rows in DECK_SIZES[:2]:
+        @case(f"loader.load_excel[xlsx,rows={rows}]", rows <= 1_000)
+        def _(rows=rows):
+            return _load_excel_cold(deck_xlsx_bytes(rows), "deck.xlsx"), rows
+
+    @case("learner_store.record_quiz[rows=1000000]", quick=False)
+    def _():
+        # A million-row table: the indexes, not the table size, should set the cost
+        store = LearnerStore(os.path.join(_temp_dir(), "learners.db"))
+        _case_resources.callback(store.close)
+        words = 5000
+        pos = [f"pos{i % 8}" for i in range(words)]
+        types = [f"type{i % 40}" for i in range(words)]
+        rng = np.random.default_rng(0)
+        for learner in range(200):
+            store.record_quiz(f"learner {learner}", "deck", MODE, range(words), rng.random(words) < 0.7, None, pos, types)
+        learners = iter(range(sys.maxsize))
+
+        def run():
+            name = f"learner {next(learners) % 200}"
+            rows = rng.integers(0, words, 20)
+            store.record_quiz(name, "deck", MODE, rows, rows % 3 > 0, [2.0] * 20, [pos[r] for r in rows], [types[r] for r in rows])
+            store.weakest(name, "deck", 10)
+            store.accuracy_by(name, "deck", "pos")
+        return run, 1
+
+    @case("calibration.calibrate[answers=1000000]", quick=False)
+    def _():
+        # 2PL answers from 50k players over a 5k-word deck: cost per answer
+        rng = np.random.default_rng(0)
+        words, players, answers = 5000, 50_000, 1_000_000
+        rows = rng.integers(0, words, answers)
+        persons = rng.integers(0, players, answers)
+        difficulty, ability = rng.normal(0, 1, words), rng.normal(0, 1, players)
+        correct = rng.random(answers) < 1 / (1 + np.exp(difficulty[rows] - ability[persons]))
+        df = pd.DataFrame({
+            "deck": pd.Categorical(["deck"] * answers), "row": rows.astype(np.int32), "person": persons,
+            "correct": correct, "seconds": rng.gamma(2.0, 2.0, answers).astype(np.float32),
+        })
+        return (lambda: calibrate(df)), answers
+
+    for players in PLAYER_COUNTS:
+        quick = players <= 100
+
+        @case(f"session.submit_answer[players={players}]", quick)
+        def _(players=players):
+            # Fresh session per timing run: every player answers every question
+            def run(session):
+                player_ids = list(session.players)
+                for q in range(QUESTIONS):
+                    for i, player_id in enumerate(player_ids):
+                        session.submit_answer(player_id, q, f"a{q}" if i % 3 else "x")
+            return run, players * QUESTIONS, lambda: simulated_session(players, QUESTIONS)
+
+        @case(f"session.submit_answer[adaptive,players={players}]", quick)
+        def _(players=players):
+            # As above, but each player's next question is picked by accuracy
+            def run(session):
+                player_ids = list(session.players)
+                for _ in range(QUESTIONS):
+                    for i, player_id in enumerate(player_ids):
+                        q = session.players[player_id]["current_question"]
+                        session.submit_answer(player_id, q, f"a{q}" if i % 3 else "x")
+            return run, players * QUESTIONS, lambda: simulated_session(players, QUESTIONS, adaptive=True)
+
+        @case(f"session.get_leaderboard[players={players}]", quick)
+        def _(players=players):
+            # The host dashboard pattern: an answer arrives, the board is read
+            def run(session):
+                for i, player_id in enumerate(list(session.players)):
+                    session.submit_answer(player_id, 0, "a0" if i % 2 else "x")
+                    session.get_leaderboard()
+                    session.top_k(10)
+            return run, players, lambda: simulated_session(players, QUESTIONS)
+
+
+def _temp_dir():
+    """A scratch directory, removed when the current case finishes"""
+    return _case_resources.enter_context(tempfile.TemporaryDirectory(prefix="quizzy-bench-"))
+
+
+def _load_excel_cold(data, name):
+    """load_excel() on a file it has not seen before, so it parses it rather than hitting a cache"""
+    from core import deck_cache, loader
+
+    cache_root = _temp_dir()
+    registry = loader.get_global_deck_registry()
+    # Unreferenced decks leave the registry as soon as evict_idle() runs
+    registry.idle_seconds = 0
+    # Time the parse alone: each new deck would otherwise start a background
+    # similarity build that competes with the next runs for the CPU
+    registry.prepare = None
+    runs = iter(range(sys.maxsize))
+
+    def run():
+        # An empty disk cache each run, and the previous run's deck evicted
+        deck_cache._default_cache = deck_cache.DeckCache(os.path.join(cache_root, str(next(runs))))
+        registry.evict_idle()
+        return loader.load_excel(_NamedBytes(data, name), show_progress=False)
+    return run
+
+
+class _NamedBytes:
+    """Stands in for a Streamlit UploadedFile"""
+
+    def __init__(self, data, name):
+        self._data = data
+        self.name = name
+
+    def getvalue(self):
+        return self._data
+
+    def read(self):
+        return self._data
+
+    def seek(self, *args):
+        return 0
+
+
+def run_cases(pattern=None, quick=False, repeat=5):
+    global _case_resources
+    results = {}
+    for name, setup, is_quick in CASES:
+        if pattern and pattern not in name:
+            continue
+        if quick and not is_quick:
+            continue
+        with contextlib.ExitStack() as _case_resources:
+            results[name] = _time_case(name, setup, repeat)
+        _case_resources = None
+    return results
+
+
+def _time_case(name, setup, repeat):
+    run, operations, *prepare = setup()
+    if prepare:
+        prepare = prepare[0]
+    else:
+        prepare, run = (lambda: None), (lambda _, run=run: run())
+    run(prepare())  # warm-up: imports, caches, first-touch allocations
+    timings = []
+    while len(timings) < repeat or (sum(timings) < MIN_SECONDS and len(timings) < MAX_RUNS):
+        state = prepare()
+        start = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f"{name:<45} {best / operations * 1e6:>12.2f} us/op {operations / best:>14,.0f} ops/s", flush=True)
+    return {
+        "seconds_per_op": best / operations,
+        "median_seconds_per_op": statistics.median(timings) / operations,
+        "ops_per_second": operations / best if best else float("inf"),
+        "operations": operations,
+        "runs": len(timings),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return (report rows of (name, baseline s/op, current s/op, ratio, verdict), drift)
+
+    drift is the median current/baseline ratio over all compared cases (1.0
+    for small runs); each case's ratio is reported relative to it.
+    """
+    previous_results = baseline.get("results", {})
+    raw = {
+        name: current["seconds_per_op"] / previous_results[name]["seconds_per_op"]
+        for name, current in results.items()
+        if name in previous_results
+    }
+    drift = statistics.median(raw.values()) if len(raw) >= MIN_CASES_FOR_DRIFT else 1.0
+    rows = []
+    for name, current in results.items():
+        previous = previous_results.get(name)
+        if previous is None:
+            rows.append((name, None, current["seconds_per_op"], None, "new"))
+            continue
+        ratio = raw[name] / drift
+        if ratio > 1 + threshold:
+            verdict = "REGRESSION"
+        elif ratio < 1 - threshold:
+            verdict = "faster"
+        else:
+            verdict = "ok"
+        rows.append((name, previous["seconds_per_op"], current["seconds_per_op"], ratio, verdict))
+    return rows, drift
+
+
+def print_report(rows, threshold, drift=1.0):
+    print()
+    print(f"Compared with baseline (threshold {threshold:.0%}, ratios relative to the run's median drift {drift:.2f}x):")
+    print(f"{'case':<45} {'baseline us':>12} {'current us':>12} {'ratio':>7}  verdict")
+    for name, previous, current, ratio, verdict in rows:
+        previous_text = f"{previous * 1e6:>12.2f}" if previous is not None else f"{'-':>12}"
+        ratio_text = f"{ratio:>6.2f}x" if ratio is not None else f"{'-':>7}"
+        print(f"{name:<45} {previous_text} {current * 1e6:>12.2f} {ratio_text}  {verdict}")
+
+
+def environment():
+    """What a baseline's timings depend on besides the code"""
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def save_baseline(results, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    baseline = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **environment(),
+        },
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="skip the largest decks and sessions")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--fail", action="store_true", help="exit 1 if any case regressed")
+    args = parser.parse_args(argv)
+
+    _register_cases()
+    results = run_cases(args.pattern, args.quick, args.repeat)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.save:
+        if baseline is not None and (args.pattern or args.quick):
+            # Partial runs only update their own cases
+            results = {**baseline["results"], **results}
+        save_baseline(results, args.baseline)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save to create one.")
+        return 0
+    rows, drift = compare(results, baseline, args.threshold)
+    print_report(rows, args.threshold, drift)
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s)")
+    recorded = {key: baseline.get("meta", {}).get(key) for key in environment()}
+    if recorded != environment():
+        print(f"\nThe baseline was recorded elsewhere ({recorded['platform']}, Python {recorded['python']}, "
+              f"pandas {recorded['pandas']}); not failing. Run with --save to record one for this machine.")
+        return 0
+    return 1 if regressions and args.fail else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import hashlib
+import os
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "quizzy", "decks")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+_SUFFIX = ".arrow"
+
+
+def content_digest(data: bytes) -> str:
+    """SHA-256 hex digest used as the content address of an uploaded file."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DeckCache:
+    """On-disk cache of validated decks, keyed by the digest of the source file.
+
+    Decks are stored as Arrow IPC (feather) files, which load in milliseconds
+    compared to re-parsing a workbook. The directory is kept under max_bytes by
+    evicting the least recently used entries; a file's mtime is bumped on every
+    hit so it doubles as the LRU clock.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or os.environ.get("QUIZZY_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("QUIZZY_DECK_CACHE_MB", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024
+        self.max_bytes = max_bytes
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest + _SUFFIX)
+
+    def get(self, digest: str):
+        """Return the cached deck for digest, or None on a miss."""
+        path = self._path(digest)
+        try:
+            df = pd.read_feather(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return df
+
+    def put(self, digest: str, df: pd.DataFrame) -> bool:
+        """Persist df under digest. Returns False if it could not be cached."""
+        path = self._path(digest)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            df.reset_index(drop=True).to_feather(tmp_path)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError, TypeError):
+            # Columns Arrow cannot represent (e.g. mixed types) just skip the cache
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self._evict()
+        return True
+
+    def _evict(self):
+        try:
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(_SUFFIX):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+_default_cache = None
+
+
+def get_deck_cache() -> DeckCache:
+    """Process-wide deck cache using the QUIZZY_CACHE_DIR settings."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DeckCache()
+    return _default_cache
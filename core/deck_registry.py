@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import time
+import weakref
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+import streamlit as st
+
+DEFAULT_IDLE_SECONDS = 15 * 60
+
+
+@st.cache_resource
+def get_global_deck_registry():
+    """Get the deck registry singleton shared across all users"""
+    return DeckRegistry(prepare=_prepare_deck)
+
+
+def _prepare_deck(df: pd.DataFrame):
+    """Build a newly registered deck's similarity index off the request thread"""
+    from quiz.similarity import similarity_index
+
+    threading.Thread(target=similarity_index, args=(df,), name="quizzy-deck-prepare", daemon=True).start()
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Content hash of an in-memory deck (for decks that did not come from a file)."""
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    header = "\0".join(map(str, df.columns)).encode()
+    return hashlib.sha256(header + hashed.tobytes()).hexdigest()
+
+
+class DeckHandle:
+    """What a browser session keeps instead of a DataFrame.
+
+    The registry entry is released automatically when the handle is garbage
+    collected, e.g. when the Streamlit session that owns it goes away.
+    """
+
+    __slots__ = ("digest", "df", "__weakref__")
+
+    def __init__(self, registry: "DeckRegistry", digest: str, df: pd.DataFrame):
+        self.digest = digest
+        self.df = df
+        weakref.finalize(self, registry.release, digest)
+
+    def __len__(self):
+        return len(self.df)
+
+
+class _Entry:
+    __slots__ = ("df", "refs", "last_used")
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.refs = 0
+        self.last_used = time.monotonic()
+
+
+class DeckRegistry:
+    """Process-wide store of decks, one copy per distinct content hash.
+
+    Decks are shared read-only between every session holding a handle, so
+    memory grows with the number of distinct decks rather than users. Entries
+    nobody references are dropped after idle_seconds. prepare, if given, is
+    called once with each newly stored deck (outside the lock), e.g. to
+    precompute per-deck indexes.
+    """
+
+    def __init__(self, idle_seconds: float = DEFAULT_IDLE_SECONDS,
+                 prepare: Optional[Callable[[pd.DataFrame], None]] = None):
+        self.idle_seconds = idle_seconds
+        self.prepare = prepare
+        self._entries: Dict[str, _Entry] = {}
+        # Re-entrant because handle finalizers may run (via GC) while held
+        self._lock = threading.RLock()
+
+    def acquire(self, digest: str) -> Optional[DeckHandle]:
+        """Return a new handle to an already registered deck, or None."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            return self._new_handle(digest, entry)
+
+    def register(self, digest: str, df: pd.DataFrame) -> DeckHandle:
+        """Store df under digest (keeping any existing copy) and return a handle."""
+        with self._lock:
+            self._evict_idle_locked()
+            entry = self._entries.get(digest)
+            added = entry is None
+            if added:
+                entry = self._entries[digest] = _Entry(df)
+            handle = self._new_handle(digest, entry)
+        if added and self.prepare is not None:
+            self.prepare(entry.df)
+        return handle
+
+    def register_frame(self, df: pd.DataFrame) -> DeckHandle:
+        return self.register(frame_digest(df), df)
+
+    def release(self, digest: str):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+                entry.last_used = time.monotonic()
+
+    def evict_idle(self) -> int:
+        """Drop unreferenced decks idle for longer than idle_seconds."""
+        with self._lock:
+            return self._evict_idle_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "decks": len(self._entries),
+                "handles": sum(entry.refs for entry in self._entries.values()),
+                "rows": sum(len(entry.df) for entry in self._entries.values()),
+            }
+
+    def _new_handle(self, digest: str, entry: _Entry) -> DeckHandle:
+        entry.refs += 1
+        entry.last_used = time.monotonic()
+        return DeckHandle(self, digest, entry.df)
+
+    def _evict_idle_locked(self) -> int:
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [
+            digest for digest, entry in self._entries.items()
+            if entry.refs == 0 and entry.last_used < cutoff
+        ]
+        for digest in idle:
+            del self._entries[digest]
+        return len(idle)
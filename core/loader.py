@@ -1,31 +1,241 @@
+import io
 import os
 
 import pandas as pd
 import streamlit as st
+from core.deck_cache import content_digest, get_deck_cache
+from core.deck_registry import get_global_deck_registry
 from core.validator import (
+    OPTIONAL_COLUMNS,
+    REQUIRED_COLUMNS,
     ensure_optional_columns,
     get_missing_required_columns,
     validate_columns,
 )
 
-@st.cache_data
-def _read_tabular(file):
-    name = getattr(file, "name", "")
+KNOWN_COLUMNS = REQUIRED_COLUMNS + OPTIONAL_COLUMNS
+CATEGORICAL_COLUMNS = ["pos", "semantic_type"]
+CHUNK_ROWS = 5000
+
+
+def _read_bytes(file):
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as fh:
+            return fh.read()
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    data = file.read()
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return data
+
+
+def _iter_csv(data, chunk_rows):
+    """Yield the header, then (chunk, fraction_read) pairs for a CSV.
+
+    Only the known columns are parsed, chunk_rows at a time.
+    """
+    yield list(pd.read_csv(io.BytesIO(data), nrows=0).columns)
+    buffer = io.BytesIO(data)
+    with pd.read_csv(
+        buffer,
+        usecols=lambda col: col in KNOWN_COLUMNS,
+        dtype="string",
+        chunksize=chunk_rows,
+    ) as reader:
+        for chunk in reader:
+            yield chunk, buffer.tell() / max(len(data), 1)
+
+
+def _iter_xlsx(data, chunk_rows):
+    """Yield the header, then (chunk, fraction_read) pairs for the first sheet.
+
+    Uses openpyxl's read_only mode, which streams rows from the sheet XML
+    instead of building the whole workbook in memory.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = ["" if value is None else str(value) for value in next(rows, ())]
+        yield header
+
+        positions = {}
+        for i, name in enumerate(header):
+            if name in KNOWN_COLUMNS and name not in positions:
+                positions[name] = i
+        total_rows = max((sheet.max_row or 0) - 1, 1)
+
+        records = []
+        read = 0
+        for row in rows:
+            records.append(tuple(row[i] if i < len(row) else None for i in positions.values()))
+            if len(records) >= chunk_rows:
+                read += len(records)
+                yield pd.DataFrame.from_records(records, columns=list(positions)), min(read / total_rows, 1.0)
+                records = []
+        if records:
+            yield pd.DataFrame.from_records(records, columns=list(positions)), 1.0
+    finally:
+        workbook.close()
+
+
+def _iter_legacy_excel(data, chunk_rows):
+    # .xls has no streaming reader; fall back to one pass over the known columns
+    df = pd.read_excel(io.BytesIO(data), usecols=lambda col: col in KNOWN_COLUMNS)
+    yield list(df.columns)
+    yield df, 1.0
+
+
+def _normalize_chunk(chunk):
+    """Return (normalized chunk, number of rows dropped)."""
+    chunk = ensure_optional_columns(chunk)
+    chunk = chunk[KNOWN_COLUMNS].astype("string")
+    for col in KNOWN_COLUMNS:
+        chunk[col] = chunk[col].str.strip()
+    # A row without chinese/pinyin/english cannot become a question
+    kept = chunk.dropna(how="any", subset=REQUIRED_COLUMNS)
+    return kept.fillna({col: "" for col in OPTIONAL_COLUMNS}), len(chunk) - len(kept)
+
+
+def read_deck(data, name, chunk_rows=CHUNK_ROWS, progress=None):
+    """Stream a CSV/Excel file into a normalized deck.
+
+    Only the six known columns are read, chunk_rows at a time, and each chunk
+    is validated and normalized as it arrives. progress, if given, is called
+    as progress(fraction, rows_read) after every chunk.
+
+    Rows missing a chinese, pinyin or english value are skipped, since
+    they cannot become questions.
+
+    Returns (deck, missing_required_columns, rows_dropped); deck is None
+    when columns are missing.
+    """
     _, ext = os.path.splitext(name.lower())
-    if ext in {".csv"}:
-        return pd.read_csv(file)
-    if ext in {".xlsx", ".xls"}:
-        return pd.read_excel(file)
-    # Try Excel by default if extension is missing or unknown.
-    return pd.read_excel(file)
-
-
-def load_excel(file):
-    df = _read_tabular(file)
-    if validate_columns(df):
-        return ensure_optional_columns(df)
-
-    missing = get_missing_required_columns(df)
-    missing_text = ", ".join(missing) if missing else "unknown"
-    st.error(f"Invalid file: missing required columns: {missing_text}")
-    return None
+    if ext == ".csv":
+        chunks = _iter_csv(data, chunk_rows)
+    elif ext == ".xls":
+        chunks = _iter_legacy_excel(data, chunk_rows)
+    else:
+        # Try Excel by default if extension is missing or unknown.
+        chunks = _iter_xlsx(data, chunk_rows)
+
+    header = pd.DataFrame(columns=next(chunks))
+    if not validate_columns(header):
+        chunks.close()
+        return None, get_missing_required_columns(header), 0
+
+    parts = []
+    rows_read = 0
+    dropped = 0
+    for chunk, fraction in chunks:
+        part, part_dropped = _normalize_chunk(chunk)
+        parts.append(part)
+        dropped += part_dropped
+        rows_read += len(chunk)
+        if progress is not None:
+            progress(fraction, rows_read)
+
+    if parts:
+        deck = pd.concat(parts, ignore_index=True)
+    else:
+        deck = pd.DataFrame({col: pd.Series(dtype="string") for col in KNOWN_COLUMNS})
+    for col in CATEGORICAL_COLUMNS:
+        deck[col] = deck[col].astype("category")
+    return deck, [], dropped
+
+
+class _ProgressBar:
+    """Streamlit progress bar that only appears once parsing actually starts."""
+
+    def __init__(self):
+        self.bar = None
+
+    def __call__(self, fraction, rows_read):
+        text = f"Reading dataset... {rows_read:,} rows"
+        if self.bar is None:
+            self.bar = st.progress(fraction, text=text)
+        else:
+            self.bar.progress(fraction, text=text)
+
+    def clear(self):
+        if self.bar is not None:
+            self.bar.empty()
+
+
+def load_deck(file, show_progress=True):
+    """Load an uploaded deck into the shared registry and return its handle.
+
+    Streamlit passes the same UploadedFile (same file_id) on every rerun,
+    so its digest is remembered in the session and the bytes are only read
+    and hashed again if the registry has since dropped the deck.
+
+    Returns None (after showing an error) if the file is missing required
+    columns.
+    """
+    registry = get_global_deck_registry()
+    file_id = getattr(file, "file_id", None)
+    digests = st.session_state.setdefault("deck_digests", {}) if file_id is not None else {}
+    if file_id in digests:
+        handle = registry.acquire(digests[file_id])
+        if handle is not None:
+            return handle
+
+    data = _read_bytes(file)
+    digest = content_digest(data)
+    if file_id is not None:
+        digests[file_id] = digest
+
+    # Another session already holds this exact deck: share it
+    handle = registry.acquire(digest)
+    if handle is not None:
+        return handle
+
+    # Same bytes as a previous upload: skip parsing entirely
+    cache = get_deck_cache()
+    df = cache.get(digest)
+    if df is not None:
+        return registry.register(digest, df)
+
+    name = file if isinstance(file, (str, os.PathLike)) else getattr(file, "name", "")
+    progress = _ProgressBar() if show_progress else None
+    try:
+        df, missing, dropped = read_deck(data, os.fspath(name), progress=progress)
+    finally:
+        if progress is not None:
+            progress.clear()
+
+    if df is None:
+        st.error(f"Invalid file: missing required columns: {', '.join(missing)}")
+        return None
+    if dropped:
+        st.warning(f"Skipped {dropped:,} row(s) without a Chinese word, pinyin or English meaning.")
+
+    cache.put(digest, df)
+    return registry.register(digest, df)
+
+
+def _sample_df():
+    """Generate sample dataset"""
+    data = {
+        "chinese": ["你好", "谢谢", "再见", "早上好", "晚安", "对不起", "没关系", "请", "是", "不是"],
+        "pinyin": ["nǐ hǎo", "xiè xie", "zài jiàn", "zǎo shàng hǎo", "wǎn ān", "duì bu qǐ", "méi guān xi", "qǐng", "shì", "bú shì"],
+        "english": ["hello", "thanks", "goodbye", "good morning", "good night", "sorry", "no problem", "please", "yes", "no"],
+        "example_sentence": ["你好！", "谢谢你。", "再见！", "早上好！", "晚安！", "对不起。", "没关系。", "请坐。", "是的。", "不是。"],
+        "pos": ["interjection", "verb", "interjection", "interjection", "interjection", "verb", "phrase", "verb", "verb", "verb"],
+        "semantic_type": ["greeting", "gratitude", "farewell", "greeting", "farewell", "apology", "response", "courtesy", "affirmation", "negation"],
+    }
+    return pd.DataFrame(data)
+
+
+@st.cache_resource
+def sample_deck():
+    """The sample deck shared by the solo and host pages, registered (and hashed) once per process"""
+    return get_global_deck_registry().register_frame(_sample_df())
+
+
+def load_excel(file, show_progress=True):
+    handle = load_deck(file, show_progress=show_progress)
+    return handle.df if handle is not None else None
@@ -0,0 +1,290 @@
+import functools
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.profiler import profiled
+
+# Metrics are off unless QUIZZY_METRICS is set: then every metric is a shared
+# no-op object, and timed()/timed_render() hand back the undecorated function.
+ENABLED = os.environ.get("QUIZZY_METRICS", "").lower() in ("1", "true", "yes", "on")
+
+# Seconds; spans a cached lookup to a slow full-page render
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Counter:
+    """Monotonically increasing count; each metric has its own small lock"""
+
+    kind = "counter"
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def samples(self, name: str, labels) -> List[str]:
+        return [f"{name}{_format_labels(labels)} {_format_value(self._value)}"]
+
+
+class Gauge:
+    """Value that goes up and down, or is computed by a callback at export time"""
+
+    kind = "gauge"
+
+    def __init__(self, callback: Optional[Callable[[], float]] = None):
+        self._value = 0
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def samples(self, name: str, labels) -> List[str]:
+        value = self._callback() if self._callback is not None else self._value
+        return [f"{name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect plus three additions under a lock"""
+
+    kind = "histogram"
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self) -> _Timer:
+        """Context manager observing how long its body takes"""
+        return _Timer(self)
+
+    def samples(self, name: str, labels) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class _NullMetric:
+    """Stands in for every metric while metrics are disabled"""
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def time(self):
+        return _NULL_TIMER
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_METRIC = _NullMetric()
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """Named metric families, each holding one series per label set
+
+    Getting a metric is get-or-create, so modules can declare the metrics they
+    record at import time. self._lock guards registration only; recording
+    touches just the metric's own lock.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._families: Dict[str, Tuple[str, str, Dict[tuple, object]]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, help_text: str, kind: str, labels: Optional[dict], factory):
+        if not self.enabled:
+            return _NULL_METRIC
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help_text, {}))
+            if family[0] != kind:
+                raise ValueError(f"metric {name} is already registered as a {family[0]}")
+            series = family[2]
+            if key not in series:
+                series[key] = factory()
+            return series[key]
+
+    def counter(self, name: str, help_text: str, labels: Optional[dict] = None):
+        return self._get(name, help_text, "counter", labels, Counter)
+
+    def gauge(self, name: str, help_text: str, labels: Optional[dict] = None, callback=None):
+        """A gauge; with callback, its value is computed whenever metrics are exported"""
+        metric = self._get(name, help_text, "gauge", labels, lambda: Gauge(callback))
+        if callback is not None and metric is not _NULL_METRIC:
+            # Re-registering (e.g. a new session manager) replaces the callback
+            metric._callback = callback
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Optional[dict] = None, buckets=DEFAULT_BUCKETS):
+        return self._get(name, help_text, "histogram", labels, lambda: Histogram(buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            families = [(name, kind, help_text, list(series.items())) for name, (kind, help_text, series) in self._families.items()]
+        lines = []
+        for name, kind, help_text, series in sorted(families):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series:
+                lines.extend(metric.samples(name, labels))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Atomically replace path with the current metrics (node_exporter textfile style)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry(enabled=ENABLED)
+
+
+def counter(name: str, help_text: str, labels: Optional[dict] = None):
+    return REGISTRY.counter(name, help_text, labels)
+
+
+def gauge(name: str, help_text: str, labels: Optional[dict] = None, callback=None):
+    return REGISTRY.gauge(name, help_text, labels, callback)
+
+
+def histogram(name: str, help_text: str, labels: Optional[dict] = None, buckets=DEFAULT_BUCKETS):
+    return REGISTRY.histogram(name, help_text, labels, buckets)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
+
+
+def timed(metric):
+    """Decorator observing each call's duration in a histogram (even if it raises)
+
+    With metrics disabled the function is returned unchanged.
+    """
+    def decorate(func):
+        if metric is _NULL_METRIC:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def timed_render(func):
+    """Time a render_* page function under quizzy_page_render_seconds{page=...}
+
+    The page is also a section of profiled reruns (see core.profiler).
+
+    st.rerun() and st.stop() unwind through the page as exceptions; those
+    partial renders are counted too. Apply it to leaf pages only, not to
+    routers that call them, or the page's time is observed twice.
+    """
+    return timed(histogram(
+        "quizzy_page_render_seconds", "Time spent rendering a page", {"page": func.__name__},
+    ))(profiled(func))
+
+
+_exporter: Optional[threading.Thread] = None
+
+
+def start_file_export(path: str, interval: float = 15.0):
+    """Rewrite path with the current metrics every interval seconds (once per process)"""
+    global _exporter
+    if not REGISTRY.enabled or _exporter is not None:
+        return
+
+    def loop():
+        while True:
+            try:
+                REGISTRY.write(path)
+            except OSError:
+                # Unwritable right now (e.g. directory missing); try again next time
+                pass
+            time.sleep(interval)
+
+    _exporter = threading.Thread(target=loop, name="quizzy-metrics-export", daemon=True)
+    _exporter.start()
@@ -0,0 +1,240 @@
+import collections
+import functools
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+# Profiling is opt-in. QUIZZY_PROFILE=1 profiles every rerun; otherwise, with
+# QUIZZY_PROFILE_TOKEN set, only reruns whose URL has ?profile=<token>. With
+# neither set, profiled() hands back the undecorated function.
+ALWAYS = os.environ.get("QUIZZY_PROFILE", "").lower() in ("1", "true", "yes", "on")
+TOKEN = os.environ.get("QUIZZY_PROFILE_TOKEN", "")
+ENABLED = ALWAYS or bool(TOKEN)
+PROFILE_DIR = os.environ.get("QUIZZY_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "quizzy-profiles")
+SAMPLE_INTERVAL = float(os.environ.get("QUIZZY_PROFILE_INTERVAL", "0.005"))
+
+_local = threading.local()
+
+
+def requested(query_params) -> bool:
+    """Whether this rerun should be profiled"""
+    if ALWAYS:
+        return True
+    token = query_params.get("profile") if TOKEN else None
+    return bool(token) and hmac.compare_digest(token, TOKEN)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler:
+    """One background thread sampling the stacks of every thread being profiled
+
+    Stacks are cut at the frame profiling started in, so they begin at main()
+    rather than deep inside Streamlit's script runner.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._targets = {}  # thread id -> (root frame, Counter of collapsed stacks)
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def add(self, thread_id: int, root, counts: collections.Counter):
+        with self._cond:
+            self._targets[thread_id] = (root, counts)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quizzy-profiler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def remove(self, thread_id: int):
+        with self._cond:
+            self._targets.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._targets:
+                    self._cond.wait()
+                # Sampling under the lock means remove() returns only once
+                # nothing will touch that rerun's counts any more
+                frames = sys._current_frames()
+                for thread_id, (root, counts) in self._targets.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        if frame.f_code.co_filename != __file__:
+                            # Leave out profiled() wrappers: they'd double every section
+                            stack.append(_frame_label(frame.f_code))
+                        if frame is root:
+                            break
+                        frame = frame.f_back
+                    if frame is root:
+                        counts[";".join(reversed(stack))] += 1
+                del frames
+            time.sleep(self.interval)
+
+
+_sampler = _Sampler(SAMPLE_INTERVAL)
+
+
+class RerunProfile:
+    """Wall and CPU time of one rerun, split by section, plus its sampled stacks"""
+
+    def __init__(self, page: str):
+        self.page = page
+        self.sections: Dict[str, list] = {}  # name -> [calls, wall, cpu]
+        self.stacks = collections.Counter()
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def add(self, name: str, wall: float, cpu: float):
+        totals = self.sections.setdefault(name, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += wall
+        totals[2] += cpu
+
+    def to_dict(self) -> dict:
+        return {
+            "page": self.page,
+            "time": time.time(),
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "samples": sum(self.stacks.values()),
+            "sections": {
+                name: {"calls": calls, "wall": wall, "cpu": cpu}
+                for name, (calls, wall, cpu) in self.sections.items()
+            },
+        }
+
+
+class ProfileStore:
+    """Per-page aggregates on disk
+
+    For each page, <page>.json holds rerun counts and summed section times,
+    and <page>.collapsed the sampled stacks in the collapsed format read by
+    flamegraph.pl and speedscope. Every rerun is also appended to
+    reruns.jsonl. Existing files are merged into on first use, so
+    aggregates survive restarts.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR):
+        self.directory = directory
+        self._pages: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, page: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{page}{suffix}")
+
+    def _load(self, page: str) -> dict:
+        aggregate = {"reruns": 0, "wall": 0.0, "cpu": 0.0, "sections": {}, "stacks": collections.Counter()}
+        try:
+            with open(self._path(page, ".json"), encoding="utf-8") as f:
+                aggregate.update(json.load(f))
+            with open(self._path(page, ".collapsed"), encoding="utf-8") as f:
+                for line in f:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    aggregate["stacks"][stack] += int(count)
+        except (OSError, ValueError):
+            pass
+        return aggregate
+
+    def add(self, profile: RerunProfile):
+        record = profile.to_dict()
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            aggregate = self._pages.get(profile.page)
+            if aggregate is None:
+                aggregate = self._pages[profile.page] = self._load(profile.page)
+            aggregate["reruns"] += 1
+            aggregate["wall"] += profile.wall
+            aggregate["cpu"] += profile.cpu
+            for name, section in record["sections"].items():
+                totals = aggregate["sections"].setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+                for key in totals:
+                    totals[key] += section[key]
+            aggregate["stacks"].update(profile.stacks)
+
+            summary = {key: value for key, value in aggregate.items() if key != "stacks"}
+            self._write(self._path(profile.page, ".json"), json.dumps(summary, indent=2, sort_keys=True))
+            self._write(
+                self._path(profile.page, ".collapsed"),
+                "".join(f"{stack} {count}\n" for stack, count in sorted(aggregate["stacks"].items())),
+            )
+            with open(os.path.join(self.directory, "reruns.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def _write(self, path: str, text: str):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+_store: Optional[ProfileStore] = None
+
+
+def get_store() -> ProfileStore:
+    global _store
+    if _store is None:
+        _store = ProfileStore()
+    return _store
+
+
+class profile_rerun:
+    """Context manager profiling one script run: wrap the call to main() in it
+
+    Exceptions (including st.rerun()/st.stop() unwinding) pass through; the
+    partial rerun is still recorded.
+    """
+
+    def __init__(self, page: str, enabled: bool = True):
+        self.profile = RerunProfile(page) if enabled else None
+
+    def __enter__(self):
+        if self.profile is not None:
+            _local.profile = self.profile
+            self._thread_id = threading.get_ident()
+            _sampler.add(self._thread_id, sys._getframe(1), self.profile.stacks)
+            self._wall = time.perf_counter()
+            self._cpu = time.thread_time()
+        return self.profile
+
+    def __exit__(self, *exc):
+        if self.profile is not None:
+            self.profile.wall = time.perf_counter() - self._wall
+            self.profile.cpu = time.thread_time() - self._cpu
+            _sampler.remove(self._thread_id)
+            _local.profile = None
+            try:
+                get_store().add(self.profile)
+            except OSError:
+                # Profiling must never break the page
+                pass
+        return False
+
+
+def profiled(func):
+    """Time each call as a section of the rerun being profiled, if any"""
+    if not ENABLED:
+        return func
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = getattr(_local, "profile", None)
+        if profile is None:
+            return func(*args, **kwargs)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.add(name, time.perf_counter() - wall, time.thread_time() - cpu)
+    return wrapper
@@ -0,0 +1,123 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from quiz.calibration import load_difficulty, row_difficulty
+from quiz.session import initialize_quiz
+
+LEVEL_NAMES = ("Easy", "Medium", "Hard")
+# Points multiplier per level: a correct hard answer is worth three easy
+# ones, so players who were served different questions stay comparable
+LEVEL_WEIGHTS = (0.5, 1.0, 1.5)
+LEVELS = len(LEVEL_WEIGHTS)
+START_LEVEL = LEVELS // 2
+# Running accuracy is smoothed as if every player had already answered this
+# many questions, half of them correctly
+PRIOR_ANSWERS = 6
+
+
+def deck_difficulty(df: pd.DataFrame, deck: Optional[str] = None) -> np.ndarray:
+    """Difficulty of every deck row: calibrated if possible, else word length
+
+    Uses the deck's quiz.calibration table when one exists (rows without
+    data get its median). An uncalibrated deck falls back to the number of
+    characters in each word, longer words counting as harder.
+    """
+    table = load_difficulty(deck) if deck else None
+    if table is not None:
+        return row_difficulty(table, len(df))
+    return df["chinese"].astype(str).str.len().to_numpy(dtype=np.float32)
+
+
+def build_pool(df: pd.DataFrame, settings: dict, rng: np.random.Generator = None) -> Tuple[list, List[int]]:
+    """Questions for an adaptive game and the difficulty level of each
+
+    The deck is sorted by difficulty and cut into LEVELS equal strata, and
+    num_questions words are drawn from every stratum, so a player can stay
+    on one level for the whole game. The starting level comes first: pool
+    question 0 is everyone's first question, as in a fixed game.
+    """
+    rng = rng or np.random.default_rng()
+    # Random tie-break, so equally hard words are drawn in random order
+    order = np.lexsort((rng.random(len(df)), deck_difficulty(df, settings.get("deck"))))
+    strata = np.array_split(order, LEVELS)
+    rows, levels = [], []
+    for level in [START_LEVEL] + [level for level in range(LEVELS) if level != START_LEVEL]:
+        picked = rng.choice(strata[level], min(settings["num_questions"], len(strata[level])), replace=False)
+        rows.extend(picked.tolist())
+        levels.extend([level] * len(picked))
+    questions = initialize_quiz(df, {**settings, "num_questions": len(rows)}, rows=rows)
+    return questions, levels
+
+
+class PlayerTrack:
+    """One player's way through an AdaptivePool: a cursor per bucket and running accuracy"""
+
+    __slots__ = ("cursors", "correct", "answered")
+
+    def __init__(self, cursors: List[int], correct: int = 0, answered: int = 0):
+        self.cursors = cursors
+        self.correct = correct
+        self.answered = answered
+
+    def record(self, is_correct: bool):
+        self.correct += int(is_correct)
+        self.answered += 1
+
+
+class AdaptivePool:
+    """Difficulty buckets over a game's shared question list
+
+    levels[i] is the level of session.questions[i]. Each bucket holds its
+    question numbers in asking order; the buckets are built once per session
+    and only read afterwards. Players keep nothing but a PlayerTrack, so
+    picking a next question is O(LEVELS) and no question is copied per
+    player. Every pick takes the next unasked question of a bucket, so the
+    questions a player has seen from each bucket are always a prefix of it.
+    """
+
+    __slots__ = ("levels", "buckets")
+
+    def __init__(self, levels):
+        self.levels = np.asarray(levels, dtype=np.int8)
+        self.buckets = [np.flatnonzero(self.levels == level).tolist() for level in range(LEVELS)]
+
+    def level_of(self, question_num: int) -> int:
+        return int(self.levels[question_num])
+
+    def weight(self, question_num: int) -> float:
+        return LEVEL_WEIGHTS[self.levels[question_num]]
+
+    def track(self, player: dict) -> PlayerTrack:
+        """Rebuild a player's track from their stored answers and current question
+
+        For players loaded from a store or journal; live sessions update
+        tracks incrementally.
+        """
+        asked = {answer["question_num"] for answer in player["answers"]}
+        if not player["finished"]:
+            asked.add(player["current_question"])
+        asked = [q for q in asked if 0 <= q < len(self.levels)]
+        cursors = np.bincount(self.levels[asked], minlength=LEVELS).tolist()
+        correct = sum(1 for answer in player["answers"] if answer["is_correct"])
+        return PlayerTrack(cursors, correct, len(player["answers"]))
+
+    def next_question(self, track: PlayerTrack) -> Optional[int]:
+        """Take the player's next question, or None if every bucket is used up
+
+        The level follows running accuracy, smoothed towards one half by
+        PRIOR_ANSWERS virtual answers: a new player needs three correct
+        answers in a row to reach Hard, and four wrong ones to drop to Easy.
+        An exhausted bucket falls back to the nearest level with questions
+        left.
+        """
+        # LEVELS * (correct + PRIOR_ANSWERS / 2) / (answered + PRIOR_ANSWERS), in integers
+        numerator = (2 * track.correct + PRIOR_ANSWERS) * LEVELS
+        target = min(LEVELS - 1, numerator // (2 * (track.answered + PRIOR_ANSWERS)))
+        for distance in range(LEVELS):
+            for level in (target - distance, target + distance):
+                if 0 <= level < LEVELS and track.cursors[level] < len(self.buckets[level]):
+                    track.cursors[level] += 1
+                    return self.buckets[level][track.cursors[level] - 1]
+        return None
@@ -0,0 +1,168 @@
+import contextlib
+import os
+import struct
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import msgpack
+
+# Every record is a 5-byte header (kind, payload length) followed by a msgpack payload
+_HEADER = struct.Struct("<BI")
+
+SESSION = 0  # first record: host, settings and questions
+EVENT = 1  # join, leave, start, submit or finish
+SNAPSHOT = 2  # full player state after the first "n" events
+
+SNAPSHOT_EVERY = 500
+
+
+class SessionJournal:
+    """Append-only log of everything that happened in one GameSession.
+
+    Appending packs the event and writes it with a single write() on a file
+    opened in append mode, so it is O(1) and records from concurrent writers
+    never interleave. Every snapshot_every events the session also appends a
+    snapshot of its full state: replay() then starts from the newest snapshot
+    at or before the requested point instead of from the first event.
+
+    With keep_history=False each snapshot also compacts the file, dropping
+    the events it covers (and with them the ability to replay those points).
+    Compaction swaps the file out, so only use it when a single process
+    writes the journal.
+    """
+
+    def __init__(self, path: str, snapshot_every: int = SNAPSHOT_EVERY, keep_history: bool = True):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.keep_history = keep_history
+        with contextlib.closing(iter_records(path)) as records:
+            self.is_new = next(records, None) is None
+        self._since_snapshot = 0
+        self._file = open(path, "ab", buffering=0)
+
+    def _write(self, kind: int, payload):
+        data = msgpack.packb(payload, default=str)
+        self._file.write(_HEADER.pack(kind, len(data)) + data)
+
+    def write_session(self, record: dict):
+        """Write the session record; must come before any event"""
+        self._write(SESSION, record)
+        self.is_new = False
+
+    def append(self, event: dict) -> bool:
+        """Write one event. Returns True once a snapshot is due."""
+        self._write(EVENT, event)
+        self._since_snapshot += 1
+        return self._since_snapshot >= self.snapshot_every
+
+    def write_snapshot(self, events: int, state: dict):
+        """Write the session state as it stands after the first `events` events"""
+        self._write(SNAPSHOT, [events, state])
+        self._since_snapshot = 0
+        if not self.keep_history:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the file as the session record, the newest snapshot and the events after it"""
+        records = list(iter_records(self.path))
+        last_snapshot = max((i for i, (kind, _, _, _) in enumerate(records) if kind == SNAPSHOT), default=None)
+        if last_snapshot is None:
+            return
+        keep = records[:1] + records[last_snapshot:]
+        tmp_path = f"{self.path}.tmp"
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            for _, offset, length, _ in keep:
+                src.seek(offset)
+                dst.write(src.read(_HEADER.size + length))
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "ab", buffering=0)
+
+    def close(self):
+        self._file.close()
+
+
+def iter_records(path: str) -> Iterator[Tuple[int, int, int, int]]:
+    """Yield (kind, offset, payload length, events so far) for each complete record.
+
+    Only headers (and the event count at the front of each snapshot) are
+    read, never whole payloads. A record cut short by a crash mid-write ends
+    the journal.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+        events = 0
+        while offset + _HEADER.size <= size:
+            f.seek(offset)
+            kind, length = _HEADER.unpack(f.read(_HEADER.size))
+            if offset + _HEADER.size + length > size:
+                return
+            if kind == EVENT:
+                events += 1
+            elif kind == SNAPSHOT:
+                # Snapshots are [event count, state]; a compacted journal
+                # starts counting from its first one
+                unpacker = msgpack.Unpacker()
+                unpacker.feed(f.read(min(length, 16)))
+                unpacker.read_array_header()
+                events = unpacker.unpack()
+            yield kind, offset, length, events
+            offset += _HEADER.size + length
+
+
+def read_journal(path: str, until: Optional[int] = None) -> Tuple[dict, Optional[dict], List[dict], int]:
+    """Load what replay needs to rebuild the state after `until` events (all by default).
+
+    Returns (session record, newest snapshot state covering at most `until`
+    events or None, the events after it up to `until`, total events applied).
+    Raises ValueError if `until` falls before the journal's first snapshot
+    when the events leading up to it are gone (compacted, or never written).
+    """
+    records = list(iter_records(path))
+    if not records or records[0][0] != SESSION:
+        raise ValueError(f"{path} is not a session journal")
+    earliest = records[1][3] if len(records) > 1 and records[1][0] == SNAPSHOT else 0
+    if until is not None and until < earliest:
+        raise ValueError(f"{path} can only be replayed from event {earliest} on, not {until}")
+
+    start = 0
+    for i, (kind, _, _, events) in enumerate(records):
+        if until is not None and events > until:
+            break
+        if kind == SNAPSHOT:
+            start = i
+
+    with open(path, "rb") as f:
+        def load(offset: int, length: int):
+            f.seek(offset + _HEADER.size)
+            return msgpack.unpackb(f.read(length), strict_map_key=False)
+
+        session = load(records[0][1], records[0][2])
+        snapshot = None
+        applied = records[start][3]
+        if start:
+            snapshot = load(records[start][1], records[start][2])[1]
+        events = [
+            load(offset, length)
+            for kind, offset, length, n in records[start + 1:]
+            if kind == EVENT and (until is None or n <= until)
+        ]
+    return session, snapshot, events, applied + len(events)
+
+
+def encode_players(players: Dict[str, dict]) -> Dict[str, dict]:
+    """Player dicts in a form msgpack can store (datetimes become timestamps)"""
+    return {
+        player_id: {**player, "joined_at": player["joined_at"].timestamp()}
+        for player_id, player in players.items()
+    }
+
+
+def decode_players(players: Dict[str, dict]) -> Dict[str, dict]:
+    return {
+        player_id: {**player, "joined_at": datetime.fromtimestamp(player["joined_at"])}
+        for player_id, player in players.items()
+    }
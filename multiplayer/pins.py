@@ -0,0 +1,86 @@
+import random
+import threading
+from collections import deque
+
+PIN_DIGITS = 6
+_FEISTEL_ROUNDS = 4
+
+
+class PinSpaceExhausted(RuntimeError):
+    """Every PIN is held by a live session"""
+
+
+class PinAllocator:
+    """Hands out game PINs that no live session holds, in O(1)
+
+    Fresh PINs come from a keyed Feistel permutation of 0..10**digits-1,
+    walked by a counter: they look random but never repeat, without storing
+    a shuffled list of a million numbers. Released PINs queue up FIFO and
+    are handed out again only once the fresh ones run out, so the PIN of a
+    game that just closed doesn't go straight to a new one.
+
+    PINs can also be reserved (e.g. sessions loaded from a shared store);
+    allocation skips anything currently in use.
+    """
+
+    def __init__(self, digits: int = PIN_DIGITS, rng: random.Random = None):
+        self.digits = digits
+        self.size = 10 ** digits
+        rng = rng or random.SystemRandom()
+        # Smallest even-width Feistel network covering the space; values that
+        # land outside it are walked forward until they come back in range
+        bits = (self.size - 1).bit_length()
+        self._half = (bits + 1) // 2
+        self._mask = (1 << self._half) - 1
+        self._keys = [rng.getrandbits(32) for _ in range(_FEISTEL_ROUNDS)]
+        self._next = 0
+        self._released = deque()
+        self._in_use = set()
+        self._lock = threading.Lock()
+
+    def _feistel(self, value: int) -> int:
+        left, right = value >> self._half, value & self._mask
+        for key in self._keys:
+            left, right = right, left ^ (((right * 0x9E3779B1) ^ key) >> 7 & self._mask)
+        return (left << self._half) | right
+
+    def _permute(self, index: int) -> int:
+        value = self._feistel(index)
+        while value >= self.size:
+            value = self._feistel(value)
+        return value
+
+    def allocate(self) -> str:
+        """Return an unused PIN, or raise PinSpaceExhausted"""
+        with self._lock:
+            while True:
+                if self._next < self.size:
+                    pin = self._permute(self._next)
+                    self._next += 1
+                elif self._released:
+                    pin = self._released.popleft()
+                else:
+                    raise PinSpaceExhausted(f"all {self.size:,} game PINs are in use")
+                if pin not in self._in_use:
+                    self._in_use.add(pin)
+                    return self.format(pin)
+
+    def reserve(self, pin: str):
+        """Mark a PIN taken elsewhere as in use"""
+        with self._lock:
+            self._in_use.add(int(pin))
+
+    def release(self, pin: str):
+        """Return a PIN to the pool once its session is gone"""
+        with self._lock:
+            value = int(pin)
+            if value in self._in_use:
+                self._in_use.remove(value)
+                self._released.append(value)
+
+    def in_use(self) -> int:
+        with self._lock:
+            return len(self._in_use)
+
+    def format(self, pin: int) -> str:
+        return f"{pin:0{self.digits}d}"
@@ -1,41 +1,110 @@
+# Multiplayer module for Kahoot-like features
 import io
 import base64
+import threading
+from collections import OrderedDict
 import qrcode
-from PIL import Image
+from core import metrics
 
+QR_CACHE_SIZE = 128
+QR_BORDER = 4
 
-def generate_qr_code(data: str, size: int = 300) -> str:
-    """
-    Generate a QR code and return it as a base64-encoded PNG string
-    
-    Args:
-        data: The data to encode in the QR code (e.g., join URL)
-        size: Size of the QR code in pixels
-    
-    Returns:
-        Base64-encoded PNG image string
-    """
+_qr_cache = OrderedDict()  # (data, size, fmt) -> data URI
+_qr_cache_lock = threading.Lock()
+
+QR_RENDER_SECONDS = metrics.histogram("quizzy_qr_render_seconds", "Time to render a QR code (cache misses only)")
+QR_CACHE_HITS = metrics.counter("quizzy_qr_cache_requests_total", "QR code cache lookups", {"result": "hit"})
+QR_CACHE_MISSES = metrics.counter("quizzy_qr_cache_requests_total", "QR code cache lookups", {"result": "miss"})
+
+
+def _matrix_to_svg(matrix, size: int) -> str:
+    """Compact SVG: one path, consecutive dark modules in a row merged into a run"""
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                parts.append(f"M{start} {y}h{x - start}v1H{start}z")
+            else:
+                x += 1
+    n = len(matrix)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {n} {n}" shape-rendering="crispEdges">'
+        f'<rect width="{n}" height="{n}" fill="#fff"/><path d="{"".join(parts)}"/></svg>'
+    )
+
+
+@metrics.timed(QR_RENDER_SECONDS)
+def _render_qr_code(data: str, size: int, fmt: str) -> str:
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+        border=QR_BORDER,
     )
     qr.add_data(data)
     qr.make(fit=True)
     
-    img = qr.make_image(fill_color="black", back_color="white")
-    img = img.resize((size, size), Image.Resampling.LANCZOS)
+    # Pick the module size up front so the image comes out (just under) the
+    # requested size with no resampling pass
+    qr.box_size = max(1, size // (qr.modules_count + 2 * QR_BORDER))
+    
+    if fmt == "svg":
+        svg_base64 = base64.b64encode(_matrix_to_svg(qr.get_matrix(), size).encode()).decode()
+        return f"data:image/svg+xml;base64,{svg_base64}"
     
-    # Convert to base64
+    img = qr.make_image(fill_color="black", back_color="white")
     buffer = io.BytesIO()
     img.save(buffer, format="PNG")
-    buffer.seek(0)
     img_base64 = base64.b64encode(buffer.getvalue()).decode()
-    
     return f"data:image/png;base64,{img_base64}"
 
 
+def generate_qr_code(data: str, size: int = 300, fmt: str = "png") -> str:
+    """
+    Generate a QR code and return it as a base64 data URI
+    
+    Results are kept in a bounded LRU cache keyed by (data, size, fmt), so
+    lobby reruns reuse the image instead of re-encoding it.
+    
+    Args:
+        data: The data to encode in the QR code (e.g., join URL)
+        size: Size of the QR code in pixels
+        fmt: "png", or "svg" for a resolution-independent image
+    
+    Returns:
+        Base64-encoded image data URI
+    """
+    if fmt not in ("png", "svg"):
+        raise ValueError(f"Unsupported QR code format: {fmt}")
+    key = (data, size, fmt)
+    with _qr_cache_lock:
+        if key in _qr_cache:
+            _qr_cache.move_to_end(key)
+            QR_CACHE_HITS.inc()
+            return _qr_cache[key]
+    
+    QR_CACHE_MISSES.inc()
+    uri = _render_qr_code(data, size, fmt)
+    with _qr_cache_lock:
+        _qr_cache[key] = uri
+        _qr_cache.move_to_end(key)
+        while len(_qr_cache) > QR_CACHE_SIZE:
+            _qr_cache.popitem(last=False)
+    return uri
+
+
+def discard_session_qr_codes(session_id: str):
+    """Drop cached QR codes for a session's join URL (called when it closes)"""
+    suffix = f"session={session_id}"
+    with _qr_cache_lock:
+        for key in [key for key in _qr_cache if key[0].endswith(suffix)]:
+            del _qr_cache[key]
+
+
 def generate_join_url(session_id: str, base_url: str = None) -> str:
     """
     Generate a join URL for a session
@@ -1,9 +1,23 @@
+import heapq
+import itertools
+import json
+import os
 import random
 import string
+import threading
 import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import streamlit as st
+from sortedcontainers import SortedList
+from core import metrics
+from core.profiler import profiled
+from multiplayer.adaptive import AdaptivePool, PlayerTrack
+from multiplayer.journal import SessionJournal, decode_players, encode_players, read_journal
+from multiplayer.pins import PinAllocator
+from multiplayer.qr_generator import discard_session_qr_codes
+from multiplayer.storage import SessionStore, SQLiteStore
+from quiz.question import Question
 
 
 @st.cache_resource
@@ -12,51 +26,508 @@ def get_global_session_manager(_version: str = "v2.0"):
     
     Args:
         _version: Version parameter to force cache invalidation when signature changes
+    
+    Set QUIZZY_SESSION_DB to a file path to keep games in SQLite, so they
+    survive restarts and can be shared by several server processes. Set
+    QUIZZY_JOURNAL_DIR to a directory to keep an event journal per game
+    (QUIZZY_JOURNAL_HISTORY=1 keeps every event instead of compacting), and
+    QUIZZY_ARCHIVE_DIR to save finished games there before they expire. With
+    QUIZZY_METRICS on, QUIZZY_METRICS_FILE is rewritten with the metrics
+    every few seconds.
     """
-    return SessionManager()
+    db_path = os.environ.get("QUIZZY_SESSION_DB")
+    journal_history = os.environ.get("QUIZZY_JOURNAL_HISTORY")
+    manager = SessionManager(
+        store=SQLiteStore(db_path) if db_path else None,
+        journal_dir=os.environ.get("QUIZZY_JOURNAL_DIR"),
+        journal_history=journal_history == "1" if journal_history else None,
+        archive_dir=os.environ.get("QUIZZY_ARCHIVE_DIR"),
+    )
+    manager.start_janitor()
+    metrics.gauge("quizzy_active_sessions", "Game sessions held by this process", callback=lambda: len(manager.sessions))
+    metrics.gauge("quizzy_active_players", "Players in those sessions", callback=manager.total_players)
+    metrics_file = os.environ.get("QUIZZY_METRICS_FILE")
+    if metrics_file:
+        metrics.start_file_export(metrics_file)
+    return manager
+
+
+LOCK_STRIPES = 64
+
+# Janitor defaults: drop sessions nobody has touched for SESSION_TTL seconds,
+# and players whose page hasn't sent a heartbeat for PLAYER_IDLE_TIMEOUT
+SESSION_TTL = 2 * 60 * 60
+PLAYER_IDLE_TIMEOUT = 120
+JANITOR_INTERVAL = 30
+
+# Recorded as the answer when a question's time limit runs out
+TIMEOUT_ANSWER = ""
+
+SUBMIT_SECONDS = metrics.histogram("quizzy_submit_answer_seconds", "GameSession.submit_answer latency")
+PLAYERS_JOINED = metrics.counter("quizzy_players_joined_total", "Players who joined a game")
+QUESTION_TIMEOUTS = metrics.counter("quizzy_question_timeouts_total", "Questions recorded as timed out")
+LEADERBOARD_BUILD_SECONDS = metrics.histogram(
+    "quizzy_leaderboard_build_seconds", "Time to rebuild a full leaderboard after a change"
+)
+
+
+class DeadlineScheduler:
+    """Expires players' questions when their time limit runs out
+    
+    A min-heap of (deadline, seq, session, player_id, question_num) on
+    time.monotonic(), so scheduling is O(log n) however many deadlines are
+    pending. Answering early doesn't remove the entry: it is skipped when it
+    surfaces, because the session no longer has that question armed. A daemon
+    thread sleeps until the earliest deadline and expires what is due, so
+    players advance without their page having to rerun.
+    """
+    
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+    
+    def schedule(self, deadline: float, session: "GameSession", player_id: str, question_num: int):
+        with self._cond:
+            entry = (deadline, next(self._seq), session, player_id, question_num)
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quizzy-deadlines", daemon=True)
+                self._thread.start()
+            elif self._heap[0] is entry:
+                # New earliest deadline: wake the thread so it sleeps less
+                self._cond.notify()
+    
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._heap)
+    
+    def pop_due(self, now: float) -> List[tuple]:
+        """Remove and return every entry whose deadline is at or before now"""
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+        return due
+    
+    def expire_due(self, now: Optional[float] = None) -> int:
+        """Expire everything due by now; returns how many questions timed out"""
+        expired = 0
+        # Called without self._cond held: expiring takes the session lock,
+        # and sessions call schedule() while holding theirs
+        for _, _, session, player_id, question_num in self.pop_due(time.monotonic() if now is None else now):
+            if session.expire_question(player_id, question_num):
+                expired += 1
+        return expired
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            for _, _, session, player_id, question_num in self.pop_due(time.monotonic()):
+                try:
+                    session.expire_question(player_id, question_num)
+                except Exception:
+                    # A failing session (e.g. its database is locked) must not
+                    # stop the deadlines of every other game
+                    continue
 
 
 class GameSession:
-    """Represents a multiplayer quiz game session"""
+    """Represents a multiplayer quiz game session
+    
+    Every Streamlit script thread touching the session goes through
+    self._lock, so reads and writes of players/status are atomic. Views should
+    read via snapshot()/get_player() rather than iterating self.players.
+    """
     
-    def __init__(self, host_name: str, quiz_settings: dict, questions: list):
-        self.session_id = self._generate_session_id()
+    def __init__(self, host_name: str, quiz_settings: dict, questions: list, lock=None, store=None, session_id=None, scheduler=None):
+        self.session_id = session_id or self._generate_session_id()
         self.host_name = host_name
         self.quiz_settings = quiz_settings
         self.questions = questions
         self.players: Dict[str, dict] = {}  # player_id -> player_data
         self.status = "waiting"  # waiting, playing, finished
         self.created_at = datetime.now()
+        self._lock = lock if lock is not None else threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._player_seq = itertools.count(1)
+        # Leaderboard kept sorted by (-score, join order, player_id) as scores change
+        self._ranking = SortedList()
+        self._rank_keys: Dict[str, tuple] = {}
+        self.version = 0  # bumped on join, leave, start, submit and finish
+        self._leaderboard_cache: Tuple[int, List[dict]] = (-1, [])
+        self._store = store if store is not None else SessionStore()
+        self._last_answer_id = 0  # newest stored answer row already applied
+        self._journal: Optional[SessionJournal] = None
+        # Seconds per question (None = untimed); enforced via _question_clock
+        self.time_limit = quiz_settings.get("time_limit")
+        self._scheduler: Optional[DeadlineScheduler] = scheduler
+        # player_id -> (question_num, monotonic start, monotonic deadline)
+        self._question_clock: Dict[str, Tuple[int, float, float]] = {}
+        # Monotonic times of the last change and of each player's last heartbeat
+        self.last_activity = time.monotonic()
+        self._last_seen: Dict[str, float] = {}
+        # Adaptive games: self.questions is a pool bucketed by difficulty,
+        # and each player gets num_questions of it picked by their accuracy
+        levels = quiz_settings.get("difficulty_levels")
+        self.pool: Optional[AdaptivePool] = AdaptivePool(levels) if levels else None
+        self._tracks: Dict[str, PlayerTrack] = {}
+    
+    @property
+    def questions_per_player(self) -> int:
+        """How many questions each player answers"""
+        if self.pool is None:
+            return len(self.questions)
+        return min(self.quiz_settings.get("num_questions", len(self.questions)), len(self.questions))
+    
+    def progress(self, player: dict) -> int:
+        """How many questions the player is past: the 0-based position of their current one
+        
+        In a fixed game that is current_question itself; in an adaptive one
+        current_question indexes the pool instead, so the answers count.
+        """
+        if self.pool is None:
+            return player.get("current_question", 0)
+        return len(player.get("answers", []))
+    
+    @classmethod
+    def restore(cls, record: dict, lock=None, store=None, scheduler=None) -> "GameSession":
+        """Rebuild a session from a store record (see SessionStore.load)"""
+        questions = [
+            Question(None, q["row"], q["question_text"], q["correct_answer"], q["options"])
+            for q in record["questions"]
+        ]
+        session = cls(
+            record["host_name"], record["quiz_settings"], questions,
+            lock=lock, store=store, session_id=record["session_id"], scheduler=scheduler,
+        )
+        session.created_at = record["created_at"]
+        with session._lock:
+            session._restore_state(record["status"], record["version"], record["players"], record["last_answer_id"])
+        return session
+    
+    @classmethod
+    def replay(cls, path: str, until: Optional[int] = None) -> "GameSession":
+        """Rebuild a session from its journal
+        
+        Args:
+            path: Journal file written by a session with a journal attached
+            until: Number of events to apply; defaults to all of them
+        
+        Returns:
+            A detached GameSession (no store, no journal) whose version is the
+            number of events applied
+        
+        Raises:
+            ValueError: until is before the earliest point the journal still
+                holds (a compacted journal starts at its newest snapshot)
+        """
+        record, snapshot, events, applied = read_journal(path, until)
+        questions = [
+            Question(None, q["row"], q["question_text"], q["correct_answer"], q["options"])
+            for q in record["questions"]
+        ]
+        session = cls(record["host_name"], record["quiz_settings"], questions, session_id=record["session_id"])
+        session.created_at = datetime.fromtimestamp(record["created_at"])
+        status, players = "waiting", {}
+        if snapshot is not None:
+            status, players = snapshot["status"], decode_players(snapshot["players"])
+        for event in events:
+            status = _apply_event(status, players, event, len(questions))
+        with session._lock:
+            session._restore_state(status, applied, players, 0)
+        return session
+    
+    def attach_journal(self, journal: SessionJournal):
+        """Record every event of this session in journal from now on"""
+        with self._lock:
+            if journal.is_new:
+                journal.write_session({
+                    "session_id": self.session_id,
+                    "host_name": self.host_name,
+                    "quiz_settings": self.quiz_settings,
+                    "questions": [q.to_dict() for q in self.questions],
+                    "created_at": self.created_at.timestamp(),
+                })
+                if self.version > 0:
+                    # Joined mid-game (e.g. restored from the store): the events
+                    # so far aren't in the journal, so start from their result
+                    journal.write_snapshot(self.version, self._snapshot_state())
+            self._journal = journal
+    
+    def close(self):
+        """Release what the session holds outside itself: its journal and pending deadlines"""
+        with self._lock:
+            self._question_clock.clear()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+    
+    def _record(self, event: dict):
+        """Append event to the journal, if any, bump the version, and snapshot when one is due (lock held)
+        
+        Snapshots are labelled with the version the event brought the session
+        to, which is also the journal's event count.
+        """
+        snapshot_due = self._journal is not None and self._journal.append(event)
+        self._bump()
+        if snapshot_due:
+            self._journal.write_snapshot(self.version, self._snapshot_state())
+    
+    def _snapshot_state(self) -> dict:
+        return {"status": self.status, "players": encode_players(self.players)}
+    
+    def _restore_state(self, status: str, version: int, players: Dict[str, dict], last_answer_id: int):
+        """Replace players/status with externally loaded state (lock held)"""
+        self.status = status
+        self.players = players
+        self._rank_keys = {
+            player_id: (-player["score"], player["seq"], player_id)
+            for player_id, player in players.items()
+        }
+        self._ranking = SortedList(self._rank_keys.values())
+        self._player_seq = itertools.count(max((p["seq"] for p in players.values()), default=0) + 1)
+        self._last_answer_id = last_answer_id
+        # Adaptive tracks are rebuilt from the loaded players on next use
+        self._tracks.clear()
+        if version != self.version:
+            self.last_activity = time.monotonic()
+        self.version = version
+        # Players seen by other processes count as alive until proven idle here
+        self._last_seen = {
+            player_id: self._last_seen.get(player_id, self.last_activity) for player_id in players
+        }
+        self._rearm_clocks()
+        self._changed.notify_all()
+    
+    def _rearm_clocks(self):
+        """Match question clocks to externally loaded players (lock held)
+        
+        Stored start times are wall-clock, so they are translated onto the
+        monotonic clock. Players still on the question their clock is armed
+        for keep it, so reloading doesn't pile up scheduler entries.
+        """
+        if self.status != "playing":
+            self._question_clock.clear()
+            return
+        wall_now, mono_now = time.time(), time.monotonic()
+        for player_id in list(self._question_clock):
+            if player_id not in self.players:
+                del self._question_clock[player_id]
+        for player_id, player in self.players.items():
+            if player["finished"]:
+                self._question_clock.pop(player_id, None)
+                continue
+            clock = self._question_clock.get(player_id)
+            if clock is None or clock[0] != player["current_question"]:
+                started = mono_now - max(0.0, wall_now - player["start_time"])
+                self._arm(player_id, player["current_question"], started)
+    
+    def _arm(self, player_id: str, question_num: int, started: float):
+        """Start the clock on a player's question and schedule its deadline (lock held)"""
+        deadline = started + self.time_limit if self.time_limit else float("inf")
+        self._question_clock[player_id] = (question_num, started, deadline)
+        if self._scheduler is not None and self.time_limit:
+            self._scheduler.schedule(deadline, self, player_id, question_num)
+    
+    def time_remaining(self, player_id: str) -> Optional[float]:
+        """Seconds left on the player's current question, or None if untimed"""
+        with self._lock:
+            clock = self._question_clock.get(player_id)
+            if clock is None or not self.time_limit:
+                return None
+            return max(0.0, clock[2] - time.monotonic())
+    
+    def expire_question(self, player_id: str, question_num: int) -> bool:
+        """Record a zero-point timeout if the question's deadline has passed
+        
+        Returns False if the player already answered it (or left, or the game
+        ended), which is how superseded scheduler entries are skipped.
+        """
+        with self._lock, self._store.mutation(self) as change:
+            clock = self._question_clock.get(player_id)
+            if self.status != "playing" or clock is None or clock[0] != question_num:
+                return False
+            if time.monotonic() < clock[2]:
+                return False
+            return self._submit_answer_locked(player_id, question_num, TIMEOUT_ANSWER, change, timed_out=True)
         
     def _generate_session_id(self) -> str:
-        """Generate a unique 6-character session ID"""
+        """Generate a random 6-character session ID (SessionManager passes
+        collision-free PINs from its PinAllocator instead)"""
         return ''.join(random.choices(string.digits, k=6))
     
     def add_player(self, player_name: str) -> str:
         """Add a player to the session and return their player_id"""
-        player_id = f"player_{len(self.players) + 1}_{int(time.time())}"
-        self.players[player_id] = {
-            "name": player_name,
-            "score": 0,
-            "answers": [],
-            "joined_at": datetime.now(),
-            "current_question": 0,  # Each player tracks their own progress
-            "finished": False,
-            "start_time": time.time(),  # Initialize timer
-        }
-        return player_id
+        with self._lock, self._store.mutation(self) as change:
+            seq = next(self._player_seq)
+            now = time.time()
+            player_id = f"player_{seq}_{int(now)}"
+            self.players[player_id] = {
+                "seq": seq,
+                "name": player_name,
+                "score": 0,
+                "answers": [],
+                "joined_at": datetime.fromtimestamp(now),
+                "current_question": 0,  # Each player tracks their own progress
+                "finished": False,
+                "start_time": now,  # Initialize timer
+            }
+            self._rank_keys[player_id] = (0, seq, player_id)
+            self._ranking.add(self._rank_keys[player_id])
+            if self.status == "playing":
+                self._arm(player_id, 0, time.monotonic())
+            self._last_seen[player_id] = time.monotonic()
+            change.touch_player(player_id)
+            PLAYERS_JOINED.inc()
+            self._record({"t": "join", "id": player_id, "name": player_name, "seq": seq, "at": now})
+            return player_id
+    
+    def remove_player(self, player_id: str):
+        """Remove a player (e.g. when they leave the lobby)"""
+        with self._lock, self._store.mutation(self) as change:
+            if self.players.pop(player_id, None) is not None:
+                self._ranking.remove(self._rank_keys.pop(player_id))
+                self._question_clock.pop(player_id, None)
+                self._tracks.pop(player_id, None)
+                self._last_seen.pop(player_id, None)
+                change.remove_player(player_id)
+                self._record({"t": "leave", "id": player_id})
+    
+    def _update_rank(self, player_id: str, score: int):
+        old_key = self._rank_keys[player_id]
+        new_key = (-score, old_key[1], player_id)
+        if new_key != old_key:
+            self._ranking.remove(old_key)
+            self._ranking.add(new_key)
+            self._rank_keys[player_id] = new_key
+    
+    def _bump(self):
+        """Advance the version and wake anyone waiting for a change (lock held)"""
+        self.version += 1
+        self.last_activity = time.monotonic()
+        self._changed.notify_all()
+    
+    def heartbeat(self, player_id: str):
+        """Note that the player's page is still open (doesn't bump the version)
+        
+        The time is also written to the store, since the page may be served
+        by a different process than the one whose janitor judges it idle.
+        """
+        with self._lock:
+            if player_id in self.players:
+                self._last_seen[player_id] = time.monotonic()
+                self._store.heartbeat(self, player_id, time.time())
+    
+    def evict_idle_players(self, max_idle: float, now: Optional[float] = None) -> int:
+        """Remove players without a heartbeat for max_idle seconds
+        
+        Only while waiting or playing: once the game is finished everyone
+        stays on the results. Returns how many players were removed.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock, self._store.mutation(self) as change:
+            if self.status == "finished":
+                return 0
+            idle = [
+                player_id for player_id in self.players
+                if now - self._last_seen.get(player_id, now) > max_idle
+            ]
+            if idle:
+                # Heartbeats other processes stored; wall-clock, so move them onto our monotonic clock
+                offset = time.monotonic() - time.time()
+                for player_id, seen in self._store.last_seen(self).items():
+                    if player_id in self._last_seen:
+                        self._last_seen[player_id] = max(self._last_seen[player_id], seen + offset)
+                idle = [player_id for player_id in idle if now - self._last_seen[player_id] > max_idle]
+            for player_id in idle:
+                del self.players[player_id]
+                self._ranking.remove(self._rank_keys.pop(player_id))
+                self._question_clock.pop(player_id, None)
+                self._tracks.pop(player_id, None)
+                self._last_seen.pop(player_id, None)
+                change.remove_player(player_id)
+                self._record({"t": "leave", "id": player_id})
+            # Whoever is left may have been waiting only on the idle players
+            if idle and self.status == "playing" and self.players and all(
+                p["finished"] for p in self.players.values()
+            ):
+                self.status = "finished"
+                self._question_clock.clear()
+                self._record({"t": "finish"})
+            return len(idle)
+    
+    def to_archive(self) -> dict:
+        """Everything needed to look at a finished game later, as plain JSON types"""
+        with self._lock:
+            return {
+                "session_id": self.session_id,
+                "host_name": self.host_name,
+                "quiz_settings": self.quiz_settings,
+                "questions": [q.to_dict() for q in self.questions],
+                "status": self.status,
+                "created_at": self.created_at.isoformat(),
+                "players": {
+                    player_id: {**player, "joined_at": player["joined_at"].isoformat()}
+                    for player_id, player in self.players.items()
+                },
+            }
+    
+    def wait_for_change(self, since_version: int, timeout: float) -> int:
+        """Block until version moves past since_version or timeout expires
+        
+        Returns the current version, so callers can tell whether anything
+        changed without re-rendering.
+        """
+        self._store.refresh(self)
+        with self._lock:
+            self._changed.wait_for(lambda: self.version != since_version, timeout)
+            return self.version
     
     def start_game(self):
         """Start the game"""
-        self.status = "playing"
-        # Initialize each player's progress
-        for player_id in self.players:
-            self.players[player_id]["current_question"] = 0
-            self.players[player_id]["finished"] = False
-            self.players[player_id]["start_time"] = time.time()
+        with self._lock, self._store.mutation(self) as change:
+            self.status = "playing"
+            now = time.time()
+            mono_now = time.monotonic()
+            self._tracks.clear()
+            # Initialize each player's progress
+            for player_id in self.players:
+                self.players[player_id]["current_question"] = 0
+                self.players[player_id]["finished"] = False
+                self.players[player_id]["start_time"] = now
+                self._arm(player_id, 0, mono_now)
+            change.touch_all_players()
+            self._record({"t": "start", "at": now})
+    
+    def finish_game(self):
+        """End the game for everyone"""
+        with self._lock, self._store.mutation(self):
+            self.status = "finished"
+            self._question_clock.clear()
+            self._record({"t": "finish"})
     
+    @metrics.timed(SUBMIT_SECONDS)
     def submit_answer(self, player_id: str, question_num: int, answer: str):
-        """Submit an answer for a player at their current question"""
+        """Submit an answer for a player at their current question
+        
+        The whole check-score-advance sequence runs under the session lock, so
+        concurrent submits can neither lose score updates nor double-answer.
+        An answer arriving after the question's deadline is not accepted: the
+        timeout is recorded instead (if the scheduler hasn't already) and
+        False is returned.
+        """
+        with self._lock, self._store.mutation(self) as change:
+            return self._submit_answer_locked(player_id, question_num, answer, change)
+    
+    def _submit_answer_locked(self, player_id: str, question_num: int, answer: str, change, timed_out: bool = False):
         # Validate input types
         if not isinstance(player_id, str):
             return False
@@ -78,6 +549,11 @@ class GameSession:
         if "start_time" not in player:
             player["start_time"] = time.time()
         
+        # Finished players stay on their last question; don't let them re-answer it
+        # (stored answer rows are written behind, so the list below may lag)
+        if player["finished"]:
+            return False
+        
         # Check if this is the player's current question
         if question_num != player["current_question"]:
             return False
@@ -92,8 +568,20 @@ class GameSession:
             return False
         
         question = self.questions[question_num]
-        is_correct = answer == question.get("correct_answer")
-        time_taken = time.time() - player.get("start_time", time.time())
+        now = time.time()
+        mono_now = time.monotonic()
+        clock = self._question_clock.get(player_id)
+        if clock is not None and clock[0] == question_num:
+            time_taken = mono_now - clock[1]
+        else:
+            time_taken = now - player.get("start_time", now)
+        # An answer arriving after the deadline records the timeout instead
+        late = not timed_out and clock is not None and clock[0] == question_num and mono_now >= clock[2]
+        if timed_out or late:
+            answer = TIMEOUT_ANSWER
+            time_taken = float(self.time_limit)
+            QUESTION_TIMEOUTS.inc()
+        is_correct = answer == question.correct_answer
         
         # Calculate score: correct = 1000 points, bonus for speed (max 500 points)
         points = 0
@@ -101,82 +589,418 @@ class GameSession:
             base_points = 1000
             # Speed bonus: full bonus if answered within 2 seconds, decreasing linearly
             speed_bonus = max(0, 500 - (time_taken * 50))
-            points = int(base_points + speed_bonus)
+            # Adaptive games weight points by the question's difficulty level
+            weight = self.pool.weight(question_num) if self.pool is not None else 1
+            points = int((base_points + speed_bonus) * weight)
         
         # Record the answer
         player["score"] = player.get("score", 0) + points
+        self._update_rank(player_id, player["score"])
         if "answers" not in player:
             player["answers"] = []
-        player["answers"].append({
+        record = {
             "question_num": question_num,
             "answer": answer,
             "is_correct": is_correct,
             "time_taken": time_taken,
             "points": points,
-        })
+        }
+        player["answers"].append(record)
+        change.touch_player(player_id)
+        change.add_answer(player_id, record)
         
         # Move to next question
-        if player["current_question"] < len(self.questions) - 1:
-            player["current_question"] += 1
-            player["start_time"] = time.time()  # Reset timer for next question
+        next_question = self._next_question(player_id, player, is_correct)
+        if next_question is not None:
+            player["current_question"] = next_question
+            player["start_time"] = now  # Reset timer for next question
+            self._arm(player_id, player["current_question"], mono_now)
         else:
             player["finished"] = True
+            self._question_clock.pop(player_id, None)
             # Check if all players are finished
             if all(p.get("finished", False) for p in self.players.values()):
                 self.status = "finished"
         
-        return True
+        event = {
+            "t": "submit",
+            "id": player_id,
+            "q": question_num,
+            "answer": answer,
+            "correct": is_correct,
+            "time_taken": time_taken,
+            "points": points,
+            "at": now,
+        }
+        if self.pool is not None:
+            # Replay can't re-run the pick: record which question came next
+            event["next"] = next_question
+        self._record(event)
+        return not late
+    
+    def _next_question(self, player_id: str, player: dict, is_correct: bool) -> Optional[int]:
+        """The question after the one just answered, or None once the player is done (lock held)"""
+        if self.pool is None:
+            following = player["current_question"] + 1
+            return following if following < len(self.questions) else None
+        if len(player["answers"]) >= self.questions_per_player:
+            self._tracks.pop(player_id, None)
+            return None
+        track = self._tracks.get(player_id)
+        if track is None:
+            # Rebuilt from the answers, which already include this one
+            track = self._tracks[player_id] = self.pool.track(player)
+        else:
+            track.record(is_correct)
+        return self.pool.next_question(track)
+    
+    def get_player(self, player_id: str) -> Optional[dict]:
+        """Consistent copy of one player's data, or None"""
+        with self._lock:
+            player = self.players.get(player_id)
+            if player is None:
+                return None
+            return {**player, "answers": list(player.get("answers", []))}
+    
+    def snapshot(self) -> dict:
+        """Consistent copy of the session state for rendering"""
+        with self._lock:
+            return {
+                "version": self.version,
+                "status": self.status,
+                "players": {
+                    player_id: {**player, "answers": list(player.get("answers", []))}
+                    for player_id, player in self.players.items()
+                },
+            }
+    
+    def _entry(self, rank: int, player_id: str) -> dict:
+        player_data = self.players[player_id]
+        return {
+            "player_id": player_id,
+            "name": player_data["name"],
+            "score": player_data["score"],
+            "answers": list(player_data["answers"]),
+            "rank": rank,
+        }
+    
+    def rank_of(self, player_id: str) -> Optional[int]:
+        """1-based leaderboard rank of a player, in O(log P)"""
+        with self._lock:
+            key = self._rank_keys.get(player_id)
+            if key is None:
+                return None
+            return self._ranking.index(key) + 1
+    
+    def player_count(self) -> int:
+        with self._lock:
+            return len(self.players)
+    
+    def top_k(self, k: int) -> List[dict]:
+        """The k best players with ranks, in O(log P + k)"""
+        with self._lock:
+            return [
+                self._entry(rank, key[2])
+                for rank, key in enumerate(self._ranking.islice(0, k), 1)
+            ]
+    
+    @profiled
+    def leaderboard_snapshot(self) -> Tuple[int, List[dict]]:
+        """(version, full leaderboard); rebuilt only when the version changed"""
+        with self._lock:
+            version, leaderboard = self._leaderboard_cache
+            if version != self.version:
+                with LEADERBOARD_BUILD_SECONDS.time():
+                    leaderboard = [
+                        self._entry(rank, key[2])
+                        for rank, key in enumerate(self._ranking, 1)
+                    ]
+                self._leaderboard_cache = (self.version, leaderboard)
+            return self.version, leaderboard
     
     def get_leaderboard(self) -> List[dict]:
-        """Get sorted leaderboard"""
-        leaderboard = []
-        for player_id, player_data in self.players.items():
-            leaderboard.append({
-                "player_id": player_id,
-                "name": player_data["name"],
-                "score": player_data["score"],
-                "answers": player_data["answers"],
-            })
-        
-        # Sort by score (descending), then by join time (ascending)
-        leaderboard.sort(key=lambda x: (-x["score"], self.players[x["player_id"]]["joined_at"]))
-        
-        # Add ranks
-        for i, player in enumerate(leaderboard):
-            player["rank"] = i + 1
-        
-        return leaderboard
+        """Get sorted leaderboard (shared between callers: treat as read-only)"""
+        return self.leaderboard_snapshot()[1]
+
+
+def _apply_event(status: str, players: Dict[str, dict], event: dict, num_questions: int) -> str:
+    """Apply one journal event to replayed state; returns the new status
+    
+    Mirrors the GameSession mutations, using the values the journal recorded
+    (timestamps, points) rather than recomputing them.
+    """
+    kind = event["t"]
+    if kind == "join":
+        players[event["id"]] = {
+            "seq": event["seq"],
+            "name": event["name"],
+            "score": 0,
+            "answers": [],
+            "joined_at": datetime.fromtimestamp(event["at"]),
+            "current_question": 0,
+            "finished": False,
+            "start_time": event["at"],
+        }
+    elif kind == "leave":
+        players.pop(event["id"], None)
+    elif kind == "start":
+        status = "playing"
+        for player in players.values():
+            player["current_question"] = 0
+            player["finished"] = False
+            player["start_time"] = event["at"]
+    elif kind == "submit":
+        player = players[event["id"]]
+        player["score"] += event["points"]
+        player["answers"].append({
+            "question_num": event["q"],
+            "answer": event["answer"],
+            "is_correct": event["correct"],
+            "time_taken": event["time_taken"],
+            "points": event["points"],
+        })
+        # Adaptive games record the question picked next (None when done)
+        following = event.get("next", player["current_question"] + 1)
+        if following is not None and following < num_questions:
+            player["current_question"] = following
+            player["start_time"] = event["at"]
+        else:
+            player["finished"] = True
+            if all(p["finished"] for p in players.values()):
+                status = "finished"
+    elif kind == "finish":
+        status = "finished"
+    return status
 
 
 class SessionManager:
-    """Global manager for all game sessions"""
+    """Global manager for all game sessions
     
-    def __init__(self):
+    Sessions share a fixed pool of striped locks (handed out round-robin), so
+    different games rarely contend with each other while the number of lock
+    objects stays bounded. self._lock only guards the sessions dict itself.
+    Session IDs come from self.pins, so no two live sessions share a PIN;
+    create_session raises PinSpaceExhausted when all of them are taken.
+    
+    self.sessions is an in-process cache in front of self.store; with the
+    default SessionStore it is the only copy of each game. With journal_dir
+    set, every session also appends its events to <journal_dir>/<id>.journal
+    (see GameSession.replay). Each periodic snapshot compacts the journal
+    down to the newest snapshot and the events after it, unless
+    journal_history is True; by default full history is kept only when the
+    store is shared, since compaction needs a single writer per journal.
+    
+    The janitor (start_janitor) drops sessions idle for session_ttl seconds,
+    archiving finished ones to archive_dir first if set, and evicts players
+    whose pages stopped sending heartbeats. Sessions sit in a heap keyed by
+    when they would expire; an entry that surfaces early is pushed back at
+    the session's new expiry, so each sweep only touches expired sessions.
+    """
+    
+    def __init__(
+        self,
+        stripes: int = LOCK_STRIPES,
+        store: SessionStore = None,
+        journal_dir: Optional[str] = None,
+        session_ttl: float = SESSION_TTL,
+        player_idle_timeout: float = PLAYER_IDLE_TIMEOUT,
+        archive_dir: Optional[str] = None,
+        journal_history: Optional[bool] = None,
+    ):
         self.sessions: Dict[str, GameSession] = {}
+        self.store = store if store is not None else SessionStore()
+        self.journal_dir = journal_dir
+        self.journal_history = self.store.shared if journal_history is None else journal_history
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+        self.session_ttl = session_ttl
+        self.player_idle_timeout = player_idle_timeout
+        self.archive_dir = archive_dir
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stripes = [threading.RLock() for _ in range(stripes)]
+        self._stripe_seq = itertools.count()
+        self.deadlines = DeadlineScheduler()
+        self.pins = PinAllocator()
+        # (expires at, seq, session_id) on time.monotonic(), guarded by self._lock
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._expiry_seq = itertools.count()
+        self.freed = {"sessions_expired": 0, "sessions_archived": 0, "players_evicted": 0}
+        self._janitor: Optional[threading.Thread] = None
+        self._janitor_stop = threading.Event()
+    
+    def _next_stripe(self):
+        return self._stripes[next(self._stripe_seq) % len(self._stripes)]
+    
+    def journal_path(self, session_id: str) -> Optional[str]:
+        if not self.journal_dir:
+            return None
+        return os.path.join(self.journal_dir, f"{session_id}.journal")
+    
+    def _attach_journal(self, session: GameSession):
+        path = self.journal_path(session.session_id)
+        if path is not None:
+            session.attach_journal(SessionJournal(path, keep_history=self.journal_history))
+    
+    def _track_expiry(self, session: GameSession):
+        """Queue the session for the janitor (self._lock held)"""
+        heapq.heappush(
+            self._expiry_heap,
+            (session.last_activity + self.session_ttl, next(self._expiry_seq), session.session_id),
+        )
     
     def create_session(self, host_name: str, quiz_settings: dict, questions: list) -> GameSession:
-        """Create a new game session"""
-        session = GameSession(host_name, quiz_settings, questions)
-        self.sessions[session.session_id] = session
+        """Create a new game session (raises PinSpaceExhausted if no PIN is free)"""
+        while True:
+            session = GameSession(
+                host_name, quiz_settings, questions,
+                lock=self._next_stripe(), store=self.store, scheduler=self.deadlines,
+                session_id=self.pins.allocate(),
+            )
+            # Another process may already own this PIN: it stays reserved
+            # here, and we draw again
+            if self.store.create(session):
+                break
+        self._attach_journal(session)
+        with self._lock:
+            self.sessions[session.session_id] = session
+            self._track_expiry(session)
         return session
     
     def get_session(self, session_id: str) -> Optional[GameSession]:
         """Get a session by ID"""
-        return self.sessions.get(session_id)
+        session = self.sessions.get(session_id)
+        if session is not None:
+            if self.store.refresh(session):
+                return session
+            # Closed by another process
+            with self._lock:
+                self.sessions.pop(session_id, None)
+            session.close()
+            self.pins.release(session_id)
+            return None
+        
+        record = self.store.load(session_id)
+        if record is None:
+            return None
+        session = GameSession.restore(record, lock=self._next_stripe(), store=self.store, scheduler=self.deadlines)
+        with self._lock:
+            cached = self.sessions.setdefault(session_id, session)
+            if cached is session:
+                self._track_expiry(session)
+        if cached is session:
+            self.pins.reserve(session_id)
+            self._attach_journal(session)
+        return cached
     
-    def close_session(self, session_id: str):
-        """Close and remove a session"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+    def close_session(self, session_id: str) -> Optional[str]:
+        """Close and remove a session
+        
+        Finished games are archived to archive_dir first, if set.
+        
+        Returns:
+            The archive path, or None if the session wasn't archived
+        """
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        path = None
+        if session is not None:
+            if self.archive_dir and session.status == "finished":
+                path = self.archive_session(session)
+            session.close()
+        self.store.delete(session_id)
+        self.pins.release(session_id)
+        discard_session_qr_codes(session_id)
+        return path
     
     def cleanup_old_sessions(self, max_age_hours: int = 24):
-        """Remove sessions older than max_age_hours"""
-        now = datetime.now()
-        to_remove = []
-        for session_id, session in self.sessions.items():
-            age = (now - session.created_at).total_seconds() / 3600
-            if age > max_age_hours:
-                to_remove.append(session_id)
-        
+        """Remove sessions with no activity for max_age_hours"""
+        cutoff = time.monotonic() - max_age_hours * 3600
+        with self._lock:
+            to_remove = [
+                session_id for session_id, session in self.sessions.items()
+                if session.last_activity < cutoff
+            ]
         for session_id in to_remove:
-            del self.sessions[session_id]
+            self.close_session(session_id)
+    
+    def archive_session(self, session: GameSession) -> str:
+        """Write a session to archive_dir as JSON and return the file path"""
+        path = os.path.join(
+            self.archive_dir, f"{session.session_id}-{session.created_at:%Y%m%d-%H%M%S}.json"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(session.to_archive(), f, default=str, ensure_ascii=False)
+        return path
+    
+    def run_janitor(self, now: Optional[float] = None) -> Dict[str, int]:
+        """One housekeeping pass; returns what it freed (also added to self.freed)
+        
+        Args:
+            now: time.monotonic() value to judge expiry against (defaults to now)
+        
+        Returns:
+            Counts of sessions expired and archived and players evicted
+        """
+        now = time.monotonic() if now is None else now
+        freed = dict.fromkeys(self.freed, 0)
+        expired = []
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                _, _, session_id = heapq.heappop(self._expiry_heap)
+                session = self.sessions.get(session_id)
+                if session is None:
+                    continue
+                expires_at = session.last_activity + self.session_ttl
+                if expires_at > now:
+                    heapq.heappush(self._expiry_heap, (expires_at, next(self._expiry_seq), session_id))
+                else:
+                    expired.append(session)
+            expired_ids = {id(session) for session in expired}
+            live = [session for session in self.sessions.values() if id(session) not in expired_ids]
+        
+        for session in expired:
+            if self.close_session(session.session_id):
+                freed["sessions_archived"] += 1
+            freed["sessions_expired"] += 1
+        for session in live:
+            freed["players_evicted"] += session.evict_idle_players(self.player_idle_timeout, now)
+        
+        with self._lock:
+            for key, count in freed.items():
+                self.freed[key] += count
+        return freed
+    
+    def total_players(self) -> int:
+        with self._lock:
+            sessions = list(self.sessions.values())
+        return sum(session.player_count() for session in sessions)
+    
+    def janitor_stats(self) -> Dict[str, int]:
+        """Totals freed by the janitor so far, plus what is still held"""
+        with self._lock:
+            return {**self.freed, "sessions": len(self.sessions), "tracked": len(self._expiry_heap)}
+    
+    def start_janitor(self, interval: float = JANITOR_INTERVAL):
+        """Run run_janitor() every interval seconds on a daemon thread"""
+        with self._lock:
+            if self._janitor is not None:
+                return
+            self._janitor = threading.Thread(
+                target=self._janitor_loop, args=(interval,), name="quizzy-janitor", daemon=True
+            )
+            self._janitor.start()
+    
+    def stop_janitor(self):
+        self._janitor_stop.set()
+        if self._janitor is not None:
+            self._janitor.join()
+    
+    def _janitor_loop(self, interval: float):
+        while not self._janitor_stop.wait(interval):
+            try:
+                self.run_janitor()
+            except Exception:
+                # Try again next interval rather than stop housekeeping for good
+                continue
@@ -0,0 +1,445 @@
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class Mutation:
+    """Records what a GameSession changed, so a store knows what to write.
+
+    GameSession fills this in while it mutates its in-memory state; the store
+    decides what (if anything) to persist when the mutation completes.
+    """
+
+    __slots__ = ("players", "removed", "answers", "all_players")
+
+    def __init__(self):
+        self.players = set()
+        self.removed = set()
+        self.answers = []
+        self.all_players = False
+
+    def touch_player(self, player_id: str):
+        self.players.add(player_id)
+
+    def remove_player(self, player_id: str):
+        self.players.discard(player_id)
+        self.removed.add(player_id)
+
+    def touch_all_players(self):
+        self.all_players = True
+
+    def add_answer(self, player_id: str, answer: dict):
+        self.answers.append((player_id, answer))
+
+
+class SessionStore:
+    """Storage backend interface for SessionManager.
+
+    The base class keeps everything in process memory only (the original
+    behaviour): every hook is a no-op and nothing can be loaded back.
+    shared is True for stores several processes may write the same games to.
+    """
+
+    shared = False
+
+    def create(self, session) -> bool:
+        """Persist a new session. Returns False if its ID is already taken."""
+        return True
+
+    def load(self, session_id: str) -> Optional[dict]:
+        """Return a stored session record (see SQLiteStore.load) or None."""
+        return None
+
+    def delete(self, session_id: str):
+        pass
+
+    def refresh(self, session) -> bool:
+        """Bring session up to date with changes made elsewhere.
+
+        Returns False if the session no longer exists in the store.
+        """
+        return True
+
+    @contextlib.contextmanager
+    def mutation(self, session):
+        """Wrap a GameSession mutation; yields a Mutation to record changes in."""
+        yield Mutation()
+
+    def heartbeat(self, session, player_id: str, when: float):
+        """Record that player_id's page was open at when (a time.time() value)."""
+        pass
+
+    def last_seen(self, session) -> Dict[str, float]:
+        """time.time() of each player's newest stored heartbeat, where known."""
+        return {}
+
+    def flush(self):
+        pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    host_name TEXT NOT NULL,
+    quiz_settings TEXT NOT NULL,
+    questions TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    session_id TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    joined_at TEXT NOT NULL,
+    current_question INTEGER NOT NULL,
+    finished INTEGER NOT NULL,
+    start_time REAL NOT NULL,
+    last_seen REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_id, player_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    question_num INTEGER NOT NULL,
+    answer TEXT NOT NULL,
+    is_correct INTEGER NOT NULL,
+    time_taken REAL NOT NULL,
+    points INTEGER NOT NULL,
+    UNIQUE (session_id, player_id, question_num)
+);
+CREATE INDEX IF NOT EXISTS answers_by_session ON answers (session_id, id);
+"""
+
+_PLAYER_COLUMNS = "player_id, seq, name, score, joined_at, current_question, finished, start_time"
+# Player rows are upserted so that a mutation never overwrites last_seen,
+# which only heartbeats (and the row's first insert) write
+_PLAYER_UPSERT = (
+    "INSERT INTO players VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (session_id, player_id) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in _PLAYER_COLUMNS.split(", ")[1:])
+)
+_ANSWER_COLUMNS = "id, player_id, question_num, answer, is_correct, time_taken, points"
+
+
+def _player_row(session_id: str, player_id: str, player: dict) -> tuple:
+    return (
+        session_id,
+        player_id,
+        player["seq"],
+        player["name"],
+        player["score"],
+        player["joined_at"].isoformat(),
+        player["current_question"],
+        int(player["finished"]),
+        player["start_time"],
+    )
+
+
+def _answer_from_row(row) -> dict:
+    return {
+        "question_num": row[2],
+        "answer": row[3],
+        "is_correct": bool(row[4]),
+        "time_taken": row[5],
+        "points": row[6],
+    }
+
+
+class _Connection:
+    """A thread's connection; closed when the thread (and its local) goes away"""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+
+    def __del__(self):
+        self.conn.close()
+
+
+class SQLiteStore(SessionStore):
+    """SQLite (WAL) backend so games survive restarts and span processes.
+
+    Every GameSession mutation runs inside a BEGIN IMMEDIATE transaction. If
+    another process bumped the session's version column first, the in-memory
+    copy is reloaded before the mutation is applied, so scoring is consistent
+    across workers. Player and session rows are written synchronously; the
+    detailed answer rows are queued and inserted in batches (write-behind),
+    since nothing needs them to decide a score.
+
+    Each thread has its own connection, so sessions are only serialized by
+    their own (striped) locks and by SQLite's write lock, which busy_timeout
+    waits on; the store itself only locks its answer queue.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, flush_interval: float = 0.25, batch_size: int = 256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        with self._transaction() as conn:
+            # Databases created before heartbeats were stored
+            if "last_seen" not in {row[1] for row in conn.execute("PRAGMA table_info(players)")}:
+                conn.execute("ALTER TABLE players ADD COLUMN last_seen REAL NOT NULL DEFAULT 0")
+        self._pending_lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="quizzy-answer-flush", daemon=True)
+        self._flusher.start()
+
+    # -- transactions -------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._local.holder = _Connection(self.path)
+            self._connections.add(holder)
+        return holder.conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def create(self, session) -> bool:
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        session.session_id,
+                        session.host_name,
+                        json.dumps(session.quiz_settings, default=str),
+                        json.dumps([q.to_dict() for q in session.questions], default=str),
+                        session.status,
+                        session.created_at.isoformat(),
+                        session.version,
+                    ),
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def delete(self, session_id: str):
+        with self._pending_lock:
+            self._pending = [row for row in self._pending if row[0] != session_id]
+        with self._transaction() as conn:
+            for table in ("answers", "players", "sessions"):
+                conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+
+    @contextlib.contextmanager
+    def mutation(self, session):
+        change = Mutation()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session.session_id,)
+            ).fetchone()
+            if row is not None and row[0] != session.version:
+                self._reload(conn, session)
+            start_version = session.version
+
+            yield change
+
+            if session.version == start_version or row is None:
+                return
+            conn.execute(
+                "UPDATE sessions SET status = ?, version = ? WHERE session_id = ?",
+                (session.status, session.version, session.session_id),
+            )
+            player_ids = session.players.keys() if change.all_players else change.players
+            now = time.time()
+            conn.executemany(
+                _PLAYER_UPSERT,
+                [_player_row(session.session_id, pid, session.players[pid]) + (now,) for pid in player_ids],
+            )
+            conn.executemany(
+                "DELETE FROM players WHERE session_id = ? AND player_id = ?",
+                [(session.session_id, pid) for pid in change.removed],
+            )
+        if change.answers:
+            self._queue_answers(session.session_id, change.answers)
+
+    def heartbeat(self, session, player_id: str, when: float):
+        # A single autocommit statement; no need to take the write lock up front
+        self._connection().execute(
+            "UPDATE players SET last_seen = MAX(last_seen, ?) WHERE session_id = ? AND player_id = ?",
+            (when, session.session_id, player_id),
+        )
+
+    # -- reads ----------------------------------------------------------
+
+    def last_seen(self, session) -> Dict[str, float]:
+        return {
+            player_id: seen
+            for player_id, seen in self._connection().execute(
+                "SELECT player_id, last_seen FROM players WHERE session_id = ? AND last_seen > 0",
+                (session.session_id,),
+            )
+        }
+
+    def refresh(self, session) -> bool:
+        conn = self._connection()
+        with session._lock:
+            row = conn.execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session.session_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            if row[0] != session.version:
+                self._reload(conn, session)
+            return True
+
+    def load(self, session_id: str) -> Optional[dict]:
+        self.flush()
+        conn = self._connection()
+        # One read transaction, so the players and answers are a consistent snapshot
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute(
+                "SELECT host_name, quiz_settings, questions, status, created_at, version "
+                "FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            players, last_answer_id = self._read_players(conn, session_id, {}, 0)
+        finally:
+            conn.execute("COMMIT")
+        host_name, quiz_settings, questions, status, created_at, version = row
+        return {
+            "session_id": session_id,
+            "host_name": host_name,
+            "quiz_settings": json.loads(quiz_settings),
+            "questions": json.loads(questions),
+            "status": status,
+            "created_at": datetime.fromisoformat(created_at),
+            "version": version,
+            "players": players,
+            "last_answer_id": last_answer_id,
+        }
+
+    def _reload(self, conn, session):
+        """Replace session's mutable state with what is in the database."""
+        self.flush()
+        status, version = conn.execute(
+            "SELECT status, version FROM sessions WHERE session_id = ?", (session.session_id,)
+        ).fetchone()
+        players, last_answer_id = self._read_players(
+            conn, session.session_id, session.players, session._last_answer_id
+        )
+        session._restore_state(status, version, players, last_answer_id)
+
+    def _read_players(self, conn, session_id: str, known: Dict[str, dict], last_answer_id: int):
+        """Read player rows, reusing answer lists we already hold and only
+        fetching answers newer than last_answer_id."""
+        players = {}
+        for pid, seq, name, score, joined_at, current_question, finished, start_time in conn.execute(
+            f"SELECT {_PLAYER_COLUMNS} FROM players WHERE session_id = ? ORDER BY seq", (session_id,)
+        ):
+            answers = known[pid]["answers"] if pid in known else []
+            players[pid] = {
+                "seq": seq,
+                "name": name,
+                "score": score,
+                "answers": answers,
+                "joined_at": datetime.fromisoformat(joined_at),
+                "current_question": current_question,
+                "finished": bool(finished),
+                "start_time": start_time,
+            }
+        for row in conn.execute(
+            f"SELECT {_ANSWER_COLUMNS} FROM answers WHERE session_id = ? AND id > ? ORDER BY id",
+            (session_id, last_answer_id),
+        ):
+            last_answer_id = row[0]
+            player = players.get(row[1])
+            if player is None:
+                continue
+            if all(a["question_num"] != row[2] for a in player["answers"]):
+                player["answers"].append(_answer_from_row(row))
+        return players, last_answer_id
+
+    # -- write-behind answers -----------------------------------------
+
+    def _queue_answers(self, session_id: str, answers):
+        rows = [
+            (
+                session_id,
+                player_id,
+                answer["question_num"],
+                answer["answer"],
+                int(answer["is_correct"]),
+                answer["time_taken"],
+                answer["points"],
+            )
+            for player_id, answer in answers
+        ]
+        with self._pending_lock:
+            self._pending.extend(rows)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write any queued answer rows now (inside this thread's open transaction, if any)."""
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        conn = self._connection()
+        in_transaction = conn.in_transaction
+        if not in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO answers "
+                "(session_id, player_id, question_num, answer, is_correct, time_taken, points) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        except BaseException:
+            if not in_transaction:
+                conn.execute("ROLLBACK")
+            with self._pending_lock:
+                self._pending[:0] = rows
+            raise
+        if not in_transaction:
+            conn.execute("COMMIT")
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Keep the rows queued and retry on the next tick
+                continue
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join()
+        self.flush()
+        for holder in list(self._connections):
+            holder.conn.close()
@@ -25,13 +25,8 @@ def generate_questions(
     if sub.empty:
         return []
 
-    # Determine sample size and sample without replacement when possible
-    n = min(num_questions, len(sub))
-    sampled = sub.sample(n=n, random_state=seed) if len(sub) >= n else sub.copy()
-
-    questions = []
-    for _, row in sampled.iterrows():
-        prompt = str(row[prompt_col]).strip()
-        answer = str(row[answer_col]).strip()
-        questions.append({"prompt": prompt, "answer": answer})
-    return questions
+    # Sample without replacement, then build every pair with column operations
+    sampled = sub.sample(n=min(num_questions, len(sub)), random_state=seed)
+    prompts = sampled[prompt_col].astype(str).str.strip().tolist()
+    answers = sampled[answer_col].astype(str).str.strip().tolist()
+    return [{"prompt": prompt, "answer": answer} for prompt, answer in zip(prompts, answers)]
@@ -0,0 +1,243 @@
+"""Estimate how hard each word is from every finished multiplayer game.
+
+Run with:
+    python -m quiz.calibration --archive-dir $QUIZZY_ARCHIVE_DIR
+
+Reads the game archives the session manager writes (QUIZZY_ARCHIVE_DIR),
+fits a two-parameter logistic IRT model per deck and writes one compact
+difficulty table per deck to QUIZZY_DIFFICULTY_DIR, which quiz generation
+uses for difficulty-balanced question sets.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+DIFFICULTY_DIR = os.environ.get("QUIZZY_DIFFICULTY_DIR") or os.path.join(os.path.expanduser("~"), ".quizzy", "difficulty")
+_SUFFIX = ".arrow"
+
+# Gaussian priors (MAP estimation) keep items everyone got right, or wrong,
+# at finite values instead of running off to +-infinity
+THETA_SD = 1.0
+DIFFICULTY_SD = 2.0
+DISCRIMINATION_SD = 0.5
+DISCRIMINATION_RANGE = (0.2, 4.0)
+
+
+def load_answers(archive_dir: str) -> pd.DataFrame:
+    """Every answer in the archived games, one row each
+
+    Columns: deck (digest), row (deck row), person (player within one game),
+    correct, seconds. Games archived without a deck digest are skipped.
+    """
+    decks, rows, persons, correct, seconds = [], [], [], [], []
+    person = 0
+    for path in sorted(glob.glob(os.path.join(archive_dir, "*.json"))):
+        try:
+            with open(path, encoding="utf-8") as f:
+                game = json.load(f)
+        except (OSError, ValueError):
+            continue
+        deck = game.get("quiz_settings", {}).get("deck")
+        if not deck:
+            continue
+        question_rows = [q["row"] for q in game.get("questions", [])]
+        for player in game.get("players", {}).values():
+            answers = player.get("answers", [])
+            valid = [a for a in answers if 0 <= a["question_num"] < len(question_rows)]
+            decks.extend([deck] * len(valid))
+            rows.extend(question_rows[a["question_num"]] for a in valid)
+            persons.extend([person] * len(valid))
+            correct.extend(a["is_correct"] for a in valid)
+            seconds.extend(a.get("time_taken", np.nan) for a in valid)
+            person += 1
+    return pd.DataFrame({
+        "deck": pd.Categorical(decks),
+        "row": np.asarray(rows, dtype=np.int32),
+        "person": np.asarray(persons, dtype=np.int64),
+        "correct": np.asarray(correct, dtype=bool),
+        "seconds": np.asarray(seconds, dtype=np.float32),
+    })
+
+
+def fit_2pl(items: np.ndarray, persons: np.ndarray, correct: np.ndarray,
+            iterations: int = 100, tol: float = 1e-4):
+    """MAP fit of P(correct) = sigmoid(a_i * (theta_p - b_i)) over sparse answers
+
+    items and persons are 0-based codes, one per answer. Each sweep takes a
+    damped Newton step for all abilities, then for all item parameters: a
+    few vector operations over the answers plus bincounts, so the cost is
+    O(answers) per sweep with no dense item x person matrix.
+
+    Returns:
+        (discrimination a, difficulty b, ability theta)
+    """
+    n_items, n_persons = int(items.max()) + 1, int(persons.max()) + 1
+    y = correct.astype(np.float64)
+    a = np.ones(n_items)
+    b = np.zeros(n_items)
+    theta = np.zeros(n_persons)
+
+    for _ in range(iterations):
+        # Abilities, items fixed
+        a_i, diff = a[items], theta[persons] - b[items]
+        p = 1.0 / (1.0 + np.exp(-a_i * diff))
+        residual, weight = y - p, p * (1.0 - p)
+        d_theta = np.clip(
+            (np.bincount(persons, a_i * residual, n_persons) - theta / THETA_SD ** 2)
+            / (np.bincount(persons, a_i * a_i * weight, n_persons) + 1 / THETA_SD ** 2),
+            -1.0, 1.0,
+        )
+        theta += d_theta
+        # Abilities are only defined up to a shift: pin their mean to 0
+        shift = theta.mean()
+        theta -= shift
+        b -= shift
+
+        # Item difficulty and discrimination, abilities fixed. b and a are
+        # strongly coupled, so each item takes a joint 2x2 Fisher scoring
+        # step; separate diagonal steps for the two can cycle forever.
+        a_i, diff = a[items], theta[persons] - b[items]
+        p = 1.0 / (1.0 + np.exp(-a_i * diff))
+        residual, weight = y - p, p * (1.0 - p)
+        grad_b = np.bincount(items, -a_i * residual, n_items) - b / DIFFICULTY_SD ** 2
+        grad_a = np.bincount(items, diff * residual, n_items) - (a - 1.0) / DISCRIMINATION_SD ** 2
+        info_bb = np.bincount(items, a_i * a_i * weight, n_items) + 1 / DIFFICULTY_SD ** 2
+        info_aa = np.bincount(items, diff * diff * weight, n_items) + 1 / DISCRIMINATION_SD ** 2
+        info_ab = np.bincount(items, -a_i * diff * weight, n_items)
+        det = info_bb * info_aa - info_ab * info_ab
+        d_b = np.clip((info_aa * grad_b - info_ab * grad_a) / det, -1.0, 1.0)
+        d_a = np.clip((info_bb * grad_a - info_ab * grad_b) / det, -0.5, 0.5)
+        b += d_b
+        new_a = np.clip(a + d_a, *DISCRIMINATION_RANGE)
+        d_a, a = new_a - a, new_a
+        if max(np.abs(d_theta).max(), np.abs(d_b).max(), np.abs(d_a).max()) < tol:
+            break
+    return a, b, theta
+
+
+def calibrate(answers: pd.DataFrame, min_answers: int = 5) -> Dict[str, pd.DataFrame]:
+    """Per-deck difficulty tables from load_answers() output
+
+    Each table has one row per deck row with at least min_answers answers:
+    row, answers, p_correct, difficulty (b), discrimination (a), and
+    median_seconds.
+    """
+    tables = {}
+    for deck, group in answers.groupby("deck", observed=True, sort=False):
+        counts = group["row"].value_counts()
+        group = group[group["row"].isin(counts.index[counts >= min_answers])]
+        if group.empty:
+            continue
+        items, item_rows = pd.factorize(group["row"], sort=True)
+        persons, _ = pd.factorize(group["person"])
+        correct = group["correct"].to_numpy()
+        a, b, _ = fit_2pl(items, persons, correct)
+
+        n_items = len(item_rows)
+        totals = np.bincount(items, minlength=n_items)
+        tables[deck] = pd.DataFrame({
+            "row": np.asarray(item_rows, dtype=np.int32),
+            "answers": totals.astype(np.int32),
+            "p_correct": (np.bincount(items, correct, n_items) / totals).astype(np.float32),
+            "difficulty": b.astype(np.float32),
+            "discrimination": a.astype(np.float32),
+            "median_seconds": group.groupby(items)["seconds"].median().to_numpy(dtype=np.float32),
+        })
+    return tables
+
+
+def _table_path(deck: str, directory: str) -> str:
+    return os.path.join(directory, f"{deck[:16]}{_SUFFIX}")
+
+
+def save_tables(tables: Dict[str, pd.DataFrame], directory: str = DIFFICULTY_DIR):
+    """Write each deck's table as an Arrow file, atomically"""
+    os.makedirs(directory, exist_ok=True)
+    for deck, table in tables.items():
+        path = _table_path(deck, directory)
+        tmp_path = f"{path}.tmp"
+        table.to_feather(tmp_path)
+        os.replace(tmp_path, path)
+    with _cache_lock:
+        _cache.clear()
+
+
+# path -> (mtime, table): rereads a deck's table only after a new calibration run
+_cache: Dict[str, tuple] = {}
+_cache_lock = threading.Lock()
+
+
+def load_difficulty(deck: str, directory: str = DIFFICULTY_DIR) -> Optional[pd.DataFrame]:
+    """The deck's difficulty table, or None if it hasn't been calibrated"""
+    path = _table_path(deck, directory)
+    try:
+        mtime = os.path.getmtime(path)
+        with _cache_lock:
+            cached = _cache.get(path)
+        if cached is None or cached[0] != mtime:
+            # Read outside the lock; only the dict itself is shared
+            cached = (mtime, pd.read_feather(path))
+            with _cache_lock:
+                _cache[path] = cached
+    except (OSError, ValueError):
+        return None
+    return cached[1]
+
+
+def row_difficulty(table: pd.DataFrame, deck_size: int) -> np.ndarray:
+    """Difficulty for every deck row; rows without data get the median"""
+    difficulty = np.full(deck_size, np.median(table["difficulty"]) if len(table) else 0.0, dtype=np.float32)
+    rows = table["row"].to_numpy()
+    in_deck = rows < deck_size
+    difficulty[rows[in_deck]] = table["difficulty"].to_numpy()[in_deck]
+    return difficulty
+
+
+def balanced_rows(table: pd.DataFrame, deck_size: int, k: int, rng: np.random.Generator = None) -> np.ndarray:
+    """k distinct rows spread evenly over the deck's difficulty range
+
+    The deck is sorted by difficulty and cut into k equal strata; one row is
+    drawn from each, then the order is shuffled.
+    """
+    rng = rng or np.random.default_rng()
+    k = min(k, deck_size)
+    # Random tie-break so uncalibrated rows (all at the median) mix
+    order = np.lexsort((rng.random(deck_size), row_difficulty(table, deck_size)))
+    bounds = np.linspace(0, deck_size, k + 1)
+    starts, ends = bounds[:-1].astype(np.int64), bounds[1:].astype(np.int64)
+    picks = starts + (rng.random(k) * (ends - starts)).astype(np.int64)
+    return rng.permutation(order[picks])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive-dir", default=os.environ.get("QUIZZY_ARCHIVE_DIR"), help="game archives to read")
+    parser.add_argument("--out-dir", default=DIFFICULTY_DIR, help="where to write the difficulty tables")
+    parser.add_argument("--min-answers", type=int, default=5, help="skip words answered fewer times")
+    args = parser.parse_args(argv)
+    if not args.archive_dir:
+        parser.error("no archive directory: pass --archive-dir or set QUIZZY_ARCHIVE_DIR")
+
+    start = time.perf_counter()
+    answers = load_answers(args.archive_dir)
+    loaded = time.perf_counter()
+    tables = calibrate(answers, args.min_answers)
+    save_tables(tables, args.out_dir)
+    done = time.perf_counter()
+    print(f"{len(answers):,} answers read in {loaded - start:.2f}s; "
+          f"{len(tables)} deck(s), {sum(map(len, tables.values())):,} words calibrated in {done - loaded:.2f}s")
+    for deck, table in tables.items():
+        print(f"  {deck[:16]}: {len(table)} words -> {_table_path(deck, args.out_dir)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
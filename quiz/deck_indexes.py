@@ -0,0 +1,40 @@
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+import pandas as pd
+
+
+class DeckIndexes:
+    """Per-deck derived objects, built once and dropped with the deck
+
+    Entries are keyed by the deck's id() (plus an optional key, e.g. the quiz
+    mode). The lock only guards the dict: the first caller for a key builds
+    the object outside it, and concurrent callers for the same key wait on
+    its Future, so a slow build never holds up other decks.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def get(self, df: pd.DataFrame, build: Callable[[], object], key: Hashable = None):
+        entry = (id(df), key)
+        with self._lock:
+            future = self._futures.get(entry)
+            owner = future is None
+            if owner:
+                future = self._futures[entry] = Future()
+                weakref.finalize(df, self._futures.pop, entry, None)
+        if owner:
+            try:
+                future.set_result(build())
+            except BaseException as exc:
+                # Let the next caller retry instead of caching the failure
+                with self._lock:
+                    if self._futures.get(entry) is future:
+                        del self._futures[entry]
+                future.set_exception(exc)
+                raise
+        return future.result()
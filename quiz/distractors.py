@@ -1,52 +1,148 @@
 import random
 
+import pandas as pd
 
-def get_distractors(df, target_row, correct_answer, mode):
-    answer_col = "english" if mode == "chinese_to_english" else "chinese"
-    if mode == "pinyin_to_chinese":
-        answer_col = "chinese"
-
-    # Strategy 1: Same pos and semantic_type
-    candidates = df[
-        (df["pos"] == target_row["pos"])
-        & (df["semantic_type"] == target_row["semantic_type"])
-        & (df[answer_col] != correct_answer)
-    ]
-    if len(candidates) >= 3:
-        return random.sample(list(candidates[answer_col]), 3)
-
-    # Strategy 2: Same pos
-    candidates = df[
-        (df["pos"] == target_row["pos"]) & (df[answer_col] != correct_answer)
-    ]
-    if len(candidates) >= 3:
-        return random.sample(list(candidates[answer_col]), 3)
-
-    # Strategy 3: Same semantic_type
-    candidates = df[
-        (df["semantic_type"] == target_row["semantic_type"])
-        & (df[answer_col] != correct_answer)
-    ]
-    if len(candidates) >= 3:
-        return random.sample(list(candidates[answer_col]), 3)
-
-    # Fallback: build a robust list of unique values excluding the correct answer
-    unique_candidates = list(df[df[answer_col] != correct_answer][answer_col].unique())
-    if len(unique_candidates) >= 3:
-        return random.sample(unique_candidates, 3)
-    if len(unique_candidates) > 0:
-        picked = random.sample(unique_candidates, min(3, len(unique_candidates)))
-        # fill remaining slots by sampling with replacement from available uniques
-        while len(picked) < 3:
-            picked.append(random.choice(unique_candidates))
+from quiz.deck_indexes import DeckIndexes
+from quiz.similarity import similarity_index
+
+
+def _answer_column(mode):
+    return "english" if mode == "chinese_to_english" else "chinese"
+
+
+def _bucket(values):
+    # Keep both the indexable list (for O(1) random picks) and a set (for
+    # O(1) "is the correct answer in here" checks).
+    values = [v for v in values if not pd.isna(v)]
+    return values, frozenset(values)
+
+
+class DistractorIndex:
+    """Pre-bucketed answer pools for one (deck, mode) pair.
+
+    Built once per deck so that picking distractors for a question costs
+    O(1) on average instead of scanning the whole DataFrame. Questions that
+    know their deck row draw from the row's precomputed confusable
+    neighbours (quiz.similarity) first.
+    """
+
+    __slots__ = ("answer_col", "answers", "neighbours", "by_pos_semantic", "by_pos", "by_semantic", "all_answers")
+
+    def __init__(self, df, mode):
+        self.answer_col = _answer_column(mode)
+        answers = df[self.answer_col]
+        self.answers = answers.to_numpy(dtype=object)
+        self.neighbours = similarity_index(df).neighbours
+        self.by_pos_semantic = {
+            key: _bucket(values)
+            for key, values in answers.groupby([df["pos"], df["semantic_type"]], sort=False, observed=True).unique().items()
+        }
+        self.by_pos = {
+            key: _bucket(values)
+            for key, values in answers.groupby(df["pos"], sort=False, observed=True).unique().items()
+        }
+        self.by_semantic = {
+            key: _bucket(values)
+            for key, values in answers.groupby(df["semantic_type"], sort=False, observed=True).unique().items()
+        }
+        self.all_answers = _bucket(answers.unique())
+
+    def draw(self, pos, semantic_type, correct_answer, k=3, row=None, rng=None):
+        """Pick k distractors: row's confusable neighbours, then the original DataFrame filter tiers.
+
+        rng is a random.Random to draw with (the random module's by default).
+        """
+        if rng is None:
+            rng = random
+        picked = self._confusable(row, correct_answer, k, rng) if row is not None else []
+        if len(picked) == k:
+            return picked
+        exclude = {correct_answer, *picked}
+        needed = k - len(picked)
+        tiers = (
+            self.by_pos_semantic.get((pos, semantic_type)),
+            self.by_pos.get(pos),
+            self.by_semantic.get(semantic_type),
+        )
+        for bucket in tiers:
+            if bucket is not None and _available(bucket, exclude) >= needed:
+                return picked + _sample_excluding(bucket[0], exclude, needed, rng)
+
+        # Fallback: unique values excluding the correct answer
+        values, members = self.all_answers
+        available = _available(self.all_answers, exclude)
+        if available >= needed:
+            return picked + _sample_excluding(values, exclude, needed, rng)
+        picked += _sample_excluding(values, exclude, available, rng)
+        available = len(picked)
+        if available > 0:
+            # fill remaining slots by sampling with replacement from available uniques
+            while len(picked) < k:
+                picked.append(rng.choice(picked[:available]))
+            return picked
+
+        # Ultimate fallback: include any values (including the correct answer) if necessary
+        if not values:
+            # defensively return the correct_answer repeated if DataFrame lacks values
+            return [correct_answer] * k
+        picked = rng.sample(values, min(k, len(values)))
+        while len(picked) < k:
+            picked.append(rng.choice(values))
         return picked
 
-    # Ultimate fallback: include any values (including the correct answer) if necessary
-    fallback_all = list(df[answer_col].unique())
-    if not fallback_all:
-        # defensively return the correct_answer repeated if DataFrame lacks values
-        return [correct_answer, correct_answer, correct_answer]
-    picked = random.sample(fallback_all, min(3, len(fallback_all)))
-    while len(picked) < 3:
-        picked.append(random.choice(fallback_all))
+    def _confusable(self, row, correct_answer, k, rng):
+        """Up to k distinct answers drawn from the 2k most similar neighbours of row
+
+        Drawing from a few more than k keeps repeated questions varied without
+        reaching down to the weakest neighbours.
+        """
+        candidates = []
+        for neighbour in self.neighbours[row].tolist():
+            if neighbour < 0 or len(candidates) == 2 * k:
+                break
+            value = self.answers[neighbour]
+            if not pd.isna(value) and value != correct_answer and value not in candidates:
+                candidates.append(value)
+        return rng.sample(candidates, min(k, len(candidates)))
+
+
+def _available(bucket, exclude):
+    values, members = bucket
+    return len(values) - sum(1 for value in exclude if value in members)
+
+
+def _sample_excluding(values, exclude, k, rng):
+    """Sample k distinct values, skipping those in exclude.
+
+    Uses rejection sampling on random positions, which is O(k) expected when
+    the pool is large; small pools fall back to a plain filtered sample.
+    """
+    n = len(values)
+    if n <= 4 * k:
+        return rng.sample([v for v in values if v not in exclude], k)
+
+    picked = []
+    seen = set()
+    while len(picked) < k:
+        i = rng.randrange(n)
+        if i in seen:
+            continue
+        seen.add(i)
+        value = values[i]
+        if value not in exclude:
+            picked.append(value)
     return picked
+
+
+_indexes = DeckIndexes()
+
+
+def distractor_index(df, mode):
+    """The DistractorIndex of a (deck, mode), built on first use and dropped with the deck"""
+    return _indexes.get(df, lambda: DistractorIndex(df, mode), _answer_column(mode))
+
+
+def get_distractors(df, target_row, correct_answer, mode, index=None, row=None):
+    if index is None:
+        index = distractor_index(df, mode)
+    return index.draw(target_row["pos"], target_row["semantic_type"], correct_answer, row=row)
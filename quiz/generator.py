@@ -1,13 +1,16 @@
 import random
-from quiz.distractors import get_distractors
+import numpy as np
+from quiz.distractors import distractor_index as cached_distractor_index, get_distractors
+from quiz.question import Question
 
 
-def generate_question(df, mode, used_words):
-    available_words = df[~df['chinese'].isin(used_words)]
-    if available_words.empty:
-        available_words = df  # Reset if all used
+def generate_question(df, mode, used_words, distractor_index=None):
+    available_rows = np.flatnonzero(~df['chinese'].isin(used_words).to_numpy())
+    if len(available_rows) == 0:
+        available_rows = np.arange(len(df))  # Reset if all used
 
-    target_row = available_words.sample(1).iloc[0]
+    row = int(random.choice(available_rows))
+    target_row = df.iloc[row]
 
     # Build a clear, user-friendly question string depending on mode
     if mode == "chinese_to_english":
@@ -28,13 +31,88 @@ def generate_question(df, mode, used_words):
         question_text = target_row.get("chinese", "")
         correct_answer = target_row.get("english", "")
 
-    distractors = get_distractors(df, target_row, correct_answer, mode)
+    distractors = get_distractors(df, target_row, correct_answer, mode, index=distractor_index, row=row)
     options = [correct_answer] + distractors
     random.shuffle(options)
 
-    return {
-        "question_text": question_text,
-        "options": options,
-        "correct_answer": correct_answer,
-        "target_row": target_row,
-    }
+    return Question(df, row, question_text, correct_answer, options)
+
+
+def _pick_rows(df, num_questions, rng):
+    """Pick row positions for num_questions targets in one permutation.
+
+    Mirrors generate_question's used_words rule: a Chinese word is not asked
+    twice until every word in the deck has been used, then the pool resets.
+    """
+    codes = df["chinese"].factorize()[0]
+    if num_questions <= len(codes) and codes.max() == len(codes) - 1:
+        # every word is distinct, so a plain draw without replacement suffices
+        return rng.choice(len(codes), size=num_questions, replace=False)
+
+    picked = []
+    remaining = num_questions
+    while remaining > 0:
+        order = rng.permutation(len(codes))
+        # keep only the first occurrence of each word in permuted order
+        _, first = np.unique(codes[order], return_index=True)
+        unique_rows = order[np.sort(first)]
+        picked.append(unique_rows[:remaining])
+        remaining -= len(picked[-1])
+    return np.concatenate(picked)
+
+
+def _prompts_and_answers(targets, mode):
+    def text(col):
+        return targets[col].astype(str)
+
+    if mode == "chinese_to_english":
+        question_text = "What is the word in English for: " + text("chinese") + " (" + text("pinyin") + ")"
+        answers = targets["english"]
+    elif mode == "english_to_chinese":
+        question_text = "What is the word in Chinese for: " + text("english")
+        answers = targets["chinese"]
+    elif mode == "pinyin_to_chinese":
+        question_text = "What is the word in Chinese for the pinyin: " + text("pinyin")
+        answers = targets["chinese"]
+    else:
+        # fallback: mirror previous behaviour
+        question_text = targets["chinese"]
+        answers = targets["english"]
+    return question_text.tolist(), answers.tolist()
+
+
+def generate_question_batch(df, mode, num_questions, distractor_index=None, seed=None, rows=None):
+    """Build num_questions questions at once.
+
+    Returns the same Questions as generate_question, but picks every target
+    in a single vectorized permutation instead of re-filtering the deck per
+    question. rows, if given, are the target row positions to ask instead
+    (e.g. chosen by a ReviewSchedule). The same seed gives the same
+    questions, distractors and option order.
+    """
+    if df.empty or num_questions <= 0:
+        return []
+    if distractor_index is None:
+        distractor_index = cached_distractor_index(df, mode)
+    rng = np.random.default_rng(seed)
+
+    if rows is None:
+        rows = _pick_rows(df, num_questions, rng)
+    rows = np.asarray(rows)
+    targets = df.iloc[rows]
+    question_texts, answers = _prompts_and_answers(targets, mode)
+    # DistractorIndex draws with random's API; seed it from the same stream
+    draw_rng = random.Random(int(rng.integers(2**63)))
+
+    options = np.empty((len(answers), 4), dtype=object)
+    options[:, 0] = answers
+    for i, (pos, semantic_type, answer) in enumerate(
+        zip(targets["pos"].tolist(), targets["semantic_type"].tolist(), answers)
+    ):
+        options[i, 1:] = distractor_index.draw(pos, semantic_type, answer, row=int(rows[i]), rng=draw_rng)
+    options = rng.permuted(options, axis=1)
+
+    return [
+        Question(df, rows[i], question_texts[i], answers[i], options[i])
+        for i in range(len(answers))
+    ]
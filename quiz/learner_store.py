@@ -0,0 +1,200 @@
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import pandas as pd
+
+LEARNER_DB = os.environ.get("QUIZZY_LEARNER_DB") or os.path.join(os.path.expanduser("~"), ".quizzy", "learners.db")
+
+# One row per (learner, deck, word): running totals, never one row per
+# attempt, so the table stays at learners x words however long people study.
+# Both query indexes are covering (WITHOUT ROWID tables carry the primary key
+# in every index), so reads never touch the table itself.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS learners (
+    learner_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS item_stats (
+    learner_id INTEGER NOT NULL,
+    deck TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    pos TEXT,
+    semantic_type TEXT,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    timed INTEGER NOT NULL,
+    total_seconds REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (learner_id, deck, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS item_stats_weakest
+    ON item_stats (learner_id, deck, (CAST(correct AS REAL) / attempts), attempts DESC, correct, timed, total_seconds);
+CREATE INDEX IF NOT EXISTS item_stats_by_category
+    ON item_stats (learner_id, deck, pos, semantic_type, attempts, correct);
+CREATE TABLE IF NOT EXISTS quizzes (
+    quiz_id INTEGER PRIMARY KEY,
+    learner_id INTEGER NOT NULL,
+    deck TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    score INTEGER NOT NULL,
+    questions INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quizzes_by_learner ON quizzes (learner_id, deck, finished_at);
+"""
+
+_UPSERT = """
+INSERT INTO item_stats VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, ?)
+ON CONFLICT (learner_id, deck, row) DO UPDATE SET
+    attempts = attempts + 1,
+    correct = correct + excluded.correct,
+    timed = timed + excluded.timed,
+    total_seconds = total_seconds + excluded.total_seconds,
+    last_seen = excluded.last_seen
+"""
+
+
+def _learner_name(name: str) -> str:
+    return name.strip().casefold()
+
+
+def _deck_key(digest: str) -> str:
+    # 16 hex digits of the deck's content hash: unique enough, and a quarter
+    # of the bytes in every row and index entry
+    return digest[:16]
+
+
+class LearnerStore:
+    """Per-learner, per-word solo results in SQLite (WAL)
+
+    A graded quiz is written in one transaction: its quizzes row plus one
+    executemany upsert over every answered word. The read queries are served
+    from covering indexes, so they stay index-range scans with 100k learners
+    x 5k words in the table.
+    """
+
+    def __init__(self, path: str = LEARNER_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db_lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _learner_id(self, conn, name: str, create: bool = False) -> Optional[int]:
+        name = _learner_name(name)
+        if create:
+            conn.execute("INSERT OR IGNORE INTO learners (name) VALUES (?)", (name,))
+        row = conn.execute("SELECT learner_id FROM learners WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def record_quiz(self, learner: str, deck: str, mode: str, rows, correct, seconds=None,
+                    pos=None, semantic_type=None, finished_at: float = None):
+        """Add one graded quiz on a deck (by digest): parallel sequences of deck rows, right/wrong and response seconds
+
+        seconds entries may be None when a response time is unknown; pos and
+        semantic_type are the rows' categories, stored for accuracy_by().
+        """
+        finished_at = time.time() if finished_at is None else finished_at
+        deck = _deck_key(deck)
+        rows = [int(row) for row in rows]
+        correct = [int(bool(c)) for c in correct]
+        seconds = list(seconds) if seconds is not None else [None] * len(rows)
+        pos = list(pos) if pos is not None else [None] * len(rows)
+        semantic_type = list(semantic_type) if semantic_type is not None else [None] * len(rows)
+        with self._transaction() as conn:
+            learner_id = self._learner_id(conn, learner, create=True)
+            conn.execute(
+                "INSERT INTO quizzes (learner_id, deck, mode, finished_at, score, questions) VALUES (?, ?, ?, ?, ?, ?)",
+                (learner_id, deck, mode, finished_at, sum(correct), len(rows)),
+            )
+            conn.executemany(_UPSERT, [
+                (learner_id, deck, row, p, s, ok, int(t is not None), float(t or 0.0), finished_at)
+                for row, ok, t, p, s in zip(rows, correct, seconds, pos, semantic_type)
+            ])
+
+    def _query(self, learner: str, sql: str, params: tuple, columns) -> pd.DataFrame:
+        with self._db_lock:
+            learner_id = self._learner_id(self._conn, learner)
+            result = [] if learner_id is None else self._conn.execute(sql, (learner_id,) + params).fetchall()
+        return pd.DataFrame(result, columns=columns)
+
+    def weakest(self, learner: str, deck: str, n: int = 10) -> pd.DataFrame:
+        """The n words with the lowest accuracy (most attempted first among ties)"""
+        return self._query(
+            learner,
+            """
+            SELECT row, attempts, correct, CAST(correct AS REAL) / attempts,
+                   CASE WHEN timed THEN total_seconds / timed END
+            FROM item_stats INDEXED BY item_stats_weakest
+            WHERE learner_id = ? AND deck = ?
+            ORDER BY CAST(correct AS REAL) / attempts, attempts DESC
+            LIMIT ?
+            """,
+            (_deck_key(deck), n),
+            ["row", "attempts", "correct", "accuracy", "avg_seconds"],
+        )
+
+    def accuracy_by(self, learner: str, deck: str, column: str = "pos") -> pd.DataFrame:
+        """Attempts and accuracy per part of speech or semantic type"""
+        if column not in ("pos", "semantic_type"):
+            raise ValueError(f"can't group by {column!r}")
+        return self._query(
+            learner,
+            f"""
+            SELECT {column}, COUNT(*), SUM(attempts), CAST(SUM(correct) AS REAL) / SUM(attempts)
+            FROM item_stats INDEXED BY item_stats_by_category
+            WHERE learner_id = ? AND deck = ?
+            GROUP BY {column}
+            ORDER BY 4
+            """,
+            (_deck_key(deck),),
+            [column, "words", "attempts", "accuracy"],
+        )
+
+    def recent_quizzes(self, learner: str, deck: str, n: int = 10) -> pd.DataFrame:
+        return self._query(
+            learner,
+            """
+            SELECT finished_at, mode, score, questions FROM quizzes
+            WHERE learner_id = ? AND deck = ?
+            ORDER BY finished_at DESC LIMIT ?
+            """,
+            (_deck_key(deck), n),
+            ["finished_at", "mode", "score", "questions"],
+        )
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
+
+
+_store: Optional[LearnerStore] = None
+_store_lock = threading.Lock()
+
+
+def get_learner_store() -> LearnerStore:
+    """The process-wide store at QUIZZY_LEARNER_DB"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LearnerStore()
+        return _store
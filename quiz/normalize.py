@@ -0,0 +1,122 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from quiz.deck_indexes import DeckIndexes
+
+# Alternatives inside one cell: "to look; to see", "你好/您好"
+_SEPARATORS = r"[;,/|、]"
+# Glosses like "(of a person) kind" or "bank [financial]"
+_PARENS = r"\([^)]*\)|\[[^\]]*\]"
+_LEADING_WORDS = r"^(?:to|a|an|the)\s+"
+_NON_WORD = r"[\W_]+"
+_NON_LETTER = r"[\W\d_]+"
+_NUMBERED_SYLLABLE = r"([a-zü]+)([0-5])"
+
+_TONE_MARKS = {1: "\u0304", 2: "\u0301", 3: "\u030c", 4: "\u0300"}  # combining macron, acute, caron, grave
+_VOWELS = "aeiouü"
+_STRING = pd.StringDtype("python")
+
+# Which deck columns a typed answer may match, per quiz mode. Chinese
+# answers can also be typed as pinyin, for learners without an IME.
+ANSWER_COLUMNS = {
+    "chinese_to_english": ("english",),
+    "english_to_chinese": ("chinese", "pinyin"),
+    "pinyin_to_chinese": ("chinese",),
+}
+
+
+def _mark_syllable(match) -> str:
+    """"hao3" -> "hǎo": the tone goes on a or e, else the o of "ou", else the last vowel"""
+    syllable, tone = match.group(1), int(match.group(2))
+    if tone not in _TONE_MARKS:
+        return syllable
+    if "a" in syllable:
+        i = syllable.index("a")
+    elif "e" in syllable:
+        i = syllable.index("e")
+    elif "ou" in syllable:
+        i = syllable.index("o")
+    else:
+        vowels = [i for i, ch in enumerate(syllable) if ch in _VOWELS]
+        if not vowels:
+            return syllable
+        i = vowels[-1]
+    return unicodedata.normalize("NFC", syllable[:i + 1] + _TONE_MARKS[tone] + syllable[i + 1:])
+
+
+def _prepare(values: pd.Series) -> pd.Series:
+    # Python-backed strings: the patterns rely on re's Unicode-aware \W (the
+    # Arrow backend's RE2 treats CJK and accented letters as non-word).
+    # NFKC folds full-width forms (，Ａ) into ASCII and composes tone marks.
+    return values.astype(_STRING).str.normalize("NFKC").str.casefold().str.replace(_PARENS, " ", regex=True)
+
+
+def _canonical(values: pd.Series, kind: str) -> pd.Series:
+    """Comparable form of already prepared text
+
+    english: no leading "to"/"a"/"the", no punctuation or spaces.
+    chinese: no punctuation or spaces.
+    pinyin: tone numbers turned into tone marks ("ni3 hao3" -> "nǐhǎo"),
+    then letters only, so marks and numbers compare equal.
+    """
+    # split().explode() hands back the default (Arrow) string dtype
+    values = values.astype(_STRING).str.strip()
+    if kind == "english":
+        return values.str.replace(_LEADING_WORDS, "", regex=True).str.replace(_NON_WORD, "", regex=True)
+    if kind == "pinyin":
+        values = values.str.replace("u:", "ü", regex=False).str.replace("v", "ü", regex=False)
+        values = values.str.replace(_NUMBERED_SYLLABLE, _mark_syllable, regex=True)
+        return values.str.replace(_NON_LETTER, "", regex=True)
+    return values.str.replace(_NON_WORD, "", regex=True)
+
+
+def normalize_answers(responses, kind: str) -> pd.Series:
+    """Canonical form of typed responses, one per response (never split into alternatives)"""
+    return _canonical(_prepare(pd.Series(list(responses), dtype=object)), kind).fillna("")
+
+
+class AnswerKey:
+    """Every accepted answer of every deck row, normalized once per deck
+
+    Each answer column becomes a (row, canonical answer) MultiIndex, with one
+    entry per alternative in the cell, so grading any number of typed
+    responses is a single vectorized isin() per column.
+    """
+
+    __slots__ = ("keys",)
+
+    def __init__(self, df: pd.DataFrame):
+        self.keys = {}
+        # The column name doubles as the normalization kind
+        for column in ("english", "chinese", "pinyin"):
+            if column not in df.columns:
+                continue
+            alternatives = _prepare(df[column].reset_index(drop=True)).str.split(_SEPARATORS, regex=True).explode()
+            canonical = _canonical(alternatives, column)
+            canonical = canonical[canonical.fillna("") != ""]
+            self.keys[column] = pd.MultiIndex.from_arrays([
+                canonical.index.to_numpy(dtype=np.int64),
+                canonical.to_numpy(dtype=object),
+            ])
+
+    def check(self, rows, responses, mode: str) -> np.ndarray:
+        """Boolean array: does each typed response answer the question on that row?"""
+        rows = np.asarray(rows, dtype=np.int64)
+        correct = np.zeros(len(rows), dtype=bool)
+        for column in ANSWER_COLUMNS.get(mode, ("english",)):
+            keys = self.keys.get(column)
+            if keys is None:
+                continue
+            given = normalize_answers(responses, column).to_numpy(dtype=object)
+            correct |= pd.MultiIndex.from_arrays([rows, given]).isin(keys)
+        return correct
+
+
+_indexes = DeckIndexes()
+
+
+def answer_key(df: pd.DataFrame) -> AnswerKey:
+    """The AnswerKey of a deck, built on first use and dropped with the deck"""
+    return _indexes.get(df, lambda: AnswerKey(df))
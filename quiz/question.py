@@ -0,0 +1,42 @@
+import sys
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Question:
+    """A single multiple-choice question.
+
+    Only the row position into the shared deck is stored; the full row is
+    looked up on demand (e.g. by the results views) instead of carrying a
+    pandas Series around with every question.
+    """
+
+    __slots__ = ("deck", "row", "question_text", "correct_answer", "options")
+
+    def __init__(self, deck, row, question_text, correct_answer, options):
+        self.deck = deck
+        self.row = int(row)
+        self.question_text = _intern(question_text)
+        self.correct_answer = _intern(correct_answer)
+        self.options = tuple(_intern(option) for option in options)
+
+    @property
+    def target_row(self):
+        """The deck row this question was built from, resolved lazily."""
+        return self.deck.iloc[self.row]
+
+    def metadata(self):
+        return self.target_row.to_dict()
+
+    def to_dict(self):
+        return {
+            "question_text": self.question_text,
+            "options": list(self.options),
+            "correct_answer": self.correct_answer,
+            "row": self.row,
+        }
+
+    def __repr__(self):
+        return f"Question(row={self.row}, question_text={self.question_text!r})"
@@ -0,0 +1,212 @@
+import collections
+import hashlib
+import heapq
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+DAY = 86400.0
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Grades on SM-2's 0-5 scale for a right or wrong multiple-choice/typed answer
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+
+SCHEDULE_DIR = os.environ.get("QUIZZY_SCHEDULE_DIR") or os.path.join(os.path.expanduser("~"), ".quizzy", "schedules")
+CACHED_SCHEDULES = 256
+
+
+class ReviewSchedule:
+    """SM-2 spaced-repetition state for one learner on one deck
+
+    Every column (ease, interval, repetitions, lapses, due) is a NumPy array
+    aligned with the deck's row positions, so a 5k-word deck costs ~130 KB
+    and grading a quiz updates all its rows in one vectorized step.
+
+    Words already studied sit in a heap keyed by due time; unseen words
+    wait in a shuffled queue. next_rows(k) serves overdue reviews first,
+    then new words, then the reviews coming up soonest, in O(k log N).
+    Heap entries go stale when a row is reviewed again; they are skipped
+    on the way out and swept when the heap grows past twice the deck.
+    """
+
+    def __init__(self, size: int, rng: np.random.Generator = None):
+        rng = rng or np.random.default_rng()
+        self.size = size
+        self.ease = np.full(size, DEFAULT_EASE, dtype=np.float32)
+        self.interval = np.zeros(size, dtype=np.float32)  # days
+        self.reps = np.zeros(size, dtype=np.int16)
+        self.lapses = np.zeros(size, dtype=np.int16)
+        self.due = np.zeros(size, dtype=np.float64)  # epoch seconds; 0 = never studied
+        self.new_order = rng.permutation(size).astype(np.int32)
+        self._new_cursor = 0
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def _rebuild_heap(self):
+        seen = np.flatnonzero(self.due > 0)
+        self._heap = list(zip(self.due[seen].tolist(), seen.tolist()))
+        heapq.heapify(self._heap)
+
+    def _pop_valid(self):
+        while self._heap:
+            due, row = heapq.heappop(self._heap)
+            if self.due[row] == due:
+                return due, row
+        return None
+
+    def next_rows(self, k: int, now: float = None) -> np.ndarray:
+        """Row positions for the next k questions (fewer only if the deck is smaller)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            overdue, upcoming = [], []
+            while len(overdue) < k:
+                entry = self._pop_valid()
+                if entry is None:
+                    break
+                (overdue if entry[0] <= now else upcoming).append(entry)
+                if entry[0] > now:
+                    break
+
+            fresh = []
+            cursor = self._new_cursor
+            while len(overdue) + len(fresh) < k and cursor < self.size:
+                row = int(self.new_order[cursor])
+                if self.due[row] == 0:
+                    fresh.append(row)
+                elif cursor == self._new_cursor:
+                    # The queue's head was reviewed since it was queued: drop
+                    # it for good. Reviewed rows behind a still-new one are
+                    # only skipped, so offered-but-unanswered rows stay queued.
+                    self._new_cursor = cursor + 1
+                cursor += 1
+
+            while len(overdue) + len(fresh) + len(upcoming) < k:
+                entry = self._pop_valid()
+                if entry is None:
+                    break
+                upcoming.append(entry)
+
+            picked = overdue + upcoming
+            # Peeking must not consume: everything popped goes back
+            for entry in picked:
+                heapq.heappush(self._heap, entry)
+            rows = [row for _, row in overdue] + fresh + [row for _, row in upcoming]
+            return np.asarray(rows[:k], dtype=np.int64)
+
+    def review(self, rows, quality, now: float = None):
+        """Apply SM-2 to a batch of answered rows (quality 0-5 each)"""
+        now = time.time() if now is None else now
+        rows = np.asarray(rows, dtype=np.int64)
+        quality = np.broadcast_to(np.asarray(quality, dtype=np.float32), rows.shape)
+        # A row asked twice in one quiz keeps its last answer
+        rows, last = np.unique(rows[::-1], return_index=True)
+        quality = quality[::-1][last]
+
+        with self._lock:
+            passed = quality >= 3
+            miss = 5 - quality
+            ease = np.maximum(MIN_EASE, self.ease[rows] + 0.1 - miss * (0.08 + miss * 0.02))
+            reps = np.where(passed, self.reps[rows] + 1, 0)
+            interval = np.select(
+                [~passed, reps == 1, reps == 2],
+                [1.0, 1.0, 6.0],
+                np.rint(self.interval[rows] * ease),
+            )
+            self.ease[rows] = ease
+            self.reps[rows] = reps
+            self.interval[rows] = interval
+            self.lapses[rows] += (~passed & (self.due[rows] > 0)).astype(np.int16)
+            self.due[rows] = now + interval * DAY
+
+            for due, row in zip(self.due[rows].tolist(), rows.tolist()):
+                heapq.heappush(self._heap, (due, row))
+            if len(self._heap) > 2 * self.size:
+                self._rebuild_heap()
+
+    def review_answers(self, rows, correct, now: float = None):
+        """review() for right/wrong answers"""
+        quality = np.where(np.asarray(correct, dtype=bool), QUALITY_CORRECT, QUALITY_WRONG)
+        self.review(rows, quality, now)
+
+    def stats(self, now: float = None) -> dict:
+        now = time.time() if now is None else now
+        seen = self.due > 0
+        return {
+            "new": int((~seen).sum()),
+            "due": int((seen & (self.due <= now)).sum()),
+            "learning": int((seen & (self.reps < 3)).sum()),
+            "mature": int((self.interval >= 21).sum()),
+        }
+
+    def save(self, path: str, deck_digest: str = ""):
+        """Atomically write the schedule as an .npz, tagged with the deck's content digest"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f, ease=self.ease, interval=self.interval, reps=self.reps,
+                    lapses=self.lapses, due=self.due, new_order=self.new_order,
+                    deck=np.array(deck_digest),
+                )
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, size: int, deck_digest: str = "") -> "ReviewSchedule":
+        """Load a saved schedule, or start a fresh one if there is none for this deck
+
+        A file tagged with another deck's digest, or sized for another deck,
+        is ignored.
+        """
+        schedule = cls(size)
+        try:
+            with np.load(path) as data:
+                saved_deck = str(data["deck"]) if "deck" in data.files else None
+                if len(data["due"]) == size and saved_deck in (None, deck_digest):
+                    for name in ("ease", "interval", "reps", "lapses", "due", "new_order"):
+                        setattr(schedule, name, data[name].copy())
+        except (OSError, KeyError, ValueError):
+            pass
+        schedule._rebuild_heap()
+        return schedule
+
+
+def schedule_path(learner: str, deck_digest: str) -> str:
+    # Keyed by the deck's content digest, never its file name, so different
+    # decks sharing a name keep separate schedules. Hash the learner's name:
+    # it is free text typed by the learner
+    learner_id = hashlib.sha256(learner.strip().casefold().encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SCHEDULE_DIR, f"{learner_id}-{deck_digest[:16]}.npz")
+
+
+_schedules = collections.OrderedDict()
+_schedules_lock = threading.Lock()
+
+
+def get_schedule(learner: str, deck_digest: str, size: int) -> ReviewSchedule:
+    """The learner's schedule for a deck, kept in memory for the most recent learners"""
+    path = schedule_path(learner, deck_digest)
+    with _schedules_lock:
+        schedule = _schedules.get(path)
+        if schedule is not None and schedule.size == size:
+            _schedules.move_to_end(path)
+            return schedule
+    schedule = ReviewSchedule.load(path, size, deck_digest)
+    with _schedules_lock:
+        schedule = _schedules.setdefault(path, schedule)
+        while len(_schedules) > CACHED_SCHEDULES:
+            _schedules.popitem(last=False)
+    return schedule
+
+
+def save_schedule(learner: str, deck_digest: str, schedule: ReviewSchedule):
+    try:
+        schedule.save(schedule_path(learner, deck_digest), deck_digest)
+    except OSError:
+        # Progress is a convenience; never fail grading over it
+        pass
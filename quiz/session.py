@@ -1,22 +1,86 @@
-from quiz.generator import generate_question
+import numpy as np
+import pandas as pd
+from quiz.calibration import balanced_rows, load_difficulty
+from quiz.distractors import distractor_index
+from quiz.generator import generate_question_batch
+from quiz.normalize import answer_key
 
-def initialize_quiz(df, settings):
-    questions = []
-    used_words = []
-    for _ in range(settings['num_questions']):
-        q = generate_question(df, settings['mode'], used_words)
-        questions.append(q)
-        used_words.append(q['target_row']['chinese'])
-    return questions
+def initialize_quiz(df, settings, rows=None):
+    # Bucket the deck once per deck and mode so each question's distractors are O(1) to draw
+    index = distractor_index(df, settings['mode'])
+    if settings.get('typed'):
+        # Normalize the deck's answers now rather than when the quiz is graded
+        answer_key(df)
+    if rows is None and settings.get('balanced') and settings.get('deck'):
+        # Spread the questions over the calibrated difficulty range
+        difficulty = load_difficulty(settings['deck'])
+        if difficulty is not None:
+            rows = balanced_rows(difficulty, len(df), settings['num_questions'])
+    return generate_question_batch(df, settings['mode'], settings['num_questions'], distractor_index=index, rows=rows)
 
 def submit_answer(history, question, user_choice):
-    is_correct = user_choice == question['correct_answer']
+    is_correct = user_choice == question.correct_answer
     history.append({
-        "question_text": question['question_text'],
-        "options": question['options'],
+        "question_text": question.question_text,
+        "options": list(question.options),
         "user_choice": user_choice,
-        "correct_choice": question['correct_answer'],
+        "correct_choice": question.correct_answer,
         "is_correct": is_correct,
-        **question['target_row'].to_dict()
+        "row": question.row,
     })
     return is_correct
+
+def grade_quiz(history, questions, responses, settings):
+    """Grade every answer of a quiz in one batched comparison.
+
+    Typed answers (settings['typed']) are matched after normalization against
+    every accepted form in the deck; chosen options must equal the correct
+    answer exactly. Appends one history entry per question, returns the score.
+    """
+    if not questions:
+        return 0
+    if settings.get('typed'):
+        key = answer_key(questions[0].deck)
+        correct = key.check([q.row for q in questions], responses, settings['mode'])
+    else:
+        correct = np.array(responses, dtype=object) == np.array([q.correct_answer for q in questions], dtype=object)
+    for question, user_choice, is_correct in zip(questions, responses, correct.tolist()):
+        history.append({
+            "question_text": question.question_text,
+            "options": list(question.options),
+            "user_choice": user_choice,
+            "correct_choice": question.correct_answer,
+            "is_correct": is_correct,
+            "row": question.row,
+        })
+    return int(correct.sum())
+
+def response_times(started_at, answered_at, count):
+    """Seconds spent on each question of a quiz shown all at once.
+
+    answered_at maps question index -> when its answer last changed. Each
+    answer is credited with the time since the previous answer (or the quiz
+    start); questions never answered get None.
+    """
+    seconds = [None] * count
+    if not answered_at:
+        return seconds
+    order = sorted(answered_at, key=answered_at.get)
+    stamps = np.array([answered_at[i] for i in order], dtype=float)
+    gaps = np.maximum(np.diff(stamps, prepend=started_at), 0.0)
+    for i, gap in zip(order, gaps.tolist()):
+        if i < count:
+            seconds[i] = gap
+    return seconds
+
+def history_frame(history, deck):
+    """Expand graded history with the deck row behind each question.
+
+    Row metadata is only looked up here, in one vectorized take, rather than
+    being copied into every history entry at grading time.
+    """
+    df_hist = pd.DataFrame(history)
+    if df_hist.empty or deck is None or "row" not in df_hist:
+        return df_hist
+    rows = deck.iloc[df_hist.pop("row").to_numpy()].reset_index(drop=True)
+    return pd.concat([df_hist, rows], axis=1)
@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+
+from quiz.deck_indexes import DeckIndexes
+
+# Neighbours kept per row: the confusable candidates distractors come from
+NEIGHBOURS = 8
+# Rows per row that get the (costlier) pinyin edit distance after the cheap
+# shared-key score has ranked them
+_CANDIDATES = 16
+# Partners per row for each key it shares. A key carried by thousands of
+# rows (a common character, a frequent syllable) pairs each of them with
+# this many random others, so pair counts stay linear in the deck size.
+_PAIRS_PER_KEY = 8
+# Toneless pinyin is compared over at most this many letters
+_PINYIN_LETTERS = 12
+
+# Shared-key weights are 2-bit integers: they ride in the low bits of the
+# sorted pair keys (see _shared_key_scores)
+_CHAR_WEIGHT = 3
+_SYLLABLE_WEIGHT = 2
+_NEAR_SYLLABLE_WEIGHT = 1
+_GLOSS_WEIGHT = 2
+_PINYIN_WEIGHT = 3.0
+_POS_WEIGHT = 0.5
+
+_STRING = pd.StringDtype("python")
+_HANZI = r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"
+_SYLLABLE_SEPARATORS = r"[\s'’\-]+"
+_GLOSS_WORD = r"[^\W\d_]{3,}"
+_PARENS = r"\([^)]*\)|\[[^\]]*\]"
+_GLOSS_STOPWORDS = frozenset({"the", "and", "for", "one", "sth", "something", "someone", "with", "etc"})
+
+
+def _toneless(pinyin: pd.Series) -> pd.Series:
+    """"Nǐ hǎo" / "ni3 hao3" -> "ni hao": no tone marks or numbers (ü becomes u)"""
+    return (
+        pinyin.astype(_STRING).str.normalize("NFD")
+        .str.replace(r"[\u0300-\u036f\d]", "", regex=True)
+        .str.casefold().str.strip()
+    )
+
+
+def _near_keys(syllable: str) -> list:
+    # The syllable plus each one-letter deletion: two syllables one edit
+    # apart ("shi"/"si", "hao"/"hai") always share one of these keys
+    return [syllable] + [syllable[:i] + syllable[i + 1:] for i in range(len(syllable))] if len(syllable) > 1 else [syllable]
+
+
+def _postings(values: pd.Series):
+    """(row positions, key strings) from a Series of lists of keys, one entry per distinct (row, key)"""
+    exploded = values.explode().dropna()
+    exploded = exploded[exploded != ""]
+    pairs = pd.DataFrame({"row": exploded.index.to_numpy(dtype=np.int64), "key": exploded.to_numpy(dtype=object)})
+    pairs = pairs.drop_duplicates()
+    return pairs["row"].to_numpy(), pairs["key"].to_numpy(dtype=object)
+
+
+def _inverted(rows: np.ndarray, keys: np.ndarray) -> dict:
+    """key -> row positions (int32), sharing one sorted array"""
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(codes, kind="stable")
+    sorted_rows = rows[order].astype(np.int32)
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {key: sorted_rows[bounds[i]:bounds[i + 1]] for i, key in enumerate(uniques)}
+
+
+def _key_pairs(rows: np.ndarray, keys: np.ndarray, rng: np.random.Generator):
+    """(row, other row) pairs for rows sharing a key, at most _PAIRS_PER_KEY per row and key
+
+    Within each key's rows (shuffled), every row pairs with the next ones
+    round the circle: all ordered pairs for small groups, a random sample
+    for large ones.
+    """
+    if len(rows) == 0:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    codes = pd.factorize(keys)[0]
+    order = np.lexsort((rng.random(len(rows)), codes))
+    rows, codes = rows[order], codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(codes)])
+    size, start = np.repeat(sizes, sizes), np.repeat(starts, sizes)
+    position = np.arange(len(rows)) - start
+    left, right = [], []
+    for offset in range(1, _PAIRS_PER_KEY + 1):
+        paired = offset < size
+        if not paired.any():
+            break
+        left.append(rows[paired])
+        right.append(rows[start[paired] + (position[paired] + offset) % size[paired]])
+    if not left:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    return np.concatenate(left), np.concatenate(right)
+
+
+def _unique_sorted(values: np.ndarray) -> np.ndarray:
+    # np.sort + a run mask is several times faster than np.unique on int64
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+def _shared_key_scores(pair_keys: np.ndarray, weights: np.ndarray):
+    """(unique pair keys, summed weight of each), with weights packed into the sort key"""
+    if len(pair_keys) == 0:
+        return pair_keys, weights
+    packed = np.sort((pair_keys << 2) | weights)
+    keys = packed >> 2
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(packed & 3, starts)
+
+
+def _edit_distance(a: np.ndarray, a_len: np.ndarray, b: np.ndarray, b_len: np.ndarray) -> np.ndarray:
+    """Levenshtein distance between rows of two zero-padded code arrays, all pairs at once
+
+    The DP runs row by row over every pair in parallel; within a row, the
+    insertion chain is a running minimum, so each row is a few array ops.
+    """
+    pairs, width = a.shape
+    steps = np.arange(width + 1, dtype=np.int8)
+    previous = np.broadcast_to(steps, (pairs, width + 1))
+    distance = b_len.astype(np.int8)  # for empty a
+    for i in range(1, int(a_len.max(initial=0)) + 1):
+        candidate = np.empty((pairs, width + 1), dtype=np.int8)
+        candidate[:, 0] = i
+        substitute = previous[:, :-1] + (a[:, i - 1, None] != b)
+        candidate[:, 1:] = np.minimum(substitute, previous[:, 1:] + 1)
+        # current[j] = min over k <= j of candidate[k] + (j - k)
+        current = np.minimum.accumulate(candidate - steps, axis=1) + steps
+        done = np.flatnonzero(a_len == i)
+        distance[done] = current[done, b_len[done]]
+        previous = current
+    return distance
+
+
+class SimilarityIndex:
+    """Which words of a deck are easy to confuse with each other
+
+    Built once per deck. The inverted indexes map each Chinese character
+    (by_char) and each toneless pinyin syllable (by_syllable) to the rows
+    containing it. Rows sharing characters, syllables (exactly or one edit
+    apart) or English gloss words become candidates, scored by what they
+    share; the best candidates are re-ranked with the tone-insensitive edit
+    distance of their whole pinyin, plus a small bonus for the same part of
+    speech. neighbours[row] lists the NEIGHBOURS most similar rows, best
+    first, padded with -1.
+
+    Every step works on arrays of (row, key) or (row, row) pairs whose size
+    is bounded by the deck size times a constant, so a 100k-row deck builds
+    in seconds, and reading a row's neighbours is O(NEIGHBOURS).
+    """
+
+    __slots__ = ("by_char", "by_syllable", "neighbours")
+
+    def __init__(self, df: pd.DataFrame, rng: np.random.Generator = None):
+        rng = rng or np.random.default_rng()
+        n = len(df)
+        self.neighbours = np.full((n, NEIGHBOURS), -1, dtype=np.int32)
+        if n == 0:
+            self.by_char, self.by_syllable = {}, {}
+            return
+        df = df.reset_index(drop=True)
+        empty = pd.Series([[]] * n, dtype=object)
+
+        chinese = df["chinese"].astype(_STRING).str.findall(_HANZI) if "chinese" in df else empty
+        char_rows, chars = _postings(chinese)
+        self.by_char = _inverted(char_rows, chars)
+
+        toneless = _toneless(df["pinyin"]) if "pinyin" in df else pd.Series([""] * n, dtype=_STRING)
+        syllable_rows, syllables = _postings(toneless.str.split(_SYLLABLE_SEPARATORS, regex=True))
+        self.by_syllable = _inverted(syllable_rows, syllables)
+        near = pd.Series(syllables).map({s: _near_keys(s) for s in set(syllables)})
+        near.index = syllable_rows
+        near_rows, near_keys = _postings(near)
+
+        if "english" in df:
+            glosses = df["english"].astype(_STRING).str.casefold().str.replace(_PARENS, " ", regex=True)
+            gloss_rows, gloss_words = _postings(glosses.str.findall(_GLOSS_WORD))
+            common = np.array([word not in _GLOSS_STOPWORDS for word in gloss_words], dtype=bool)
+            gloss_rows, gloss_words = gloss_rows[common], gloss_words[common]
+        else:
+            gloss_rows, gloss_words = np.empty(0, np.int64), np.empty(0, dtype=object)
+
+        # Cheap score: weighted count of shared keys (near syllables count once per pair)
+        left, weight = [], []
+        for rows, keys, key_weight, once in (
+            (char_rows, chars, _CHAR_WEIGHT, False),
+            (syllable_rows, syllables, _SYLLABLE_WEIGHT, False),
+            (near_rows, near_keys, _NEAR_SYLLABLE_WEIGHT, True),
+            (gloss_rows, gloss_words, _GLOSS_WEIGHT, False),
+        ):
+            a, b = _key_pairs(rows, keys, rng)
+            pair_keys = a * n + b
+            if once:
+                pair_keys = _unique_sorted(pair_keys)
+            left.append(pair_keys)
+            weight.append(np.full(len(pair_keys), key_weight, dtype=np.int64))
+        pair_keys, score = _shared_key_scores(np.concatenate(left), np.concatenate(weight))
+        a, b = np.divmod(pair_keys, n)
+        keep = _top_per_row(a, score, _CANDIDATES)
+        a, b, score = a[keep], b[keep], score[keep]
+
+        # Re-rank by tone-insensitive edit distance over the whole pinyin
+        letters = toneless.str.replace(r"\W+", "", regex=True).fillna("").str.slice(0, _PINYIN_LETTERS)
+        lengths = letters.str.len().to_numpy(dtype=np.int64)
+        width = max(1, int(lengths.max()))
+        codes = np.array(letters.tolist(), dtype=f"<U{width}").view(np.uint32).reshape(n, width)
+        distance = _edit_distance(codes[a], lengths[a], codes[b], lengths[b])
+        longest = np.maximum(np.maximum(lengths[a], lengths[b]), 1)
+        score = score + _PINYIN_WEIGHT * (1.0 - distance / longest)
+        if "pos" in df:
+            pos = pd.factorize(df["pos"])[0]
+            score = score + _POS_WEIGHT * (pos[a] == pos[b])
+
+        keep = _top_per_row(a, score, NEIGHBOURS)
+        a, b, score = a[keep], b[keep], score[keep]
+        order = np.lexsort((-score, a))
+        a, b = a[order], b[order]
+        rank = np.arange(len(a)) - np.searchsorted(a, a)
+        self.neighbours[a, rank] = b
+
+
+def _top_per_row(rows: np.ndarray, score: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best-scoring pairs of each row"""
+    order = np.lexsort((-score, rows))
+    sorted_rows = rows[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_rows, sorted_rows)
+    return order[rank < k]
+
+
+_indexes = DeckIndexes()
+
+
+def similarity_index(df: pd.DataFrame) -> SimilarityIndex:
+    """The SimilarityIndex of a deck, built on first use and dropped with the deck"""
+    return _indexes.get(df, lambda: SimilarityIndex(df))
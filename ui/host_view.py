@@ -1,26 +1,17 @@
 import streamlit as st
-import pandas as pd
-import time
+from quiz.calibration import load_difficulty
 from quiz.session import initialize_quiz
+from multiplayer.adaptive import LEVEL_NAMES, build_pool
+from multiplayer.pins import PinSpaceExhausted
 from multiplayer.qr_generator import generate_qr_code, generate_join_url
 from ui.leaderboard import render_leaderboard, render_mini_leaderboard
+from ui.live_refresh import rerun_on_change
 from ui.theme import inject_ui
-from core.loader import load_excel
-
-
-def _sample_df():
-    """Generate sample dataset"""
-    data = {
-        "chinese": ["你好", "谢谢", "再见", "早上好", "晚安", "对不起", "没关系", "请", "是", "不是"],
-        "pinyin": ["nǐ hǎo", "xiè xie", "zài jiàn", "zǎo shàng hǎo", "wǎn ān", "duì bu qǐ", "méi guān xi", "qǐng", "shì", "bú shì"],
-        "english": ["hello", "thanks", "goodbye", "good morning", "good night", "sorry", "no problem", "please", "yes", "no"],
-        "example_sentence": ["你好！", "谢谢你。", "再见！", "早上好！", "晚安！", "对不起。", "没关系。", "请坐。", "是的。", "不是。"],
-        "pos": ["interjection", "verb", "interjection", "interjection", "interjection", "verb", "phrase", "verb", "verb", "verb"],
-        "semantic_type": ["greeting", "gratitude", "farewell", "greeting", "farewell", "apology", "response", "courtesy", "affirmation", "negation"],
-    }
-    return pd.DataFrame(data)
+from core.loader import load_deck, sample_deck
+from core.metrics import timed_render
 
 
+@timed_render
 def render_host_setup():
     """Render the host setup screen to create a multiplayer session"""
     inject_ui()
@@ -70,7 +61,7 @@ def render_host_setup():
     with tab1:
         st.markdown("**Quick start with built-in vocabulary**")
         if st.button("✅ Load Sample Dataset", type="primary", use_container_width=True):
-            st.session_state.df = _sample_df()
+            st.session_state.deck = sample_deck()
             st.success("✅ Sample dataset loaded!")
             st.rerun()
     
@@ -81,16 +72,16 @@ def render_host_setup():
         
         if uploaded is not None:
             try:
-                custom_df = load_excel(uploaded)
-                if custom_df is not None:
-                    st.session_state.df = custom_df
-                    st.success(f"✅ Dataset loaded! ({len(custom_df)} rows)")
+                custom_deck = load_deck(uploaded)
+                if custom_deck is not None:
+                    st.session_state.deck = custom_deck
+                    st.success(f"✅ Dataset loaded! ({len(custom_deck)} rows)")
             except Exception as e:
                 st.error(f"❌ File loading failed: {str(e)}")
     
     # Show dataset preview if loaded
-    if st.session_state.get("df") is not None:
-        df = st.session_state.df
+    if st.session_state.get("deck") is not None:
+        df = st.session_state.deck.df
         with st.expander("👀 Preview Dataset", expanded=False):
             st.dataframe(df.head(5), use_container_width=True)
             st.caption(f"Total: {len(df)} vocabulary items")
@@ -98,11 +89,11 @@ def render_host_setup():
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Only show game settings if dataset is loaded
-    if st.session_state.get("df") is None:
+    if st.session_state.get("deck") is None:
         st.info("👆 Please load a dataset first to continue")
         return
     
-    df = st.session_state.df
+    df = st.session_state.deck.df
     max_questions = len(df)
     
     # Game Settings Section
@@ -140,6 +131,23 @@ def render_host_setup():
             key="host_time_limit",
             help="Time limit for each question"
         )
+        
+        adaptive = st.checkbox(
+            "🎯 Adaptive difficulty",
+            value=False,
+            key="host_adaptive",
+            help="Each player's next question gets harder or easier with their accuracy; harder questions score more"
+        )
+        
+        calibrated = load_difficulty(st.session_state.deck.digest) is not None
+        balanced = st.checkbox(
+            "⚖️ Balance difficulty",
+            value=calibrated,
+            disabled=not calibrated or adaptive,
+            key="host_balanced",
+            help="Mix easy and hard words, using how players did in past games"
+            if calibrated else "Available once this deck's past games have been calibrated (python -m quiz.calibration)"
+        )
     
     # Map display names to internal modes
     mode_map = {
@@ -161,7 +169,7 @@ def render_host_setup():
         st.markdown(f"""
         **Game Summary:**
         - 👤 Host: **{host_name}**
-        - 📝 Questions: **{num_questions}**
+        - 📝 Questions: **{num_questions}**{" (🎯 adaptive)" if adaptive else ""}
         - 🎓 Mode: **{mode}**
         - ⏱️ Time Limit: **{time_limit}s per question**
         - 📊 Dataset: **{len(df)} items available**
@@ -179,21 +187,33 @@ def render_host_setup():
                 "num_questions": num_questions,
                 "mode": internal_mode,
                 "time_limit": time_limit,
+                # Lets archived games be calibrated per deck (quiz.calibration)
+                "deck": st.session_state.deck.digest,
+                "balanced": balanced,
             }
             
             with st.spinner("Generating questions..."):
-                questions = initialize_quiz(df, quiz_settings)
+                if adaptive:
+                    # One pool for the whole game, num_questions per difficulty level
+                    questions, quiz_settings["difficulty_levels"] = build_pool(df, quiz_settings)
+                else:
+                    questions = initialize_quiz(df, quiz_settings)
             
             # Create game session
-            session = session_manager.create_session(
-                host_name=host_name,
-                quiz_settings=quiz_settings,
-                questions=questions
-            )
+            try:
+                session = session_manager.create_session(
+                    host_name=host_name,
+                    quiz_settings=quiz_settings,
+                    questions=questions
+                )
+            except PinSpaceExhausted:
+                session = None
+                st.error("❌ Too many games are running right now. Please try again in a few minutes.")
             
-            st.session_state.current_session_id = session.session_id
-            st.session_state.page = "host_lobby"
-            st.rerun()
+            if session is not None:
+                st.session_state.current_session_id = session.session_id
+                st.session_state.page = "host_lobby"
+                st.rerun()
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -222,6 +242,7 @@ def render_host_setup():
         """)
 
 
+@timed_render
 def render_host_lobby():
     """Render the host lobby where players can join"""
     inject_ui()
@@ -243,6 +264,9 @@ def render_host_lobby():
             st.rerun()
         return
     
+    snapshot = session.snapshot()
+    players = snapshot["players"]
+    
     st.markdown("<div class='app-title'>🎮 Game Lobby 🎮</div>", unsafe_allow_html=True)
     
     # Responsive layout
@@ -322,14 +346,14 @@ def render_host_lobby():
     with col2:
         st.markdown(f"""
         <div class='section-card'>
-        <div class='section-title'>👥 Players ({len(session.players)})</div>
+        <div class='section-title'>👥 Players ({len(players)})</div>
         </div>
         """, unsafe_allow_html=True)
         
-        if session.players:
+        if players:
             # Display players in a grid using st.columns
             cols = st.columns(3)
-            for idx, (player_id, player_data) in enumerate(session.players.items()):
+            for idx, (player_id, player_data) in enumerate(players.items()):
                 with cols[idx % 3]:
                     st.markdown(f"""
                     <div style='background: linear-gradient(135deg, rgba(251, 191, 36, 0.2), rgba(220, 38, 38, 0.2)); 
@@ -361,19 +385,17 @@ def render_host_lobby():
             # Auto-refresh toggle
             auto_refresh = st.checkbox("Auto-refresh", value=False)
             if auto_refresh:
-
-                time.sleep(2)
-                st.rerun()
+                rerun_on_change(session, snapshot["version"])
         
         st.markdown("---")
         
         # Start game button
-        if len(session.players) > 0:
+        if len(players) > 0:
             if st.button("🚀 Start Game", type="primary", use_container_width=True, key="start_game_btn"):
                 session.start_game()
                 st.session_state.page = "host_game"
                 st.rerun()
-            st.success(f"✅ Ready to start with {len(session.players)} player(s)")
+            st.success(f"✅ Ready to start with {len(players)} player(s)")
         else:
             st.button("🚀 Start Game", type="primary", use_container_width=True, disabled=True)
             st.caption("⚠️ Need at least 1 player to start")
@@ -386,9 +408,15 @@ def render_host_lobby():
             st.rerun()
 
 
-def _render_player_progress_card(player_data: dict, total_questions: int):
-    """Helper function to render a player progress card"""
-    player_progress = player_data.get("current_question", 0)
+def _level_name(session, player_data: dict):
+    """Difficulty of the player's current question in an adaptive game, else None"""
+    if session.pool is None or player_data.get("finished", False):
+        return None
+    return LEVEL_NAMES[session.pool.level_of(player_data.get("current_question", 0))]
+
+
+def _render_player_progress_card(player_data: dict, player_progress: int, total_questions: int, level: str = None):
+    """Helper function to render a player progress card (level: adaptive games' current difficulty)"""
     player_finished = player_data.get("finished", False)
     progress_pct = (player_progress / total_questions) * 100
     
@@ -398,7 +426,7 @@ def _render_player_progress_card(player_data: dict, total_questions: int):
         status_badge = "<span class='stat-badge badge-finished'>✅ FINISHED</span>"
     else:
         progress_display = f"On Question {player_progress + 1} of {total_questions}"
-        status_badge = f"<span class='stat-badge badge-question'>📝 Q{player_progress + 1}</span>"
+        status_badge = f"<span class='stat-badge badge-question'>📝 Q{player_progress + 1}{f' · {level}' if level else ''}</span>"
     
     # Calculate accuracy for quick stats
     correct = sum(1 for ans in player_data.get('answers', []) if ans.get('is_correct', False))
@@ -424,6 +452,7 @@ def _render_player_progress_card(player_data: dict, total_questions: int):
     """, unsafe_allow_html=True)
 
 
+@timed_render
 def render_host_game():
     """Render the active game view for the host"""
     inject_ui()
@@ -439,13 +468,16 @@ def render_host_game():
         st.error("Session expired!")
         return
     
+    snapshot = session.snapshot()
+    players = snapshot["players"]
+    
     # Check if all players finished
-    if session.status == "finished":
+    if snapshot["status"] == "finished":
         st.session_state.page = "host_results"
         st.rerun()
         return
     
-    total_questions = len(session.questions)
+    total_questions = session.questions_per_player
     
     st.markdown("<div class='app-title'>📊 Live Dashboard 📊</div>", unsafe_allow_html=True)
     
@@ -522,10 +554,10 @@ def render_host_game():
     # Summary stats
     col1, col2, col3, col4 = st.columns(4)
     
-    total_players = len(session.players)
-    finished_players = sum(1 for p in session.players.values() if p.get("finished", False))
-    avg_progress = sum(p.get("current_question", 0) for p in session.players.values()) / max(total_players, 1)
-    avg_score = sum(p["score"] for p in session.players.values()) / max(total_players, 1)
+    total_players = len(players)
+    finished_players = sum(1 for p in players.values() if p.get("finished", False))
+    avg_progress = sum(session.progress(p) for p in players.values()) / max(total_players, 1)
+    avg_score = sum(p["score"] for p in players.values()) / max(total_players, 1)
     
     with col1:
         st.markdown(f"""
@@ -566,8 +598,8 @@ def render_host_game():
     
     # Sort players by progress (furthest first) - calculate once
     sorted_players = sorted(
-        session.players.items(),
-        key=lambda x: (x[1].get("current_question", 0), x[1]["score"]),
+        players.items(),
+        key=lambda x: (session.progress(x[1]), x[1]["score"]),
         reverse=True
     )
     
@@ -579,11 +611,15 @@ def render_host_game():
             cols = st.columns(cols_per_row)
             for j, (player_id, player_data) in enumerate(sorted_players[i:i+cols_per_row]):
                 with cols[j]:
-                    _render_player_progress_card(player_data, total_questions)
+                    _render_player_progress_card(
+                        player_data, session.progress(player_data), total_questions, _level_name(session, player_data)
+                    )
     else:
         # Single column for few players
         for player_id, player_data in sorted_players:
-            _render_player_progress_card(player_data, total_questions)
+            _render_player_progress_card(
+                player_data, session.progress(player_data), total_questions, _level_name(session, player_data)
+            )
     
     st.markdown("---")
     
@@ -592,8 +628,7 @@ def render_host_game():
     
     with col_left:
         st.markdown("### 🏆 Current Leaderboard")
-        leaderboard = session.get_leaderboard()
-        render_mini_leaderboard(leaderboard, top_n=10)
+        render_mini_leaderboard(session.top_k(10), top_n=10)
     
     with col_right:
         st.markdown("### ⚙️ Controls")
@@ -604,11 +639,10 @@ def render_host_game():
                 st.rerun()
         
         with col_b:
-            auto_refresh = st.checkbox("Auto", value=False, help="Auto-refresh every 3s", key="auto_refresh")
+            auto_refresh = st.checkbox("Auto", value=False, help="Refresh when players answer", key="auto_refresh")
         
         if auto_refresh:
-            time.sleep(3)
-            st.rerun()
+            rerun_on_change(session, snapshot["version"])
         
         st.markdown("---")
         
@@ -616,17 +650,18 @@ def render_host_game():
         if finished_players == total_players and total_players > 0:
             st.success("🎉 All players finished!")
             if st.button("🏁 End Game & View Results", type="primary", use_container_width=True, key="end_game_btn"):
-                session.status = "finished"
+                session.finish_game()
                 st.session_state.page = "host_results"
                 st.rerun()
         else:
             st.info(f"⏳ {total_players - finished_players} player(s) still playing...")
             if st.button("🏁 Force End Game", use_container_width=True, key="force_end_btn"):
-                session.status = "finished"
+                session.finish_game()
                 st.session_state.page = "host_results"
                 st.rerun()
 
 
+@timed_render
 def render_host_results():
     """Render final results for host with detailed player analytics"""
     inject_ui()
@@ -648,7 +683,8 @@ def render_host_results():
     
     # Game stats summary
     leaderboard = session.get_leaderboard()
-    total_questions = len(session.questions)
+    players = session.snapshot()["players"]
+    total_questions = session.questions_per_player
     
     if leaderboard:
         winner = leaderboard[0]
@@ -733,7 +769,7 @@ def render_host_results():
     # Display each player's detailed results
     for idx, player_entry in enumerate(leaderboard, 1):
         player_id = player_entry['player_id']
-        player_data = session.players[player_id]
+        player_data = players[player_id]
         player_name = player_data['name']
         player_score = player_data['score']
         player_answers = player_data.get('answers', [])
@@ -780,22 +816,16 @@ def render_host_results():
             st.markdown("#### 📝 Answer Details")
             
             # Show each answer
-            for ans in player_answers:
+            for position, ans in enumerate(player_answers, 1):
                 q_num = ans.get('question_num', 0)
-                question = session.questions[q_num] if q_num < len(session.questions) else {}
+                question = session.questions[q_num] if q_num < len(session.questions) else None
                 is_correct = ans.get('is_correct', False)
                 time_taken = ans.get('time_taken', 0)
                 points = ans.get('points', 0)
                 
-                # Get question text based on mode
-                mode = session.quiz_settings.get('mode', 'chinese_to_english')
-                if 'chinese' in mode:
-                    q_text = question.get('question', 'N/A')
-                else:
-                    q_text = question.get('question', 'N/A')
-                
-                correct_ans = question.get('correct_answer', 'N/A')
-                user_ans = ans.get('answer', 'N/A')
+                q_text = question.question_text if question else 'N/A'
+                correct_ans = question.correct_answer if question else 'N/A'
+                user_ans = ans.get('answer', 'N/A') or "⏱️ Timed out"
                 
                 status_icon = "✅" if is_correct else "❌"
                 status_class = "answer-correct" if is_correct else "answer-incorrect"
@@ -803,7 +833,7 @@ def render_host_results():
                 st.markdown(f"""
                 <div class='answer-item {status_class}'>
                     <div style='display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;'>
-                        <strong style='color: #fbbf24;'>{status_icon} Question {q_num + 1}</strong>
+                        <strong style='color: #fbbf24;'>{status_icon} Question {position}</strong>
                         <div>
                             <span style='background: rgba(102, 126, 234, 0.3); padding: 4px 12px; border-radius: 12px; margin-right: 8px;'>
                                 ⏱️ {time_taken:.1f}s
@@ -825,11 +855,11 @@ def render_host_results():
     
     # Game statistics
     with st.expander("📈 Game Statistics"):
-        total_players = len(session.players)
-        total_questions = len(session.questions)
+        total_players = len(players)
+        total_questions = session.questions_per_player
         avg_accuracy = sum(
             sum(1 for ans in p.get('answers', []) if ans.get('is_correct', False)) / max(len(p.get('answers', [])), 1) * 100
-            for p in session.players.values()
+            for p in players.values()
         ) / max(total_players, 1)
         
         st.markdown(f"""
@@ -862,7 +892,7 @@ def render_host_results():
 
 
 def render_host_view():
-    """Main router for host views"""
+    """Main router for host views (each page times itself)"""
     page = st.session_state.get("page", "host_setup")
     
     if page == "host_setup":
@@ -1,6 +1,9 @@
 import streamlit as st
 
+from core.profiler import profiled
 
+
+@profiled
 def render_leaderboard(leaderboard: list, show_details: bool = True):
     """
     Render a leaderboard display
@@ -142,6 +145,7 @@ def render_leaderboard(leaderboard: list, show_details: bool = True):
     st.markdown('</div>', unsafe_allow_html=True)
 
 
+@profiled
 def render_mini_leaderboard(leaderboard: list, top_n: int = 5):
     """
     Render a compact leaderboard showing top N players
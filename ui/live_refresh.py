@@ -0,0 +1,53 @@
+import math
+
+import streamlit as st
+
+# How often the watcher fragment wakes up, and how long each wake-up may
+# block waiting for the session to change. Keeping the wait short means a
+# button click on the page is never held up for long.
+POLL_INTERVAL = 1.0
+WAIT_TIMEOUT = 0.5
+
+# Player pages tell the session they are still open this often; the
+# janitor evicts players it hasn't heard from in a while
+HEARTBEAT_INTERVAL = 20.0
+
+
+@st.fragment(run_every=POLL_INTERVAL)
+def _watch_session(session, rendered_version):
+    if session.wait_for_change(rendered_version, WAIT_TIMEOUT) != rendered_version:
+        st.rerun()
+
+
+def rerun_on_change(session, rendered_version: int):
+    """Rerun the page only once the session has moved past rendered_version.
+
+    Replaces the old time.sleep()+st.rerun() polling: between changes only a
+    tiny fragment runs, instead of the whole page every few seconds.
+    """
+    _watch_session(session, rendered_version)
+
+
+@st.fragment(run_every=POLL_INTERVAL)
+def _watch_question(session, player_id, rendered_question):
+    remaining = session.time_remaining(player_id)
+    player = session.get_player(player_id)
+    if player is None or player["finished"] or player["current_question"] != rendered_question:
+        st.rerun()
+    if remaining is not None:
+        st.markdown(f"### ⏱️ {math.ceil(remaining)}s left")
+
+
+def countdown_until_timeout(session, player_id: str, rendered_question: int):
+    """Show the time left on the player's question and rerun once it moves on.
+
+    The server expires the question on its own (see DeadlineScheduler); this
+    only brings the page up to date, ticking once per POLL_INTERVAL.
+    """
+    _watch_question(session, player_id, rendered_question)
+
+
+@st.fragment(run_every=HEARTBEAT_INTERVAL)
+def keep_alive(session, player_id: str):
+    """Send a heartbeat now and every HEARTBEAT_INTERVAL while the page is open."""
+    session.heartbeat(player_id)
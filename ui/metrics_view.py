@@ -0,0 +1,27 @@
+import hmac
+import os
+
+import streamlit as st
+
+from core import metrics
+
+
+def render_metrics_page(token: str):
+    """Hidden admin page (?metrics=<QUIZZY_METRICS_TOKEN>) showing the Prometheus dump"""
+    expected = os.environ.get("QUIZZY_METRICS_TOKEN")
+    if not expected or not hmac.compare_digest(token, expected):
+        st.error("Page not found.")
+        return
+    
+    # Make sure the session gauges are registered even on a fresh process
+    from multiplayer.session_manager import get_global_session_manager
+    get_global_session_manager("v2.0")
+    
+    st.title("📈 Quizzy Metrics")
+    if not metrics.REGISTRY.enabled:
+        st.info("Metrics are disabled. Start the app with QUIZZY_METRICS=1 to record them.")
+        return
+    
+    text = metrics.render_prometheus()
+    st.download_button("⬇️ Download metrics.prom", text, file_name="metrics.prom", mime="text/plain")
+    st.code(text, language="text")
@@ -1,9 +1,13 @@
 import streamlit as st
 import time
+from ui.live_refresh import countdown_until_timeout, keep_alive, rerun_on_change
 from ui.theme import inject_ui
 from ui.leaderboard import render_leaderboard
+from core.metrics import timed_render
+from multiplayer.adaptive import LEVEL_NAMES
 
 
+@timed_render
 def render_player_join():
     """Render the player join screen"""
     inject_ui()
@@ -169,6 +173,7 @@ def render_player_join():
         """, unsafe_allow_html=True)
 
 
+@timed_render
 def render_player_lobby():
     """Render the player lobby waiting screen"""
     inject_ui()
@@ -228,8 +233,19 @@ def render_player_lobby():
             st.rerun()
         return
     
+    snapshot = session.snapshot()
+    players = snapshot["players"]
+    
+    if st.session_state.get("player_id") not in players:
+        st.warning("You were removed from the lobby after being away for a while.")
+        if st.button("← Join Again"):
+            st.session_state.page = "player_join"
+            st.rerun()
+        return
+    keep_alive(session, st.session_state.player_id)
+    
     # Check if game started
-    if session.status == "playing":
+    if snapshot["status"] == "playing":
         st.session_state.page = "player_game"
         st.rerun()
         return
@@ -250,13 +266,13 @@ def render_player_lobby():
     
     st.markdown(f"""
     <div style='text-align: center; margin: 30px 0;'>
-    <h3 style='color: #667eea;'>👥 Players in Lobby ({len(session.players)})</h3>
+    <h3 style='color: #667eea;'>👥 Players in Lobby ({len(players)})</h3>
     </div>
     """, unsafe_allow_html=True)
     
     # Show all players in a more attractive grid
     cols = st.columns(3)
-    for idx, (player_id, player_data) in enumerate(session.players.items()):
+    for idx, (player_id, player_data) in enumerate(players.items()):
         with cols[idx % 3]:
             st.markdown(f"""
             <div class='player-badge'>
@@ -272,23 +288,21 @@ def render_player_lobby():
             st.rerun()
     
     with col2:
-        auto_refresh = st.checkbox("Auto", value=False, help="Auto-refresh every 2s")
+        auto_refresh = st.checkbox("Auto", value=False, help="Refresh when the lobby changes")
         if auto_refresh:
-            time.sleep(2)
-            st.rerun()
+            rerun_on_change(session, snapshot["version"])
     
     st.markdown("---")
     
     # Leave button
     if st.button("🚪 Leave Game", use_container_width=True):
             if "player_id" in st.session_state:
-                player_id = st.session_state.player_id
-                if player_id in session.players:
-                    del session.players[player_id]
+                session.remove_player(st.session_state.player_id)
             st.session_state.page = "player_join"
             st.rerun()
 
 
+@timed_render
 def render_player_game():
     """Render the active game view for players"""
     inject_ui()
@@ -373,11 +387,11 @@ def render_player_game():
         return
     
     player_id = st.session_state.get("player_id")
-    if not player_id or player_id not in session.players:
+    player_data = session.get_player(player_id) if player_id else None
+    if player_data is None:
         st.error("Player not found in session!")
         return
-    
-    player_data = session.players[player_id]
+    keep_alive(session, player_id)
     
     # Check if player finished all questions
     if player_data.get("finished", False):
@@ -388,29 +402,37 @@ def render_player_game():
     # Get player's current question
     current_q = player_data.get("current_question", 0)
     question = session.questions[current_q]
-    total_questions = len(session.questions)
+    total_questions = session.questions_per_player
+    # In adaptive games current_q indexes the shared pool, not the player's progress
+    position = session.progress(player_data)
     
     # Progress bar
-    progress = (current_q + 1) / total_questions
+    progress = min(1.0, (position + 1) / total_questions)
     st.progress(progress)
     
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        st.markdown(f"<h2 style='color: #667eea;'>❓ Question {current_q + 1} of {total_questions}</h2>", unsafe_allow_html=True)
+        title = f"❓ Question {position + 1} of {total_questions}"
+        if session.pool is not None:
+            title += f" · 🎯 {LEVEL_NAMES[session.pool.level_of(current_q)]}"
+        st.markdown(f"<h2 style='color: #667eea;'>{title}</h2>", unsafe_allow_html=True)
         
         # Display question
         st.markdown(f"""
         <div class='game-card'>
-        <h2>{question['question_text']}</h2>
+        <h2>{question.question_text}</h2>
         </div>
         """, unsafe_allow_html=True)
         
+        if session.time_limit:
+            countdown_until_timeout(session, player_id, current_q)
+        
         # Answer options
         with st.form(key=f"answer_form_{current_q}_{player_id}"):
             selected_answer = st.radio(
                 "Choose your answer:",
-                question['options'],
+                question.options,
                 key=f"player_answer_{current_q}_{player_id}"
             )
             
@@ -433,15 +455,22 @@ def render_player_game():
                         success = session.submit_answer(player_id, current_q, selected_answer)
                         if success:
                             # Show feedback
-                            is_correct = selected_answer == question.get("correct_answer")
+                            is_correct = selected_answer == question.correct_answer
                             if is_correct:
                                 st.success("🎉 Correct!")
                             else:
-                                st.error(f"❌ Wrong! Correct answer: {question.get('correct_answer', 'N/A')}")
+                                st.error(f"❌ Wrong! Correct answer: {question.correct_answer}")
                             time.sleep(1)
                             st.rerun()
                         else:
-                            st.error("Failed to submit answer! Please try again.")
+                            latest = session.get_player(player_id)
+                            if latest and (latest["finished"] or latest["current_question"] != current_q):
+                                # The deadline passed first; the server recorded a timeout
+                                st.warning("⏱️ Time's up! This question was recorded as unanswered.")
+                                time.sleep(1)
+                                st.rerun()
+                            else:
+                                st.error("Failed to submit answer! Please try again.")
                     except Exception as e:
                         st.error(f"Error submitting answer: {str(e)}")
                         import traceback
@@ -460,20 +489,18 @@ def render_player_game():
         """, unsafe_allow_html=True)
         
         # Show current rank
-        leaderboard = session.get_leaderboard()
-        for player in leaderboard:
-            if player["player_id"] == player_id:
-                rank = player["rank"]
-                total_players = len(leaderboard)
-                st.markdown(f"""
-                <div class='rank-badge'>
-                <h3>🏆 Your Rank</h3>
-                <p>{rank}/{total_players}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                break
+        rank = session.rank_of(player_id)
+        if rank is not None:
+            total_players = session.player_count()
+            st.markdown(f"""
+            <div class='rank-badge'>
+            <h3>🏆 Your Rank</h3>
+            <p>{rank}/{total_players}</p>
+            </div>
+            """, unsafe_allow_html=True)
 
 
+@timed_render
 def render_player_results():
     """Render final results for player with detailed personal stats"""
     inject_ui()
@@ -740,21 +767,19 @@ def render_player_results():
         return
     
     player_id = st.session_state.get("player_id")
+    if player_id:
+        keep_alive(session, player_id)
     
     st.markdown("<div class='app-title'>🎉 Game Over! 🎉</div>", unsafe_allow_html=True)
     
     # Show player's rank
     leaderboard = session.get_leaderboard()
-    player_rank = None
-    for player in leaderboard:
-        if player["player_id"] == player_id:
-            player_rank = player
-            break
+    rank = session.rank_of(player_id)
     
     # Get player's detailed data
-    player_data = session.players.get(player_id, {})
+    player_data = session.get_player(player_id) or {}
     player_answers = player_data.get('answers', [])
-    total_questions = len(session.questions)
+    total_questions = session.questions_per_player
     
     # Calculate detailed statistics
     correct_count = sum(1 for ans in player_answers if ans.get('is_correct', False))
@@ -764,9 +789,7 @@ def render_player_results():
     total_time = sum(ans.get('time_taken', 0) for ans in player_answers)
     
     # Character selection based on performance
-    if player_rank:
-        rank = player_rank["rank"]
-        
+    if rank is not None:
         # Select character and message based on rank
         if rank == 1:
             character = "🐉"  # Dragon
@@ -800,8 +823,8 @@ def render_player_results():
             <div class='red-envelope-character'>🏆</div>
             <div class='red-envelope-title'>☆ CHAMPION ☆</div>
             <div style='font-size: 20px; font-weight: 600; color: #fef3c7; margin: 10px 0;'>{character_name}</div>
-            <div class='red-envelope-name'>{player_rank['name']}</div>
-            <div class='red-envelope-score'>{player_rank['score']:,}</div>
+            <div class='red-envelope-name'>{player_data.get('name', '')}</div>
+            <div class='red-envelope-score'>{player_data.get('score', 0):,}</div>
             <div class='red-envelope-message'>{message}</div>
             <div style='margin-top: 20px; font-size: 14px; color: #fbbf24; opacity: 0.8;'>✨ PERFECT VICTORY ✨</div>
             </div>
@@ -812,9 +835,9 @@ def render_player_results():
             <div class='results-card'>
             <div class='character-banner'>{emoji}</div>
             <h2 style='font-size: 28px; color: #fbbf24; text-shadow: 2px 2px 4px rgba(0,0,0,0.4); margin: 15px 0;'>{character_name}</h2>
-            <p style='font-size: 22px; color: white; margin: 15px 0; font-weight: bold; text-shadow: 2px 2px 4px rgba(0,0,0,0.3);'>{player_rank['name']}</p>
+            <p style='font-size: 22px; color: white; margin: 15px 0; font-weight: bold; text-shadow: 2px 2px 4px rgba(0,0,0,0.3);'>{player_data.get('name', '')}</p>
             <div class='rank-display'>Rank #{rank}</div>
-            <p style='font-size: 40px; font-weight: bold; color: #fbbf24; margin: 15px 0; text-shadow: 0 0 15px rgba(251, 191, 36, 0.5);'>{player_rank['score']:,}</p>
+            <p style='font-size: 40px; font-weight: bold; color: #fbbf24; margin: 15px 0; text-shadow: 0 0 15px rgba(251, 191, 36, 0.5);'>{player_data.get('score', 0):,}</p>
             <p style='color: #fef3c7; font-size: 16px; margin-top: 15px; font-weight: 600; text-shadow: 1px 1px 2px rgba(0,0,0,0.3);'>{message}</p>
             </div>
             """, unsafe_allow_html=True)
@@ -900,16 +923,16 @@ def render_player_results():
     with st.expander("📝 VIEW ALL YOUR ANSWERS", expanded=False):
         st.markdown("<h3 style='color: #fef3c7; font-size: 24px; font-weight: 900; margin-bottom: 20px; text-shadow: 2px 2px 4px rgba(0,0,0,0.5);'>QUESTION ANALYSIS</h3>", unsafe_allow_html=True)
         
-        for ans in player_answers:
+        for position, ans in enumerate(player_answers, 1):
             q_num = ans.get('question_num', 0)
-            question = session.questions[q_num] if q_num < len(session.questions) else {}
+            question = session.questions[q_num] if q_num < len(session.questions) else None
             is_correct = ans.get('is_correct', False)
             time_taken = ans.get('time_taken', 0)
             points = ans.get('points', 0)
             
-            q_text = question.get('question', 'N/A')
-            correct_ans = question.get('correct_answer', 'N/A')
-            user_ans = ans.get('answer', 'N/A')
+            q_text = question.question_text if question else 'N/A'
+            correct_ans = question.correct_answer if question else 'N/A'
+            user_ans = ans.get('answer', 'N/A') or "⏱️ Timed out"
             
             status_icon = "✅" if is_correct else "❌"
             status_class = "item-correct" if is_correct else "item-incorrect"
@@ -917,7 +940,7 @@ def render_player_results():
             st.markdown(f"""
             <div class='detail-item {status_class}'>
                 <div style='display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;'>
-                    <strong style='color: #fbbf24; font-size: 16px;'>{status_icon} Question {q_num + 1}</strong>
+                    <strong style='color: #fbbf24; font-size: 16px;'>{status_icon} Question {position}</strong>
                     <div>
                         <span style='background: rgba(102, 126, 234, 0.3); padding: 3px 10px; border-radius: 10px; margin-right: 6px; font-size: 13px;'>
                             ⏱️ {time_taken:.1f}s
@@ -954,7 +977,7 @@ def render_player_results():
 
 
 def render_player_view():
-    """Main router for player views"""
+    """Main router for player views (each page times itself)"""
     page = st.session_state.get("page", "player_join")
     
     if page == "player_join":
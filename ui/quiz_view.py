@@ -1,8 +1,36 @@
+import sqlite3
+import time
+
 import streamlit as st
-from quiz.session import initialize_quiz, submit_answer
+from core.profiler import profiled
+from quiz.learner_store import get_learner_store
+from quiz.scheduler import get_schedule, save_schedule
+from quiz.session import grade_quiz, initialize_quiz, response_times
 from ui.theme import inject_ui
 
 
+def _mark_answered(i):
+    # Widget callback: when each answer was last changed, for response times
+    st.session_state.setdefault("answer_times", {})[i] = time.time()
+
+
+def _record_progress(learner, deck, settings, questions, history, started_at):
+    """Save a graded quiz to the learner's history (one transaction)"""
+    df = deck.df
+    rows = [q.row for q in questions]
+    meta = df.iloc[rows]
+    seconds = response_times(started_at, st.session_state.get("answer_times", {}), len(questions))
+    try:
+        get_learner_store().record_quiz(
+            learner, deck.digest, settings["mode"], rows, [h["is_correct"] for h in history], seconds,
+            meta["pos"].tolist() if "pos" in df.columns else None,
+            meta["semantic_type"].tolist() if "semantic_type" in df.columns else None,
+        )
+    except (OSError, sqlite3.Error):
+        st.warning("Couldn't save your progress this time.")
+
+
+@profiled
 def render_quiz():
     inject_ui()
 
@@ -99,7 +127,8 @@ def render_quiz():
         unsafe_allow_html=True,
     )
 
-    df = st.session_state.get("df")
+    deck = st.session_state.get("deck")
+    df = deck.df if deck is not None else None
     if df is None:
         st.error("No dataset loaded. Go back to upload.")
         if st.button("Go to upload"):
@@ -113,9 +142,17 @@ def render_quiz():
         "quiz_data", {"questions": [], "current_q": 0, "score": 0, "history": []}
     )
 
+    learner = settings.get("learner")
+
     # Initialize full question set if not present
     if not quiz_data["questions"]:
-        quiz_data["questions"] = initialize_quiz(df, settings)
+        rows = None
+        if learner:
+            # Spaced repetition: overdue words first, then new ones
+            rows = get_schedule(learner, deck.digest, len(df)).next_rows(settings["num_questions"])
+        quiz_data["questions"] = initialize_quiz(df, settings, rows=rows)
+        quiz_data["started_at"] = time.time()
+        st.session_state.answer_times = {}
         # reset any previous answers
         st.session_state.quiz_data = quiz_data
         st.session_state.answers = {}
@@ -123,10 +160,14 @@ def render_quiz():
     questions = quiz_data["questions"]
     total_q = len(questions)
 
+    typed = settings.get("typed", False)
+    # Typed and multiple-choice answers keep separate widget keys
+    answer_key = "typed_" if typed else "answer_"
+
     # Header: progress / score
     left, center, right = st.columns([2, 2, 2])
     with left:
-        answered_count = sum(1 for i in range(total_q) if st.session_state.get(f"answer_{i}", None) is not None)
+        answered_count = sum(1 for i in range(total_q) if st.session_state.get(f"{answer_key}{i}", None))
         st.markdown(f"<div class='progress-area'>📝 Answered: {answered_count} / {total_q}</div>", unsafe_allow_html=True)
     with center:
         mode_display = {
@@ -134,18 +175,35 @@ def render_quiz():
             "english_to_chinese": "🔤 English → Chinese", 
             "pinyin_to_chinese": "🗣️🎵 Pinyin → Chinese"
         }.get(settings.get("mode", "chinese_to_english"), "📖 Chinese → English")
+        if settings.get("typed"):
+            mode_display += " ⌨️"
         st.markdown(f"<div class='progress-area'>🎓 Mode: {mode_display}</div>", unsafe_allow_html=True)
     with right:
         st.markdown(f"<div class='progress-area'>🏆 Score: {quiz_data.get('score', 0)}</div>", unsafe_allow_html=True)
 
+    if learner:
+        stats = get_schedule(learner, deck.digest, len(df)).stats()
+        st.caption(f"🧠 {learner}: {stats['due']} due for review · {stats['new']} new · {stats['mature']} mastered")
+
     st.markdown("<div class='quiz-container'>", unsafe_allow_html=True)
 
+    placeholder = {
+        "chinese_to_english": "Type the English word",
+        "english_to_chinese": "汉字, or pinyin like nǐ hǎo / ni3 hao3",
+        "pinyin_to_chinese": "Type the characters (汉字)",
+    }.get(settings.get("mode", "chinese_to_english"), "Type your answer")
+
     # Render all questions - optimized with clear structure
     for i, q in enumerate(questions):
         st.markdown("<div class='question-card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='question-title'>❓ {i+1}. {q['question_text']}</div>", unsafe_allow_html=True)
-        # larger radio options for easier clicking
-        st.radio("Select answer", q["options"], key=f"answer_{i}", label_visibility="collapsed")
+        st.markdown(f"<div class='question-title'>❓ {i+1}. {q.question_text}</div>", unsafe_allow_html=True)
+        if typed:
+            st.text_input("Your answer", key=f"{answer_key}{i}", placeholder=placeholder, label_visibility="collapsed",
+                          on_change=_mark_answered, args=(i,))
+        else:
+            # larger radio options for easier clicking
+            st.radio("Select answer", q.options, key=f"{answer_key}{i}", label_visibility="collapsed",
+                     on_change=_mark_answered, args=(i,))
         st.markdown("</div>", unsafe_allow_html=True)
 
     # Finish button - centered and prominent
@@ -154,14 +212,14 @@ def render_quiz():
         finish = st.button("✅ FINISH AND GRADE", type="primary", use_container_width=True, key="finish_quiz")
 
     if finish:
-        quiz_data["score"] = 0
         quiz_data["history"] = []
-        for i, q in enumerate(questions):
-            user_choice = st.session_state.get(f"answer_{i}", None)
-            user_choice_val = user_choice if user_choice is not None else ""
-            correct = submit_answer(quiz_data["history"], q, user_choice_val)
-            if correct:
-                quiz_data["score"] += 1
+        responses = [st.session_state.get(f"{answer_key}{i}", None) or "" for i in range(total_q)]
+        quiz_data["score"] = grade_quiz(quiz_data["history"], questions, responses, settings)
+        if learner:
+            schedule = get_schedule(learner, deck.digest, len(df))
+            schedule.review_answers([q.row for q in questions], [h["is_correct"] for h in quiz_data["history"]])
+            save_schedule(learner, deck.digest, schedule)
+            _record_progress(learner, deck, settings, questions, quiz_data["history"], quiz_data.get("started_at", time.time()))
         st.session_state.quiz_data = quiz_data
         st.session_state.page = "results"
         st.rerun()
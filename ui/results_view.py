@@ -1,8 +1,41 @@
+import sqlite3
+
 import streamlit as st
-import pandas as pd
+from core.profiler import profiled
+from quiz.learner_store import get_learner_store
+from quiz.session import history_frame
 from ui.theme import inject_ui
 
 
+def _render_progress(learner, deck):
+    """The learner's saved history on this deck: weakest words and accuracy by category"""
+    store = get_learner_store()
+    try:
+        weakest = store.weakest(learner, deck.digest, 10)
+        by_pos = store.accuracy_by(learner, deck.digest, "pos")
+        by_type = store.accuracy_by(learner, deck.digest, "semantic_type")
+        quizzes = store.recent_quizzes(learner, deck.digest, 10)
+    except (OSError, sqlite3.Error):
+        st.info("Your saved progress isn't available right now.")
+        return
+    if weakest.empty:
+        return
+    
+    with st.expander(f"📈 {learner.upper()}'S PROGRESS ({len(quizzes)} recent quizzes)", expanded=False):
+        words = [c for c in ("chinese", "pinyin", "english") if c in deck.df.columns]
+        weakest = deck.df.iloc[weakest["row"].to_numpy()][words].reset_index(drop=True).join(weakest.drop(columns="row"))
+        st.markdown("**🎯 Words to practice**")
+        st.dataframe(weakest, use_container_width=True, hide_index=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**By part of speech**")
+            st.dataframe(by_pos, use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown("**By topic**")
+            st.dataframe(by_type, use_container_width=True, hide_index=True)
+
+
+@profiled
 def render_results():
     inject_ui()
     
@@ -137,9 +170,15 @@ def render_results():
         with st.expander("📋 VIEW DETAILED RESULTS", expanded=False):
             st.markdown("<div class='details-title'>Question-by-Question Breakdown</div>", unsafe_allow_html=True)
             # Use pandas for efficient data display
-            df_hist = pd.DataFrame(history)
+            questions = quiz_data.get("questions", [])
+            df_hist = history_frame(history, questions[0].deck if questions else None)
             st.dataframe(df_hist, use_container_width=True, hide_index=True)
     
+    learner = st.session_state.get("quiz_settings", {}).get("learner")
+    deck = st.session_state.get("deck")
+    if learner and deck is not None:
+        _render_progress(learner, deck)
+    
     # Navigation buttons
     st.markdown("<div class='button-group'>", unsafe_allow_html=True)
     col1, col2 = st.columns(2)
@@ -149,7 +188,7 @@ def render_results():
             # Reset all session state to go back to home
             st.session_state.page = "mode_select"
             st.session_state.game_mode = None
-            st.session_state.df = None
+            st.session_state.deck = None
             st.session_state.quiz_data = {
                 "questions": [],
                 "current_q": 0,
@@ -162,7 +201,7 @@ def render_results():
         if st.button("🔄 RESTART QUIZ", use_container_width=True, type="secondary", key="restart_btn"):
             # Keep mode but reset quiz
             st.session_state.page = "upload"
-            st.session_state.df = None
+            st.session_state.deck = None
             st.session_state.quiz_data = {
                 "questions": [],
                 "current_q": 0,
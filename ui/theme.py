@@ -1,7 +1,10 @@
 import streamlit as st
 import streamlit.components.v1 as components
 
+from core.profiler import profiled
 
+
+@profiled
 def inject_ui():
     # Modern UI CSS with Chinese Vibe - Enhanced for teens and adults
     css = """
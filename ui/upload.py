@@ -1,22 +1,10 @@
 import streamlit as st
-import pandas as pd
-from core.loader import load_excel
+from core.loader import load_deck, sample_deck
+from core.profiler import profiled
 from ui.theme import inject_ui
 
 
-def _sample_df():
-    # minimal sample with required columns
-    data = {
-        "chinese": ["你好", "谢谢", "再见"],
-        "pinyin": ["nǐ hǎo", "xiè xie", "zài jiàn"],
-        "english": ["hello", "thanks", "goodbye"],
-        "example_sentence": ["你好！", "谢谢你。", "再见！"],
-        "pos": ["interjection", "verb", "interjection"],
-        "semantic_type": ["greeting", "gratitude", "farewell"],
-    }
-    return pd.DataFrame(data)
-
-
+@profiled
 def render_upload():
     inject_ui()
     # Chinese-themed catchy UI
@@ -39,7 +27,8 @@ def render_upload():
         st.markdown("<div class='chinese-welcome'>🌟 Welcome to the World of Chinese Learning!<br/>Start your language adventure! 🚀</div>", unsafe_allow_html=True)
         
         # Default to sample dataset
-        df_preview = _sample_df()
+        deck = sample_deck()
+        df_preview = deck.df
         max_rows = len(df_preview)
         
         st.success(f"📚 Using Sample Dataset ({max_rows} Vocabularies)")
@@ -52,9 +41,10 @@ def render_upload():
 
         if uploaded is not None:
             try:
-                custom_df = load_excel(uploaded)
-                if custom_df is not None:
-                    df_preview = custom_df
+                custom_deck = load_deck(uploaded)
+                if custom_deck is not None:
+                    deck = custom_deck
+                    df_preview = deck.df
                     max_rows = len(df_preview)
                     st.success(f"🎉 Custom dataset loaded! ({max_rows} rows)")
             except Exception:
@@ -79,12 +69,19 @@ def render_upload():
         
         st.session_state["internal_mode"] = internal_mode
         
+        learner = st.text_input("👤 Your name (optional)", key="learner_name",
+                                help="With a name, questions follow spaced repetition: words due for review first, progress saved between visits")
+        typed = st.checkbox("⌨️ Type the answers instead of choosing", key="typed_answers",
+                            help="Case, punctuation and spacing don't matter; pinyin can use tone marks or tone numbers")
+        
         # Start button
         if st.button("🚀 Start Quiz", type="primary"):
-            # Use current df_preview (either sample or uploaded)
-            st.session_state.df = df_preview
+            # Keep only a handle to the shared deck (either sample or uploaded)
+            st.session_state.deck = deck
             st.session_state.quiz_settings["num_questions"] = num_questions
             st.session_state.quiz_settings["mode"] = internal_mode
+            st.session_state.quiz_settings["typed"] = typed
+            st.session_state.quiz_settings["learner"] = learner.strip() or None
             st.session_state.quiz_data = {
                 "questions": [],
                 "current_q": 0,